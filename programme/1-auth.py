@@ -1,8 +1,6 @@
 import os
-import re
-import json
 import time
-import html as html_lib
+import argparse
 from datetime import date
 from dotenv import load_dotenv, set_key
 
@@ -15,30 +13,16 @@ from selenium.webdriver.support import expected_conditions as EC
 from selenium.common.exceptions import TimeoutException
 from selenium.webdriver.chrome.options import Options as ChromeOptions
 
+from fetcher import BASE_URL
+import session
+from session import probe_session
+import area_mapping
+from area_mapping import AREA_MAPPING_PATH, extract_area_mapping_from_html
+
 # --- 全局设置 ---
 DOTENV_PATH = '.env'
-AREA_MAPPING_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'area_mapping.json')
-
-def extract_area_mapping_from_html(html: str) -> dict:
-    """
-    从HTML中提取 <select name="area"> 内的 <option value="ID">名称</option>。
-    返回形如 {"24":"SIP Campus-GF Classrooms in Foundation Building", ...}
-    """
-    m = re.search(r'<select[^>]*name=["\']area["\'][^>]*>(.*?)</select>', html, flags=re.I | re.S)
-    if not m:
-        return {}
-    select_html = m.group(1)
-    options = re.findall(r'<option[^>]*value=["\'](\d+)["\'][^>]*>(.*?)</option>', select_html, flags=re.I | re.S)
-
-    area_map = {}
-    for aid, raw_text in options:
-        # 去标签、反转义、压缩空白
-        text = re.sub(r'<[^>]+>', '', raw_text)
-        text = html_lib.unescape(text)
-        text = re.sub(r'\s+', ' ', text).strip()
-        if text:
-            area_map[aid] = text
-    return area_map
+# 持久化的 Chrome 用户目录：SSO 登录状态和“信任此设备”的两步验证记录在多次运行之间保留
+CHROME_PROFILE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'chrome_profile')
 
 def discover_and_save_area_mapping(driver) -> bool:
     """
@@ -58,27 +42,70 @@ def discover_and_save_area_mapping(driver) -> bool:
     except TimeoutException:
         print("警告：未在超时时间内看到区域下拉框，尝试直接解析页面源码。")
 
-    html = driver.page_source
-    area_map = extract_area_mapping_from_html(html)
+    return save_area_mapping(extract_area_mapping_from_html(driver.page_source))
 
+def save_area_mapping(area_map: dict) -> bool:
     if not area_map:
         print("错误：未能在页面中解析到任何区域。")
         return False
 
-    with open(AREA_MAPPING_PATH, 'w', encoding='utf-8') as f:
-        json.dump(area_map, f, ensure_ascii=False, indent=2)
+    old = area_mapping.load_mapping()
+    diff = area_mapping.save_mapping(area_map)
     print(f"✓ 已发现 {len(area_map)} 个区域并保存至 {AREA_MAPPING_PATH}")
+    if old:
+        for line in diff.describe(old, area_map):
+            print(line)
+    return True
+
+def try_existing_session(base_url: str) -> bool:
+    """
+    用 .env 中保存的 Cookie 发一个普通 HTTP 请求；会话仍有效时直接返回 True，不启动浏览器。
+    探测拿到的就是今天的日视图，area_mapping.json 缺失或超过 TTL 时直接从中刷新，不再额外请求。
+    """
+    cookie = os.getenv('MRBS_COOKIE')
+    probe = probe_session(cookie, base_url)
+    if cookie:
+        session.record_probe(cookie, probe)
+    if not probe.alive:
+        print(f"已保存的 Cookie 不可用（{probe.reason}），需要通过浏览器登录。")
+        return False
+    print(f"✓ 已保存的 Cookie 仍然有效（探测耗时 {probe.elapsed*1000:.0f} ms），无需启动浏览器。")
+    old = area_mapping.load_mapping()
+    area_mapping.report(area_mapping.refresh_mapping(None, html=probe.html), old)
     return True
 
+def parse_args():
+    parser = argparse.ArgumentParser(description="MRBS 身份认证：获取 Cookie 并生成 area_mapping.json")
+    parser.add_argument("--force-browser", action="store_true",
+                        help="跳过 Cookie 探测，总是打开浏览器重新登录")
+    parser.add_argument("--profile-dir", default=CHROME_PROFILE_DIR,
+                        help="Chrome 用户目录，用于在多次运行间保留 SSO/两步验证状态（默认 programme/chrome_profile）")
+    parser.add_argument("--no-profile", action="store_true",
+                        help="使用一次性的临时浏览器配置（旧行为）")
+    parser.add_argument("--base-url", default=None,
+                        help="探测会话时使用的 MRBS index.php 地址（默认取环境变量 MRBS_BASE_URL）")
+    return parser.parse_args()
+
 def main():
+    args = parse_args()
     # --- 1. 加载环境变量 ---
     load_dotenv(DOTENV_PATH)
     username = os.getenv('XJTLU_USERNAME')
     password = os.getenv('XJTLU_PASSWORD')
 
-    # --- 2. 初始化 Selenium WebDriver (强制有头模式) ---
+    # --- 2. 快速路径：已保存的 Cookie 仍有效时不启动浏览器 ---
+    if not args.force_browser:
+        print("正在检查已保存的 Cookie ...")
+        if try_existing_session(args.base_url or os.getenv('MRBS_BASE_URL', BASE_URL)):
+            return
+
+    # --- 3. 初始化 Selenium WebDriver (强制有头模式) ---
     print("正在以【有头模式】启动Chrome浏览器...")
     chrome_options = ChromeOptions()
+    if not args.no_profile:
+        os.makedirs(args.profile_dir, exist_ok=True)
+        chrome_options.add_argument(f"--user-data-dir={os.path.abspath(args.profile_dir)}")
+        print(f"使用持久化浏览器配置: {args.profile_dir}")
     chrome_options.add_argument("--window-size=1280,800")
     chrome_options.add_argument("user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36")
     chrome_options.add_argument("--disable-blink-features=AutomationControlled")
@@ -90,26 +117,34 @@ def main():
     wait_short = WebDriverWait(driver, 20)  # 20秒，用于等待页面元素加载
 
     try:
-        # --- 3. 导航到登录页 ---
+        # --- 4. 导航到登录页 ---
         print("正在访问 MRBS 网站以触发SSO登录...")
         driver.get("https://mrbs.xjtlu.edu.cn/index.php")
         print("等待SSO登录页面加载...")
         
-        # 等待关键的表单元素出现
-        username_field = wait_short.until(
-            EC.presence_of_element_located((By.CSS_SELECTOR, "input[placeholder='Enter Username']"))
-        )
-        password_field = driver.find_element(By.CSS_SELECTOR, "input[placeholder='Enter Password']")
-        login_button = driver.find_element(By.XPATH, "//button[text()='Sign in']")
-
-        # --- 4. 根据是否存在凭据，执行不同操作 ---
-        if username and password:
+        # 浏览器配置中的 SSO 会话仍有效时会直接回到 MRBS 主页，否则出现登录表单
+        wait_short.until(EC.any_of(
+            EC.presence_of_element_located((By.ID, "day_main")),
+            EC.presence_of_element_located((By.CSS_SELECTOR, "input[placeholder='Enter Username']")),
+        ))
+        already_logged_in = bool(driver.find_elements(By.ID, "day_main"))
+
+        # --- 5. 根据是否存在凭据，执行不同操作 ---
+        if already_logged_in:
+            print("✓ 浏览器配置中的 SSO 会话仍然有效，无需重新登录。")
+        elif username and password:
+            username_field = driver.find_element(By.CSS_SELECTOR, "input[placeholder='Enter Username']")
+            password_field = driver.find_element(By.CSS_SELECTOR, "input[placeholder='Enter Password']")
+            login_button = driver.find_element(By.XPATH, "//button[text()='Sign in']")
             print(f"检测到已保存的用户名: {username}")
             print("正在自动填充并登录...")
             username_field.send_keys(username)
             password_field.send_keys(password)
             login_button.click()
         else:
+            username_field = driver.find_element(By.CSS_SELECTOR, "input[placeholder='Enter Username']")
+            password_field = driver.find_element(By.CSS_SELECTOR, "input[placeholder='Enter Password']")
+            login_button = driver.find_element(By.XPATH, "//button[text()='Sign in']")
             print("\n" + "="*50)
             print("!!! 首次运行设置 !!!")
             print("1. 请在打开的浏览器窗口中【输入】您的用户名和密码。")
@@ -132,17 +167,19 @@ def main():
             print("正在为您点击登录按钮...")
             login_button.click()
 
-        # --- 5. 等待用户手动完成两步验证（公共流程） ---
-        print("\n" + "="*50)
-        print("!!! 用户操作：请在浏览器窗口中完成【两步验证】!!!")
-        print("脚本将等待您登录成功，最长等待5分钟...")
-        print("="*50 + "\n")
+        # --- 6. 等待用户手动完成两步验证（公共流程） ---
+        if not already_logged_in:
+            print("\n" + "="*50)
+            print("!!! 用户操作：请在浏览器窗口中完成【两步验证】!!!")
+            print("（若此前勾选过信任此设备，可能会直接跳过）")
+            print("脚本将等待您登录成功，最长等待5分钟...")
+            print("="*50 + "\n")
 
         # 等待登录成功并跳转回目标页面
         wait_long.until(EC.presence_of_element_located((By.ID, "day_main")))
         print("✓ 检测到登录成功！已跳转回 MRBS 主页。")
 
-        # --- 6. 提取并格式化 Cookies ---
+        # --- 7. 提取并格式化 Cookies ---
         print("正在提取认证 Cookie...")
         all_cookies = driver.get_cookies()
         required_cookies = ['MRBS_SESSID', 'sdp_user_token']
@@ -155,8 +192,9 @@ def main():
             print(f"成功获取到Cookie: {final_cookie_string}")
             set_key(DOTENV_PATH, "MRBS_COOKIE", final_cookie_string)
             print(f"Cookie已成功保存到 {DOTENV_PATH} 文件中。")
+            session.record(final_cookie_string, True)
 
-            # --- 7. 登录成功后，自动发现并保存区域映射 ---
+            # --- 8. 登录成功后，自动发现并保存区域映射 ---
             try:
                 if discover_and_save_area_mapping(driver):
                     print("区域映射已生成并保存在本地。")
@@ -173,6 +211,8 @@ def main():
         print("请检查网络并重试。")
     except Exception as e:
         print(f"\n发生未知错误: {e}")
+        if not args.no_profile:
+            print("若提示浏览器配置目录被占用，请关闭使用该目录的 Chrome 窗口，或加 --no-profile 运行。")
     
     finally:
         print("\n任务完成。浏览器将在5秒后自动关闭。")
@@ -1,106 +1,182 @@
 import os
-import requests
-import json
-import shutil
+import time
+import asyncio
+import argparse
 from dotenv import load_dotenv
-from datetime import date
+from datetime import date, timedelta
 
-def fetch_and_save_html(area_id: str, area_name: str, target_date: date, headers: dict, save_dir: str) -> bool:
-    base_url = "https://mrbs.xjtlu.edu.cn/index.php"
-    params = {
-        'view': 'day',
-        'view_all': 1,
-        'page_date': target_date.isoformat(),
-        'area': area_id,
-    }
-    print(f"  [请求] -> ID: {area_id:<4} 名称: {area_name}...")
-    try:
-        response = requests.get(base_url, params=params, headers=headers, timeout=15)
-        response.raise_for_status()
-
-        if 'sso.xjtlu.edu.cn' in response.url:
-            print(f"  [失败] -> ID: {area_id:<4} Cookie已过期或无效。")
-            return False
-
-        file_path = os.path.join(save_dir, f"area_{area_id}.html")
-        with open(file_path, 'w', encoding='utf-8') as f:
-            f.write(response.text)
-        print(f"  [成功] -> ID: {area_id:<4} 数据已保存至 {file_path}")
-        return True
-
-    except requests.exceptions.RequestException as e:
-        print(f"  [失败] -> ID: {area_id:<4} 网络错误: {e}")
-        return False
-
-def setup_directories(today_str: str) -> str:
-    base_dir = os.path.dirname(os.path.abspath(__file__))
-    today_dir_name = f"pages_{today_str}"
-    today_full_path = os.path.join(base_dir, today_dir_name)
-
-    for item in os.listdir(base_dir):
-        if item.startswith("pages_") and item != today_dir_name:
-            full_item_path = os.path.join(base_dir, item)
-            if os.path.isdir(full_item_path):
-                print(f"清理过期文件夹: {item}")
-                shutil.rmtree(full_item_path)
+import area_mapping
+import session
+from checkpoint import area_of, mark_incomplete, clear_incomplete
+from fetch_run import FetchRun, StreamRun
+from pagestore import PageStore, DEFAULT_KEEP_DAYS, DEFAULT_KEEP_LAST
+from mrbs_pages import DAY_PARSERS, DEFAULT_DAY_PARSER
+from fetcher import (FetchScheduler, RetryPolicy, SessionExpired, latency_stats, BASE_URL,
+                     DEFAULT_CONCURRENCY, DEFAULT_TIMEOUT, DEFAULT_RATE, DEFAULT_MAX_ATTEMPTS,
+                     DEFAULT_RETRY_BUDGET)
 
-    os.makedirs(today_full_path, exist_ok=True)
-    return today_full_path
+def parse_args():
+    parser = argparse.ArgumentParser(description="并发抓取 MRBS 各区域的日视图/周视图页面")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY,
+                        help=f"同时在途的最大请求数（默认 {DEFAULT_CONCURRENCY}）")
+    parser.add_argument("--timeout", type=float, default=DEFAULT_TIMEOUT,
+                        help=f"单个请求超时秒数（默认 {DEFAULT_TIMEOUT}）")
+    parser.add_argument("--start-date", type=date.fromisoformat, default=None,
+                        help="起始日期 YYYY-MM-DD（默认今天）")
+    parser.add_argument("--days", type=int, default=1,
+                        help="抓取从起始日期开始的连续天数（默认 1）")
+    parser.add_argument("--view", choices=["day", "week"], default=None,
+                        help="day：每天单独请求；week：用周视图一次取多天（多天时默认 week）")
+    parser.add_argument("--no-archive", action="store_true",
+                        help="不把页面归档到 page_archive/（内容寻址、压缩、跨快照去重）")
+    parser.add_argument("--archive-keep-days", type=int, default=DEFAULT_KEEP_DAYS,
+                        help=f"归档快照保留天数（默认 {DEFAULT_KEEP_DAYS}）")
+    parser.add_argument("--archive-keep-last", type=int, default=DEFAULT_KEEP_LAST,
+                        help=f"无论多旧都保留的最近快照个数（默认 {DEFAULT_KEEP_LAST}）")
+    parser.add_argument("--rate", type=float, default=DEFAULT_RATE,
+                        help=f"每秒请求数上限，遇到 429/503 会自动降速（默认 {DEFAULT_RATE:g}）")
+    parser.add_argument("--max-attempts", type=int, default=DEFAULT_MAX_ATTEMPTS,
+                        help=f"单个请求最多尝试次数，含首次（默认 {DEFAULT_MAX_ATTEMPTS}）")
+    parser.add_argument("--retry-budget", type=float, default=DEFAULT_RETRY_BUDGET,
+                        help=f"整次运行的重试次数占请求总数的上限比例（默认 {DEFAULT_RETRY_BUDGET:g}）")
+    parser.add_argument("--base-url", default=os.getenv("MRBS_BASE_URL", BASE_URL),
+                        help="MRBS index.php 地址，可指向本地的 fake_mrbs.py（默认取环境变量 MRBS_BASE_URL）")
+    parser.add_argument("--mapping-ttl", type=float, default=area_mapping.DEFAULT_TTL_HOURS,
+                        help=f"area_mapping.json 的有效期（小时），过期才重新核对（默认 {area_mapping.DEFAULT_TTL_HOURS}）")
+    parser.add_argument("--areas", type=lambda s: [x for x in s.replace(",", " ").split() if x], default=None,
+                        help="只抓取这些区域（逗号分隔），默认全部")
+    parser.add_argument("--max-age", type=float, default=None,
+                        help="只抓取上次成功抓取距今超过这么多分钟的区域（默认全部重新核对）")
+    parser.add_argument("--resume", action="store_true",
+                        help="接着上次的断点清单继续：只重抓上次失败、未完成或文件已丢失的区域")
+    parser.add_argument("--ignore-session-state", action="store_true",
+                        help="即使 session_state.json 记录当前 Cookie 已过期也照常抓取")
+    parser.add_argument("--stream", action="store_true",
+                        help="流式模式：抓到的页面直接解析、压缩成 ready_data_ 向量，不写 pages_/data_ 中间文件")
+    parser.add_argument("--parser", choices=sorted(DAY_PARSERS), default=DEFAULT_DAY_PARSER,
+                        help=f"流式模式的日视图解析器（默认 {DEFAULT_DAY_PARSER}；bs4 为 BeautifulSoup 参照实现）")
+    return parser.parse_args()
 
 if __name__ == "__main__":
     print("--- MRBS数据抓取引擎 ---")
-
-    # 1. 初始化和加载
+    # 1. 初始化和加载（先读 .env，MRBS_BASE_URL 可以写在里面）
     load_dotenv()
+    args = parse_args()
     auth_cookie = os.getenv('MRBS_COOKIE')
     if not auth_cookie:
         print("错误：未找到Cookie，请先运行auth.py。")
         exit()
+    if not args.ignore_session_state:
+        proceed, message = session.fetch_gate(auth_cookie)
+        if message:
+            print(message)
+        if not proceed:
+            exit(1)
 
-    try:
-        with open('area_mapping.json', 'r', encoding='utf-8') as f:
-            area_map = json.load(f)
-    except FileNotFoundError:
+    # 区域映射在 TTL 内直接使用缓存，过期时最多多发一个请求核对
+    old_map = area_mapping.load_mapping('area_mapping.json')
+    mapping = area_mapping.refresh_mapping(auth_cookie, 'area_mapping.json', args.mapping_ttl,
+                                           base_url=args.base_url)
+    area_mapping.report(mapping, old_map)
+    area_map = mapping.area_map
+    if not area_map:
         print("错误：找不到 'area_mapping.json' 文件。请先运行 auth.py 生成。")
         exit()
 
-    # 2. 设置目录和日期
-    today_obj = date.today()
-    today_str_formatted = today_obj.strftime("%d-%m-%Y")
-    save_directory = setup_directories(today_str_formatted)
-    print(f"数据将保存在: {save_directory}\n")
-
-    # 3. 默认抓取全部
-    ids_to_fetch = list(area_map.keys())
-    print(f"[默认] 将抓取全部 {len(ids_to_fetch)} 个区域。")
+    # 2. 日期范围与视图
+    start_date = args.start_date or date.today()
+    dates = [start_date + timedelta(days=i) for i in range(max(1, args.days))]
+    view = args.view or ("week" if len(dates) > 1 else "day")
+    print(f"日期范围: {dates[0]} ~ {dates[-1]}（{len(dates)} 天，{view} 视图）")
 
-    # 4. 准备请求并开始抓取
-    request_headers = {
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-        'Cookie': auth_cookie
-    }
-    
-    print(f"\n--- 开始抓取 {len(ids_to_fetch)} 个区域的数据 ---")
-    success_count = 0
-    fail_count = 0
+    # 3. 默认抓取全部；--areas 只抓取指定区域（按给出的顺序优先发出）
+    if args.areas:
+        ids_to_fetch = [aid for aid in args.areas if aid in area_map]
+        unknown = [aid for aid in args.areas if aid not in area_map]
+        if unknown:
+            print(f"[警告] area_mapping.json 中没有这些区域，已忽略: {', '.join(unknown)}")
+        print(f"[指定] 将抓取 {len(ids_to_fetch)} 个区域。")
+    else:
+        ids_to_fetch = list(area_map.keys())
+        print(f"[默认] 将抓取全部 {len(ids_to_fetch)} 个区域。")
 
-    for area_id in ids_to_fetch:
-        area_name = area_map.get(area_id, "")
-        is_success = fetch_and_save_html(
-            area_id=area_id, 
-            area_name=area_name,
-            target_date=today_obj, 
-            headers=request_headers,
-            save_dir=save_directory
-        )
-        if is_success:
-            success_count += 1
+    # 4. 并发抓取，结果按完成顺序落盘到 pages_dd-mm-yyyy（流式模式直接写 ready_data_dd-mm-yyyy）
+    print(f"\n--- 开始抓取 {len(ids_to_fetch)} 个区域的数据（并发 {args.concurrency}）---")
+    area_items = [(area_id, area_map.get(area_id, "")) for area_id in ids_to_fetch]
+    store = None if args.no_archive else PageStore()
+    scheduler = FetchScheduler(rate=args.rate,
+                               retry=RetryPolicy(max_attempts=max(1, args.max_attempts),
+                                                 budget_ratio=args.retry_budget))
+    if args.stream:
+        run = StreamRun(auth_cookie, args.concurrency, args.timeout, store, scheduler,
+                        base_url=args.base_url, resume=args.resume, max_age=args.max_age,
+                        area_map=area_map, parser=args.parser)
+    else:
+        run = FetchRun(auth_cookie, args.concurrency, args.timeout, store, scheduler,
+                       base_url=args.base_url, resume=args.resume, max_age=args.max_age)
+    t_start = time.perf_counter()
+    try:
+        if view == "week":
+            asyncio.run(run.fetch_weeks(area_items, dates))
         else:
-            fail_count += 1
+            asyncio.run(run.fetch_days(area_items, dates))
+    except KeyboardInterrupt:
+        if args.stream:
+            run.publish()
+        print("\n[中断] 已完成的区域记录在 _checkpoint.json 中，可用 --resume 继续。")
+        exit(130)
+    wall_clock = time.perf_counter() - t_start
+    stats = latency_stats(run.results)
+    # 把这次抓取观察到的会话状态记下来，供下次抓取前和 keepalive.py 使用
+    if isinstance(run.aborted, SessionExpired):
+        session.record(auth_cookie, False, str(run.aborted))
+    elif any(r.ok for r in run.results):
+        session.record(auth_cookie, True)
+    counts = run.counts
+
+    if store is not None and run.archived:
+        snapshot_id = store.write_snapshot(run.archived)
+        gc_res = store.gc(keep_days=args.archive_keep_days, keep_last=args.archive_keep_last)
+        st = store.stats()
+        print(f"\n[归档] 快照 {snapshot_id}：{len(run.archived)} 个页面；"
+              f"归档共 {st['blobs']} 个 blob，{st['bytes'] / 1024:.1f} KiB"
+              f"（本次清理快照 {gc_res['snapshots_removed']} 个、blob {gc_res['blobs_removed']} 个）")
 
     # 5. 打印总结报告
     print("\n--- 抓取任务完成 ---")
-    print(f"总计: {len(ids_to_fetch)} 个请求")
-    print(f"成功: {success_count}")
-    print(f"失败: {fail_count}")
+    print(f"总计: {len(run.results)} 个请求")
+    print(f"成功: {counts['changed'] + counts['unchanged']} （其中未变化 {counts['unchanged']}）")
+    print(f"失败: {counts['failed']}")
+    if run.fresh:
+        print(f"仍在有效期内: {run.fresh} 个请求未发出（--max-age {args.max_age:g} 分钟）")
+    if run.resumed:
+        print(f"断点续抓: 跳过上次已完成的 {run.resumed} 个请求")
+    missing = {d: cp.missing() for d, cp in run.checkpoints.items() if cp.missing()}
+    for d, keys in sorted(missing.items()):
+        print(f"不完整: {run.dir_label(d)} 缺少 {len(keys)} 个页面（{', '.join(keys[:10])}"
+              f"{' ...' if len(keys) > 10 else ''}），已记录在 _checkpoint.json 中")
+    if missing:
+        print("可运行 python 2-getdata.py --resume 只补抓这些区域。")
+    if args.stream:
+        # 周视图只在每轮起始日期的目录里有断点清单，把缺失的区域标记到本次覆盖的每个 ready_data_ 目录
+        lacking = sorted({area_of(k) for keys in missing.values() for k in keys}, key=lambda x: (len(x), x))
+        for d in dates:
+            if d in run.dirs:
+                if lacking:
+                    mark_incomplete(run.dirs[d], lacking, "2-getdata.py --stream")
+                else:
+                    clear_incomplete(run.dirs[d])
+        run.publish()
+    if args.stream:
+        print(f"向量: {run.vectors} 条（已直接写入 ready_data_，无需再运行 3/4）")
+    print(f"重试: {scheduler.retries_used} 次（预算 {scheduler.retry_budget}），结束时限速 {scheduler.bucket.rate:.1f} 次/秒")
+    print(f"总耗时: {wall_clock:.2f} s")
+    print(f"单请求耗时: 平均 {stats['mean']*1000:.0f} ms | p50 {stats['p50']*1000:.0f} ms | "
+          f"p90 {stats['p90']*1000:.0f} ms | 最大 {stats['max']*1000:.0f} ms")
+    if run.aborted:
+        print(f"本次抓取已中止：{run.aborted}")
+        if isinstance(run.aborted, SessionExpired):
+            print("请先重新运行 1-auth.py 登录，再重新抓取。")
     print("----------------------")
+    if run.aborted:
+        exit(1)
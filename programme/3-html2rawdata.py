@@ -1,148 +1,389 @@
 import os
 import json
-import shutil # <--- 确保导入
-from bs4 import BeautifulSoup
-
-def parse_html_to_schedule(html_content: str, area_id: str, area_map: dict) -> list | None:
-    # ... (这个核心解析函数保持不变)
-    soup = BeautifulSoup(html_content, 'html.parser')
-    schedule_table = soup.find('table', id='day_main')
-    if not schedule_table: return None
-    header_row = schedule_table.find('thead').find('tr')
-    rooms_metadata = []
-    for th in header_row.find_all('th')[1:]:
-        room_data = {}
-        link = th.find('a')
-        if not link: continue
-        room_data['room_id'] = th.get('data-room')
-        room_name_full = link.get_text(strip=True)
-        capacity_span = link.find('span', class_='capacity')
-        if capacity_span:
-            capacity_text = capacity_span.text
-            room_data['room_name'] = room_name_full.replace(capacity_text, '').strip()
-            room_data['capacity'] = int(capacity_text)
-        else:
-            room_data['room_name'] = room_name_full
-            room_data['capacity'] = None
-        room_data['facilities'] = link.get('title', '').replace('View Week', '').strip()
-        room_data['area_id'] = area_id
-        room_data['area_name'] = area_map.get(area_id, "未知区域")
-        room_data['schedule'] = {}
-        rooms_metadata.append(room_data)
-    body_rows = schedule_table.find('tbody').find_all('tr')
-    rowspan_counters = [0] * len(rooms_metadata)
-    rowspan_booking_names = [None] * len(rooms_metadata) 
-    for row in body_rows:
-        time_slot = row.find('th').get_text(strip=True)
-        all_cells = row.find_all('td')
-        cell_cursor = 0
-        for room_index in range(len(rooms_metadata)):
-            if rowspan_counters[room_index] > 0:
-                booking_name = rowspan_booking_names[room_index]
-                rooms_metadata[room_index]['schedule'][time_slot] = booking_name
-                rowspan_counters[room_index] -= 1
-                continue
-            if cell_cursor >= len(all_cells): break
-            cell = all_cells[cell_cursor]
-            if 'new' in cell.get('class', []):
-                rooms_metadata[room_index]['schedule'][time_slot] = "Available"
-            elif 'booked' in cell.get('class', []):
-                booking_link = cell.find('a')
-                booking_name = booking_link.get_text(strip=True) if booking_link and booking_link.get_text(strip=True) else "Booked"
-                rooms_metadata[room_index]['schedule'][time_slot] = booking_name
-                if cell.has_attr('rowspan'):
-                    rowspan_value = int(cell['rowspan'])
-                    if rowspan_value > 1:
-                        rowspan_counters[room_index] = rowspan_value - 1
-                        rowspan_booking_names[room_index] = booking_name
-            cell_cursor += 1
-    return rooms_metadata
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from datetime import date
+from pathlib import Path
+
+import refresh
+import dated_dirs
+import checkpoint
+import slots
+from mrbs_pages import (page_state_key, day_parser, day_slots_parser, parse_week_html_to_schedules,
+                        DAY_PARSERS, DEFAULT_DAY_PARSER, PARSER_VERSION)
 
 def setup_io_directories():
     """
-    (已升级) 自动查找最新的输入目录，创建对应的输出目录，并清理旧的输出目录。
+    查找今天及以后的全部 pages_ 输入目录（没有则退回最新的一个），并清理过期的 data_ 目录。
+    返回 [(输入目录, 日期), ...]。
     """
-    try:
-        base_dir = os.path.dirname(os.path.abspath(__file__))
-        input_dirs = [d for d in os.listdir(base_dir) if os.path.isdir(d) and d.startswith('pages_')]
-        input_dirs.sort(reverse=True)
-        latest_input_dir = input_dirs[0]
-        
-        output_dir_name = latest_input_dir.replace('pages_', 'data_')
-        
-        # 新增的清理逻辑
-        for item in os.listdir(base_dir):
-            if item.startswith("data_") and item != output_dir_name:
-                full_item_path = os.path.join(base_dir, item)
-                if os.path.isdir(full_item_path):
-                    print(f"[清理] -> 正在删除过期的data文件夹: {item}")
-                    shutil.rmtree(full_item_path)
-        
-        output_full_path = os.path.join(base_dir, output_dir_name)
-        os.makedirs(output_full_path, exist_ok=True)
-        
-        print(f"[INFO] 输入目录: {latest_input_dir}")
-        print(f"[INFO] 输出目录: {output_dir_name}")
-        
-        return os.path.join(base_dir, latest_input_dir), output_full_path
-        
-    except IndexError:
+    base_dir = Path(os.path.dirname(os.path.abspath(__file__)))
+    inputs = dated_dirs.current_dirs(base_dir, "pages_")
+    if not inputs:
         print("[ERROR] 找不到任何 'pages_*' 文件夹。请先运行抓取脚本。")
-        return None, None
+        return []
+    dated_dirs.remove_expired(base_dir, "data_", log=lambda msg: print(f"[清理] -> {msg}"))
+    for d, p in inputs:
+        print(f"[INFO] 输入目录: {p.name} -> 输出目录: {dated_dirs.dir_name('data_', d)}")
+    return [(str(p), d) for d, p in inputs]
+
+def output_dir_for(d: date, pinned: tuple | None = None) -> str:
+    """
+    d 日期的 data_ 输出目录。pinned=(日期, 目录) 来自 --output-dir：该日期写到指定目录，
+    周视图覆盖的其他日期写到它旁边同名规则的 data_ 目录。
+    """
+    if pinned is not None:
+        pin_date, pin_dir = pinned
+        out = pin_dir if d == pin_date else os.path.join(os.path.dirname(os.path.abspath(pin_dir)),
+                                                         dated_dirs.dir_name("data_", d))
+    else:
+        out = os.path.join(os.path.dirname(os.path.abspath(__file__)), dated_dirs.dir_name("data_", d))
+    os.makedirs(out, exist_ok=True)
+    return out
+
+def list_page_ids(input_dir: str):
+    """返回 (日视图 id 列表, 周视图 id 列表)。"""
+    day_ids, week_ids = [], []
+    for f in os.listdir(input_dir):
+        if not f.startswith('area_'):
+            continue
+        if f.endswith('.week.html'):
+            week_ids.append(f[len('area_'):-len('.week.html')])
+        elif f.endswith('.html'):
+            day_ids.append(f[len('area_'):-len('.html')])
+    return day_ids, week_ids
+
+class Counter:
+    def __init__(self):
+        self.success = 0
+        self.fail = 0
+        self.skip = 0
+
+    def add(self, result: "TaskResult") -> None:
+        self.success += result.success
+        self.fail += result.fail
+        self.skip += result.skip
+
+def write_schedule(parsed_data, json_file_path: str) -> str:
+    """写出一个区域的日程，返回文件内容的 sha256（记入构建清单）。"""
+    if isinstance(parsed_data, slots.AreaSlots):
+        # 紧凑形式不缩进，否则每个编码各占一行
+        text = json.dumps(parsed_data.to_json(), ensure_ascii=False, separators=(",", ":"))
+    else:
+        text = json.dumps(parsed_data, indent=2, ensure_ascii=False)
+    data = text.encode('utf-8')
+    # 先写临时文件再替换，中途被杀或多进程同时运行都不会留下半个文件
+    tmp = f"{json_file_path}.{os.getpid()}.tmp"
+    with open(tmp, 'wb') as f:
+        f.write(data)
+    os.replace(tmp, json_file_path)
+    return refresh.bytes_hash(data)
+
+def tool_id(out_format: str) -> str:
+    """构建清单中的工具版本：解析规则版本 + 输出格式，任一变化都会让已有结果失效。"""
+    return f"html2raw/{PARSER_VERSION}/{out_format}"
+
+# ---------- 解析任务（可在子进程中执行） ----------
+
+@dataclass
+class TaskResult:
+    success: int = 0
+    fail: int = 0
+    skip: int = 0
+    updates: dict = field(default_factory=dict)    # {输出目录: {area_id: 状态记录}}
+    fetched: dict = field(default_factory=dict)    # {输出目录: {area_id: pages_ 中的抓取记录}}，用于带上 fetched_at
+    lines: list = field(default_factory=list)       # 要打印的日志
+
+_WORKER: dict = {}
+
+def init_worker(area_map: dict, parser: str, out_format: str = "slots", force: bool = False) -> None:
+    _WORKER["area_map"] = area_map
+    _WORKER["parse_day"] = day_slots_parser(parser) if out_format == "slots" else day_parser(parser)
+    _WORKER["format"] = out_format
+    _WORKER["tool"] = tool_id(out_format)
+    _WORKER["force"] = force
+
+def is_built(data_state: dict, area_id: str, src_hash: str | None, json_file_path: str) -> bool:
+    return not _WORKER["force"] and refresh.is_built(data_state, area_id, src_hash, json_file_path, _WORKER["tool"])
+
+def manifest_entry(src_hash: str, out_hash: str) -> dict:
+    return {"source_hash": src_hash, "input": src_hash, "output": out_hash, "tool": _WORKER["tool"]}
+
+def process_day_page(area_id: str, input_dir: str, page_date: date, pages_state: dict,
+                     pinned: tuple | None = None) -> TaskResult:
+    res = TaskResult()
+    html_file_path = os.path.join(input_dir, f"area_{area_id}.html")
+    output_dir = output_dir_for(page_date, pinned)
+    data_state = refresh.load_state(output_dir)
+    json_file_path = os.path.join(output_dir, f"area_{area_id}.json")
+    src_hash = refresh.source_hash(pages_state, area_id)
+    fetched = {output_dir: {area_id: pages_state.get(area_id)}}
+    if is_built(data_state, area_id, src_hash, json_file_path):
+        res.lines.append(f"  [未变] -> ID: {area_id:<4} 页面内容未变化，沿用已有结果。")
+        res.skip += 1
+        res.fetched = fetched
+        return res
+    with open(html_file_path, 'r', encoding='utf-8') as f:
+        html_content = f.read()
+    src_hash = src_hash or refresh.day_main_hash(html_content)
+    if is_built(data_state, area_id, src_hash, json_file_path):
+        res.lines.append(f"  [未变] -> ID: {area_id:<4} 页面内容未变化，沿用已有结果。")
+        res.skip += 1
+        res.fetched = fetched
+        return res
+    parsed_data = _WORKER["parse_day"](html_content, area_id, _WORKER["area_map"])
+    if parsed_data:
+        out_hash = write_schedule(parsed_data, json_file_path)
+        res.updates[output_dir] = {area_id: manifest_entry(src_hash, out_hash)}
+        res.fetched = fetched
+        res.lines.append(f"  [成功] -> ID: {area_id:<4} 结果已保存至 {json_file_path}")
+        res.success += 1
+    else:
+        res.lines.append(f"  [失败] -> ID: {area_id:<4} 解析HTML时出错: {html_file_path}")
+        res.fail += 1
+    return res
+
+def week_output_dirs(area_id: str, page_date: date, entry: dict | None, pinned: tuple | None = None):
+    """抓取记录中周视图覆盖、且由它产出的日期的 data_ 目录（起始日期之前、有单独日视图的日期不算）。"""
+    base_dir = os.path.dirname(os.path.abspath(__file__))
+    out = []
+    for d in (date.fromisoformat(x) for x in (entry or {}).get("dates", [])):
+        if d < page_date or os.path.exists(os.path.join(base_dir, dated_dirs.dir_name("pages_", d),
+                                                        f"area_{area_id}.html")):
+            continue
+        out.append(output_dir_for(d, pinned))
+    return out
+
+def week_is_built(area_id: str, page_date: date, entry: dict | None, src_hash: str | None,
+                  pinned: tuple | None = None) -> bool:
+    """抓取记录中的周视图日期都已按同一来源哈希构建过（有单独日视图的日期不算）时，不必再解析整页。"""
+    if not src_hash or not (entry or {}).get("dates"):
+        return False
+    return all(is_built(refresh.load_state(output_dir), area_id, src_hash,
+                        os.path.join(output_dir, f"area_{area_id}.json"))
+               for output_dir in week_output_dirs(area_id, page_date, entry, pinned))
+
+def process_week_page(area_id: str, input_dir: str, page_date: date, pages_state: dict,
+                      pinned: tuple | None = None) -> TaskResult:
+    """
+    把一个周视图页面拆成按日期的输出 data_dd-mm-yyyy/area_{id}.json。
+    只写起始日期及以后的日期；某天若另有单独抓取的日视图页面，以日视图为准。
+    """
+    res = TaskResult()
+    base_dir = os.path.dirname(os.path.abspath(__file__))
+    html_file_path = os.path.join(input_dir, f"area_{area_id}.week.html")
+    key = page_state_key(area_id, "week")
+    src_hash = refresh.source_hash(pages_state, key)
+    if week_is_built(area_id, page_date, pages_state.get(key), src_hash, pinned):
+        res.skip += 1
+        res.fetched = {output_dir: {area_id: pages_state.get(key)}
+                       for output_dir in week_output_dirs(area_id, page_date, pages_state.get(key), pinned)}
+        return res
+    with open(html_file_path, 'r', encoding='utf-8') as f:
+        html_content = f.read()
+    src_hash = src_hash or refresh.day_main_hash(html_content)
+    per_day = parse_week_html_to_schedules(html_content, area_id, _WORKER["area_map"])
+    if not per_day:
+        res.lines.append(f"  [失败] -> ID: {area_id:<4} 无法识别周视图表格: {html_file_path}")
+        res.fail += 1
+        return res
+    for d, parsed_data in sorted(per_day.items()):
+        if d < page_date:
+            continue
+        if _WORKER["format"] == "slots":
+            parsed_data = slots.from_rooms(parsed_data, area_id, _WORKER["area_map"].get(area_id, "未知区域"))
+        day_page = os.path.join(base_dir, dated_dirs.dir_name("pages_", d), f"area_{area_id}.html")
+        if os.path.exists(day_page):
+            continue
+        output_dir = output_dir_for(d, pinned)
+        data_state = refresh.load_state(output_dir)
+        json_file_path = os.path.join(output_dir, f"area_{area_id}.json")
+        res.fetched[output_dir] = {area_id: pages_state.get(key)}
+        if is_built(data_state, area_id, src_hash, json_file_path):
+            res.skip += 1
+            continue
+        out_hash = write_schedule(parsed_data, json_file_path)
+        res.updates.setdefault(output_dir, {})[area_id] = manifest_entry(src_hash, out_hash)
+        res.lines.append(f"  [成功] -> ID: {area_id:<4} {d} 结果已保存至 {json_file_path}")
+        res.success += 1
+    return res
+
+def run_tasks(tasks, area_map: dict, parser: str, jobs: int, counter: Counter, out_format: str = "slots",
+              force: bool = False) -> None:
+    """
+    执行 (函数, 参数) 任务列表。jobs > 1 时分给进程池并行解析；各任务只写自己的输出文件，
+    _refresh.json 由主进程在每个任务完成后统一合并写入，避免并发写同一个状态文件。
+    """
+    states: dict = {}
+
+    def collect(result: TaskResult) -> None:
+        for line in result.lines:
+            print(line)
+        counter.add(result)
+        for output_dir in set(result.updates) | set(result.fetched):
+            state = states.setdefault(output_dir, refresh.load_state(output_dir))
+            state.update(result.updates.get(output_dir, {}))
+            carried = [refresh.carry_fetched_at(state, aid, entry)
+                       for aid, entry in result.fetched.get(output_dir, {}).items()]
+            if output_dir in result.updates or any(carried):
+                refresh.save_state(output_dir, state)
+
+    if jobs <= 1 or len(tasks) <= 1:
+        init_worker(area_map, parser, out_format, force)
+        for fn, args in tasks:
+            collect(fn(*args))
+        return
+    with ProcessPoolExecutor(max_workers=jobs, initializer=init_worker,
+                             initargs=(area_map, parser, out_format, force)) as pool:
+        futures = {pool.submit(fn, *args): args for fn, args in tasks}
+        for fut in as_completed(futures):
+            try:
+                collect(fut.result())
+            except Exception as e:
+                area_id, input_dir = futures[fut][:2]
+                print(f"  [失败] -> ID: {area_id:<4} {os.path.basename(input_dir)} 处理时出错：{e}")
+                counter.fail += 1
+
+def check_complete(inputs, allow_incomplete: bool):
+    """
+    抓取未完成的 pages_ 目录默认跳过；allow_incomplete 时照常处理，返回 {输入目录: 缺失区域}，
+    用于在输出目录中做 _incomplete.json 标记。
+    """
+    kept, missing = [], {}
+    for input_dir, page_date in inputs:
+        areas = checkpoint.incomplete_areas(input_dir)
+        if areas and not allow_incomplete:
+            print(f"[跳过] {os.path.basename(input_dir)} 抓取不完整（缺少 {len(areas)} 个区域："
+                  f"{', '.join(areas[:10])}{' ...' if len(areas) > 10 else ''}）。"
+                  f"请先运行 2-getdata.py --resume 补齐，或加 --allow-incomplete 强制处理。")
+            continue
+        if areas:
+            print(f"[警告] {os.path.basename(input_dir)} 抓取不完整，缺少 {len(areas)} 个区域，输出将标记为不完整。")
+        missing[input_dir] = areas
+        kept.append((input_dir, page_date))
+    return kept, missing
+
+def mark_outputs(input_dir: str, page_date: date, pages_state: dict, areas, pinned: tuple | None = None):
+    """把输入目录的完整性传给它产出的 data_ 目录（当天，以及周视图覆盖的之后几天）。"""
+    days = {page_date}
+    for key, entry in pages_state.items():
+        if key.startswith("week:") and isinstance(entry, dict):
+            days.update(x for x in (date.fromisoformat(v) for v in entry.get("dates", [])) if x >= page_date)
+    for d in sorted(days):
+        out = output_dir_for(d, pinned)
+        if areas:
+            checkpoint.mark_incomplete(out, areas, os.path.basename(input_dir))
+        else:
+            checkpoint.clear_incomplete(out)
+
+def input_from_arg(path: str):
+    """--input-dir 指定的 pages_ 目录；日期取自目录名，无法识别时按今天处理。"""
+    p = Path(path)
+    if not p.is_dir():
+        print(f"[ERROR] 输入目录不存在：{path}")
+        return []
+    d = dated_dirs.parse_dir_date(p.name, "pages_") or date.today()
+    print(f"[INFO] 输入目录: {p.name}（{d}）")
+    return [(str(p), d)]
+
+def ask_ids(available_ids):
+    print("\n可处理的Area ID:", ", ".join(available_ids))
+    user_input = input("请输入要处理的Area ID (单个或多个，用逗号/空格分隔), 或输入 'all' 处理全部:\n> ")
+    if user_input.strip().lower() == 'all':
+        return available_ids
+    cleaned_input = user_input.replace(',', ' ')
+    return [item.strip() for item in cleaned_input.split() if item.strip()]
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="把 pages_ 中的 HTML 解析成 data_ 中的日程 JSON")
+    which = parser.add_mutually_exclusive_group()
+    which.add_argument("--all", action="store_true", help="处理全部区域，不再询问")
+    which.add_argument("--ids", default=None, help="要处理的区域，逗号/空格分隔，不再询问")
+    parser.add_argument("--input-dir", default=None,
+                        help="只处理这个 pages_ 目录（默认今天及以后的全部 pages_ 目录）")
+    parser.add_argument("--output-dir", default=None,
+                        help="输入目录当天的结果写到这里（需配合 --input-dir；周视图的其他日期写到它旁边的 data_ 目录）")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1,
+                        help="并行解析的进程数（默认 CPU 核数；1 为单进程）")
+    parser.add_argument("--format", choices=["slots", "rooms"], default="slots",
+                        help="输出格式：slots 为紧凑的共享时段轴 + 编码数组（默认），rooms 为逐房间的 {时刻: 预订名}")
+    parser.add_argument("--force", action="store_true",
+                        help="忽略构建清单，所选区域全部重新解析")
+    parser.add_argument("--allow-incomplete", action="store_true",
+                        help="处理抓取未完成的 pages_ 目录，并在输出中标记缺失的区域")
+    parser.add_argument("--parser", choices=sorted(DAY_PARSERS), default=DEFAULT_DAY_PARSER,
+                        help=f"日视图解析器（默认 {DEFAULT_DAY_PARSER}；bs4 为 BeautifulSoup 参照实现，速度见 bench_parse.py）")
+    args = parser.parse_args()
+    if args.output_dir and not args.input_dir:
+        parser.error("--output-dir 需要同时指定 --input-dir")
+    return args
 
 # ==============================================================================
-#  主程序执行块 (逻辑不变)
+#  主程序执行块
 # ==============================================================================
 if __name__ == "__main__":
     print("--- 原始HTML数据处理器 ---")
-    input_dir, output_dir = setup_io_directories()
-    if not input_dir: exit()
+    args = parse_args()
+    inputs = input_from_arg(args.input_dir) if args.input_dir else setup_io_directories()
+    if not inputs: exit(1)
+    inputs, missing_by_input = check_complete(inputs, args.allow_incomplete)
+    if not inputs: exit(1)
     try:
-        with open('area_mapping.json', 'r', encoding='utf-8') as f:
+        with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'area_mapping.json'),
+                  'r', encoding='utf-8') as f:
             area_map = json.load(f)
     except FileNotFoundError:
         print("[ERROR] 找不到 'area_mapping.json' 文件。")
-        exit()
-    available_files = [f for f in os.listdir(input_dir) if f.startswith('area_') and f.endswith('.html')]
-    available_ids = sorted([f.replace('area_', '').replace('.html', '') for f in available_files], key=int)
+        exit(1)
+    pinned = (inputs[0][1], os.path.abspath(args.output_dir)) if args.output_dir else None
+    pages = {}
+    for input_dir, page_date in inputs:
+        pages[input_dir] = list_page_ids(input_dir)
+    available_ids = sorted({aid for day_ids, week_ids in pages.values() for aid in day_ids + week_ids}, key=int)
     if not available_ids:
         print("[INFO] 输入目录中没有找到可处理的html文件。")
         exit()
-    print("\n可处理的Area ID:", ", ".join(available_ids))
-    user_input = input("请输入要处理的Area ID (单个或多个，用逗号/空格分隔), 或输入 'all' 处理全部:\n> ")
-    ids_to_process = []
-    if user_input.strip().lower() == 'all':
+    if args.all:
         ids_to_process = available_ids
+    elif args.ids is not None:
+        ids_to_process = [x for x in args.ids.replace(',', ' ').split() if x]
     else:
-        cleaned_input = user_input.replace(',', ' ')
-        ids_to_process = [item.strip() for item in cleaned_input.split() if item.strip()]
+        ids_to_process = ask_ids(available_ids)
     if not ids_to_process:
         print("未输入有效的ID，程序退出。")
         exit()
-    print(f"\n--- 开始处理 {len(ids_to_process)} 个文件 ---")
-    success_count = 0
-    fail_count = 0
-    for area_id in ids_to_process:
-        html_file_path = os.path.join(input_dir, f"area_{area_id}.html")
-        if not os.path.exists(html_file_path):
-            print(f"  [跳过] -> ID: {area_id:<4} 对应的HTML文件不存在。")
-            fail_count += 1
-            continue
-        print(f"  [处理] -> ID: {area_id:<4} 文件: {html_file_path}")
-        with open(html_file_path, 'r', encoding='utf-8') as f:
-            html_content = f.read()
-        parsed_data = parse_html_to_schedule(html_content, area_id, area_map)
-        if parsed_data:
-            json_file_path = os.path.join(output_dir, f"area_{area_id}.json")
-            with open(json_file_path, 'w', encoding='utf-8') as f:
-                json.dump(parsed_data, f, indent=2, ensure_ascii=False)
-            print(f"  [成功] -> ID: {area_id:<4} 结果已保存至 {json_file_path}")
-            success_count += 1
-        else:
-            print(f"  [失败] -> ID: {area_id:<4} 解析HTML时出错。")
-            fail_count += 1
+
+    counter = Counter()
+    tasks = []
+    for input_dir, page_date in inputs:
+        day_ids, week_ids = pages[input_dir]
+        pages_state = refresh.load_state(input_dir)
+        for area_id in ids_to_process:
+            if area_id in day_ids:
+                tasks.append((process_day_page, (area_id, input_dir, page_date,
+                                                 {area_id: pages_state.get(area_id)}, pinned)))
+            if area_id in week_ids:
+                key = page_state_key(area_id, "week")
+                tasks.append((process_week_page, (area_id, input_dir, page_date,
+                                                  {key: pages_state.get(key)}, pinned)))
+            if area_id not in day_ids and area_id not in week_ids and len(inputs) == 1:
+                print(f"  [跳过] -> ID: {area_id:<4} 对应的HTML文件不存在。")
+                counter.fail += 1
+    jobs = max(1, min(args.jobs, len(tasks)))
+    print(f"\n--- 开始处理 {len(ids_to_process)} 个区域（{len(tasks)} 个页面，{jobs} 个进程）---")
+    t_start = time.perf_counter()
+    run_tasks(tasks, area_map, args.parser, jobs, counter, args.format, args.force)
+    for input_dir, page_date in inputs:
+        mark_outputs(input_dir, page_date, refresh.load_state(input_dir),
+                     missing_by_input.get(input_dir, []), pinned)
     print("\n--- 处理任务完成 ---")
-    print(f"总计: {len(ids_to_process)} 个请求")
-    print(f"成功: {success_count}")
-    print(f"失败/跳过: {fail_count}")
-    print("----------------------")
\ No newline at end of file
+    print(f"总计: {len(ids_to_process)} 个区域")
+    print(f"成功: {counter.success}")
+    print(f"未变化(跳过): {counter.skip}")
+    print(f"失败/跳过: {counter.fail}")
+    print(f"耗时: {time.perf_counter() - t_start:.2f} s")
+    print("----------------------")
+    if counter.fail:
+        exit(1)
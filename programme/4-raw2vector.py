@@ -4,243 +4,233 @@
 import json
 import re
 import argparse
-import shutil
 from pathlib import Path
-from datetime import date, datetime, timedelta
-
-def find_target_folder(base_dir: Path) -> Path:
-    rx = re.compile(r"^data_(\d{2})-(\d{2})-(\d{4})$")
-    candidates = []
-    for p in base_dir.iterdir():
-        if p.is_dir():
-            m = rx.match(p.name)
-            if m:
-                dd, mm, yyyy = map(int, m.groups())
-                try:
-                    d = date(yyyy, mm, dd)
-                except ValueError:
-                    continue
-                candidates.append((d, p))
-    if not candidates:
+from datetime import date
+
+import refresh
+import dated_dirs
+import checkpoint
+import history_store
+import ready_snapshot
+import room_catalog
+import vectorize_np
+import versions
+from vectorize import data_to_vectors, write_vectors, VECTOR_VERSION
+
+FORMATS = ["catalog", "json", "vector"]
+ENGINES = ["numpy", "python"]
+DEFAULT_ENGINE = "numpy" if vectorize_np.AVAILABLE else "python"
+
+def find_target_folder(base_dir: Path, target: date | None = None) -> Path:
+    folder = dated_dirs.pick_dir(base_dir, "data_", target)
+    if folder is None:
+        if target is not None:
+            raise FileNotFoundError(f"未找到 {dated_dirs.dir_name('data_', target)} 文件夹。")
         raise FileNotFoundError("未在当前目录下找到 data_dd-mm-yyyy 格式的文件夹。")
-    candidates.sort(key=lambda x: x[0], reverse=True)
-    return candidates[0][1]
+    return folder
 
 def list_json_files(folder: Path):
-    return sorted([p for p in folder.glob("*.json") if p.is_file()])
+    # 以下划线开头的是元数据文件（如 _refresh.json），不是区域数据
+    return sorted([p for p in folder.glob("*.json") if p.is_file() and not p.name.startswith("_")])
+
+def area_id_from_filename(fp: Path):
+    m = re.fullmatch(r"area_(\d+)", fp.stem)
+    return m.group(1) if m else None
 
 def parse_json(path: Path):
     with path.open("r", encoding="utf-8-sig") as f:
         return json.load(f)
 
-def normalize_facilities_to_list(fac):
-    if fac is None:
-        return []
-    if isinstance(fac, list):
-        return [str(x).strip() for x in fac if str(x).strip()]
-    if isinstance(fac, str):
-        parts = re.split(r"[;,/|]", fac)
-        return [p.strip() for p in parts if p.strip()]
-    return [str(fac).strip()]
-
-def times_to_sorted_list(schedule: dict):
-    def to_minutes(hhmm: str) -> int:
-        m = re.fullmatch(r"(\d{2}):(\d{2})", hhmm)
-        if not m:
-            raise ValueError(f"非法时间格式: {hhmm}")
-        h, mnt = int(m.group(1)), int(m.group(2))
-        return h * 60 + mnt
-
-    times = list(schedule.keys())
-    times.sort(key=to_minutes)
-    return times
-
-def guess_slot_minutes(times_sorted):
-    def to_minutes(hhmm: str) -> int:
-        h, m = map(int, hhmm.split(":"))
-        return h*60 + m
-    if len(times_sorted) < 2:
-        return 30
-    mins = [to_minutes(t) for t in times_sorted]
-    diffs = [b - a for a, b in zip(mins, mins[1:]) if b > a]
-    return min(diffs) if diffs else 30
-
-def add_minutes_str(hhmm: str, minutes: int) -> str:
-    h, m = map(int, hhmm.split(":"))
-    dt = datetime(2000, 1, 1, h, m) + timedelta(minutes=minutes)
-    return dt.strftime("%H:%M")
-
-def compress_available(schedule: dict, available_tokens=("available",)):
-    times_sorted = times_to_sorted_list(schedule)
-    slot_minutes = guess_slot_minutes(times_sorted)
-    lower = {t: str(schedule[t]).strip().lower() for t in times_sorted}
-    avail_set = set(s.lower() for s in available_tokens)
-
-    intervals = []
-    start = None
-    for idx, t in enumerate(times_sorted, start=1):
-        is_avail = lower[t] in avail_set
-        if is_avail and start is None:
-            start = idx
-        elif (not is_avail) and (start is not None):
-            intervals.append((start, idx))
-            start = None
-    if start is not None:
-        intervals.append((start, len(times_sorted) + 1))
-    return intervals, times_sorted, slot_minutes
-
-def iter_room_records(data):
-    if isinstance(data, dict):
-        if "room_id" in data and "schedule" in data:
-            yield data
-        elif "rooms" in data and isinstance(data["rooms"], list):
-            for r in data["rooms"]:
-                if isinstance(r, dict) and "room_id" in r and "schedule" in r:
-                    yield r
-    elif isinstance(data, list):
-        for r in data:
-            if isinstance(r, dict) and "room_id" in r and "schedule" in r:
-                yield r
-
-def to_int_if_numeric(x):
-    try:
-        if isinstance(x, (int, float)):
-            return int(x)
-        s = str(x)
-        if s.isdigit():
-            return int(s)
-    except Exception:
-        pass
-    return x
-
-def make_vector_json(room, facilities_list, start, end, times_sorted, slot_minutes):
-    rid = room.get("room_id", "")
-    rname = room.get("room_name", "")
-    cap = to_int_if_numeric(room.get("capacity", ""))
-    aid = room.get("area_id", "")
-    aname = room.get("area_name", "")
-
-    start_time = times_sorted[start - 1] if 1 <= start <= len(times_sorted) else None
-    if end <= len(times_sorted):
-        end_time = times_sorted[end - 1]  # 半开区间右端点的起始时刻
-    else:
-        end_time = add_minutes_str(times_sorted[-1], slot_minutes)
-
-    return {
-        "room_id": rid,
-        "room_name": rname,
-        "capacity": cap,
-        "facilities": facilities_list,
-        "area_id": aid,
-        "area_name": aname,
-        "start_index": start,
-        "end_index": end,         # 半开区间 [start, end)
-        "start_time": start_time, # 便于人读；下游可忽略
-        "end_time": end_time
-    }
-
-def make_facilities_braced_str(items):
-    items = [str(x).strip() for x in items if str(x).strip()]
-    return "{" + ", ".join(items) + "}"
-
-def make_vector_text(room, facilities_list, start, end):
-    rid = room.get("room_id", "")
-    rname = room.get("room_name", "")
-    cap = room.get("capacity", "")
-    aid = room.get("area_id", "")
-    aname = room.get("area_name", "")
-    fac_str = make_facilities_braced_str(facilities_list)
-    return f"{{{rid}, {rname}, {cap}, {fac_str}, {aid}, {aname}, {start}, {end}}}"
-
-def process_file(fp: Path, out_format: str):
+def tool_id(out_format: str) -> str:
+    """构建清单中的工具版本：压缩规则版本 + 输出格式。"""
+    return f"raw2vector/{VECTOR_VERSION}/{out_format}"
+
+def written_later(ready_entry, data_entry) -> bool:
+    """
+    ready_data_ 中该区域由别的写入方（2-getdata.py --stream、按需抓取、pipeline.py）产出，
+    且抓取时间比 data_ 的记录新：此时用 data_ 重建会拿旧数据覆盖新数据。
+    """
+    if not isinstance(ready_entry, dict) or str(ready_entry.get("tool", "")).startswith("raw2vector/"):
+        return False
+    stamp = ready_entry.get("fetched_at")
+    return bool(stamp) and stamp > (data_entry or {}).get("fetched_at", "")
+
+def load_file(fp: Path):
     try:
-        data = parse_json(fp)
+        return parse_json(fp)
     except Exception as e:
         print(f"[跳过] 解析失败: {fp.name} -> {e}")
         return None
 
-    outputs = []
-    for room in iter_room_records(data):
-        schedule = room.get("schedule")
-        if not isinstance(schedule, dict) or not schedule:
-            continue
-        facilities_list = normalize_facilities_to_list(room.get("facilities"))
-        intervals, times_sorted, slot_minutes = compress_available(schedule)
-        for s, e in intervals:
-            if out_format == "json":
-                outputs.append(
-                    make_vector_json(room, facilities_list, s, e, times_sorted, slot_minutes)
-                )
-            else:
-                outputs.append(
-                    make_vector_text(room, facilities_list, s, e)
-                )
-    return outputs
-
-def main():
-    parser = argparse.ArgumentParser(description="压缩可用时段并输出结果文件")
-    parser.add_argument("--format", choices=["json", "vector"], default="json",
-                        help="输出格式：json（推荐）或 vector（{room_id,...} 文本行）")
-    parser.add_argument("--folder", type=str, default=None,
-                        help="指定要处理的 data_dd-mm-yyyy 文件夹路径（默认自动选择最新的）")
-    args = parser.parse_args()
-
-    base = Path(__file__).resolve().parent
-    if args.folder:
-        folder = Path(args.folder).resolve()
-        if not folder.is_dir():
-            print(f"指定的文件夹不存在: {folder}")
-            return
+def compress(datas, out_format: str, engine: str = DEFAULT_ENGINE):
+    """
+    一批 data_ 文件内容 -> 各自的输出向量。numpy 引擎把整批区域拼成一个矩阵一次找出全部空闲段；
+    python 引擎逐个文件调用 vectorize.data_to_vectors（参照实现），两者结果相同。
+    """
+    if out_format == room_catalog.FORMAT:
+        return to_catalogs(datas, engine)
+    if engine == "numpy":
+        return vectorize_np.batch_to_vectors(datas, out_format)
+    return [data_to_vectors(data, out_format) for data in datas]
+
+def to_catalogs(datas, engine: str = DEFAULT_ENGINE):
+    """catalog 格式：每个文件 -> (房间目录, times, intervals)，区间不再展开成逐条的字典。"""
+    converted = [vectorize_np.to_area_slots(d) for d in datas]
+    batch = [a for a in converted if a is not None]
+    if engine == "numpy" and vectorize_np.AVAILABLE:
+        per_area = iter(vectorize_np.area_intervals(batch))
     else:
-        try:
-            folder = find_target_folder(base)
-        except Exception as e:
-            print(f"定位数据文件夹失败：{e}")
-            return
-
-    out_root = folder.parent / ("ready_" + folder.name)
-
-    ready_pattern = re.compile(r"^ready_data_\d{2}-\d{2}-\d{4}$")
-    for p in folder.parent.iterdir():
-        if p.is_dir() and ready_pattern.match(p.name) and p != out_root:
-            try:
-                shutil.rmtree(p)
-                print(f"已删除过期文件夹：{p.name}")
-            except Exception as e:
-                print(f"删除文件夹失败 {p.name}：{e}")
-                
-    out_root.mkdir(parents=True, exist_ok=True)
+        per_area = iter([[a.room_intervals(r) for r in a.rooms] for a in batch])
+    return [room_catalog.from_area(a, next(per_area)) if a is not None
+            else room_catalog.from_vectors(data_to_vectors(d, "json")) for d, a in zip(datas, converted)]
+
+def update_snapshot(out_root: Path, force: bool = False) -> None:
+    """向量文件有变化（或没有快照）时重写 _snapshot.bin，供 sub.py 用 mmap 直接读取。"""
+    snap = None if force else ready_snapshot.open_current(out_root)
+    if snap is not None:
+        snap.close()
+        return
+    path, n = ready_snapshot.write_snapshot(out_root)
+    print(f"[快照] {path.name} 已更新（{n} 个区间）")
+
+def process_folder(folder: Path, out_format: str, force: bool = False, engine: str = DEFAULT_ENGINE,
+                   snapshot: bool = True, store=None) -> None:
+    """
+    只重建构建清单判定为过期的区域：data_ 文件内容（输入哈希）、工具版本或输出文件与
+    上次记录不符时才重新压缩，其余区域原样保留。需要重建的区域读入后一起压缩。
+    结果写在当前版本的暂存副本里，全部完成后作为 ready_data_ 的新版本一次发布。
+    给出 store（history_store 的连接）时，把发布后的当前版本记入历史库。
+    """
+    ready_root = folder.parent / ("ready_" + folder.name)
     files = list_json_files(folder)
     if not files:
         print(f"目标文件夹内没有 .json 文件：{folder}")
         return
 
+    staging = versions.Staging(ready_root)
+    out_root = staging.path
     print(f"处理文件夹：{folder}")
-    print(f"输出到：{out_root}  （文件名保持不变）")
+    print(f"输出到：{ready_root}  （文件名保持不变）")
     total_vectors = 0
+    skipped = 0
+    data_state = refresh.load_state(str(folder))
+    ready_state = refresh.load_state(str(out_root))
+    tool = tool_id(out_format)
 
+    pending, done = [], []
     for fp in files:
-        outputs = process_file(fp, args.format)
-        if outputs is None:
+        out_path = out_root / fp.name
+        aid = area_id_from_filename(fp)
+        in_hash = refresh.file_hash(fp)
+        if aid and not force and out_path.exists() and written_later(ready_state.get(aid), data_state.get(aid)):
+            print(f"[较新] {fp.name} ready_data_ 中已有更新的抓取结果，不用 {folder.name} 覆盖")
+            skipped += 1
+            continue
+        if aid and not force and refresh.is_built(ready_state, aid, in_hash, str(out_path), tool):
+            print(f"[未变] {fp.name} 上游内容未变化，沿用已有结果")
+            skipped += 1
+            done.append(aid)
             continue
 
-        out_path = out_root / fp.name
+        data = load_file(fp)
+        if data is not None:
+            pending.append((fp, aid, in_hash, out_path, data))
+
+    batch = compress([data for *_, data in pending], out_format, engine)
+    for (fp, aid, in_hash, out_path, _), outputs in zip(pending, batch):
         try:
-            if args.format == "json":
-                content = {"vectors": outputs}
-                with out_path.open("w", encoding="utf-8") as f:
-                    json.dump(content, f, ensure_ascii=False, indent=2)
+            extra = {"format": out_format}
+            if out_format == room_catalog.FORMAT:
+                rooms, times, entries = outputs
+                extra["catalog"], out_hash = room_catalog.write_area(out_root, out_path, aid or "", rooms,
+                                                                     times, entries)
+                outputs = entries
             else:
-                # vector 文本行（注意：文件扩展名仍为 .json，但内容不是 JSON）
-                with out_path.open("w", encoding="utf-8") as f:
-                    for line in outputs:
-                        f.write(line + "\n")
+                out_hash = write_vectors(out_path, outputs, out_format)
             print(f"[完成] {fp.name} -> {out_path.name} （{len(outputs)} 条）")
             total_vectors += len(outputs)
+            if aid:
+                ready_state[aid] = refresh.build_entry(ready_state.get(aid), refresh.source_hash(data_state, aid),
+                                                       in_hash, out_hash, tool, **extra)
+                done.append(aid)
         except Exception as e:
             print(f"[失败] 写出文件: {out_path} -> {e}")
 
-    print(f"全部完成。条目总数：{total_vectors}")
+    # 抓取时间随上游记录带过来（未变化跳过的区域也一样），按需抓取据此判断数据是否过期
+    for aid in done:
+        refresh.carry_fetched_at(ready_state, aid, data_state.get(aid))
+    refresh.save_state(str(out_root), ready_state)
+    if snapshot and out_format != "vector":
+        update_snapshot(out_root, force)
+    # 上游标记的不完整原样传到 ready_data_，sub.py 据此提醒
+    missing = checkpoint.incomplete_areas(str(folder))
+    if missing:
+        checkpoint.mark_incomplete(str(out_root), missing, folder.name)
+        print(f"[警告] {folder.name} 数据不完整，缺少 {len(missing)} 个区域：{', '.join(missing[:10])}"
+              f"{' ...' if len(missing) > 10 else ''}")
+    else:
+        checkpoint.clear_incomplete(str(out_root))
+    rebuild = (lambda p: update_snapshot(p, True)) if snapshot and out_format != "vector" else None
+    published = staging.publish(on_rebase=rebuild)
+    if published != staging.base:
+        print(f"[发布] {ready_root.name}/{published.name} 已成为当前版本")
+    else:
+        print(f"[发布] 内容没有变化，沿用 {ready_root.name}/{published.name}")
+    if store is not None and out_format != "vector":
+        snap_id = history_store.record_published(store, ready_root)
+        if snap_id is not None:
+            print(f"[历史] {ready_root.name}/{published.name} 已记入历史库（快照 {snap_id}）")
+    print(f"全部完成。条目总数：{total_vectors}（未变化跳过 {skipped} 个文件）")
+
+def main():
+    parser = argparse.ArgumentParser(description="压缩可用时段并输出结果文件")
+    parser.add_argument("--format", choices=FORMATS, default=room_catalog.FORMAT,
+                        help="输出格式：catalog（默认，区间按序号引用共享的房间目录）、"
+                             "json（每条区间带完整房间信息）或 vector（{room_id,...} 文本行）")
+    parser.add_argument("--folder", type=str, default=None,
+                        help="指定要处理的 data_dd-mm-yyyy 文件夹路径（默认处理今天及以后的全部日期）")
+    parser.add_argument("--date", type=date.fromisoformat, default=None,
+                        help="只处理指定日期 YYYY-MM-DD 的 data_ 文件夹")
+    parser.add_argument("--force", action="store_true",
+                        help="忽略构建清单，全部重新压缩")
+    parser.add_argument("--no-snapshot", action="store_true",
+                        help="不写 _snapshot.bin（sub.py 查询时读的二进制快照；vector 格式不写）")
+    parser.add_argument("--store", nargs="?", type=Path, const=history_store.DEFAULT_PATH, default=None,
+                        help="发布后把各日期的当前版本记入 SQLite 历史库（默认路径 "
+                             f"{history_store.DEFAULT_PATH.name}；vector 格式不记录）")
+    parser.add_argument("--engine", choices=ENGINES, default=DEFAULT_ENGINE,
+                        help=f"压缩引擎：numpy 整批矩阵运算（需安装 numpy），python 逐房间（默认 {DEFAULT_ENGINE}）")
+    args = parser.parse_args()
+    if args.engine == "numpy" and not vectorize_np.AVAILABLE:
+        print("未安装 numpy，改用 python 引擎。")
+        args.engine = "python"
+
+    base = Path(__file__).resolve().parent
+    if args.folder:
+        folder = Path(args.folder).resolve()
+        if not folder.is_dir():
+            print(f"指定的文件夹不存在: {folder}")
+            return
+        folders = [folder]
+    elif args.date:
+        try:
+            folders = [find_target_folder(base, args.date)]
+        except Exception as e:
+            print(f"定位数据文件夹失败：{e}")
+            return
+    else:
+        folders = [p for _, p in dated_dirs.current_dirs(base, "data_")]
+        if not folders:
+            print("定位数据文件夹失败：未在当前目录下找到 data_dd-mm-yyyy 格式的文件夹。")
+            return
+
+    store = history_store.connect(args.store) if args.store else None
+    dated_dirs.remove_expired(folders[0].parent, "ready_data_")
+    for folder in folders:
+        process_folder(folder, args.format, args.force, args.engine, not args.no_snapshot, store)
+    if store is not None:
+        store.close()
+    room_catalog.gc(folders[0].parent)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
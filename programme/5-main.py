@@ -1,69 +1,27 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
+import os
 import sys
-import subprocess
+import contextlib
 import json
 from pathlib import Path
-from datetime import datetime
-from typing import List, Dict, Any, Tuple
+from datetime import date, datetime
+from typing import List, Dict, Any, Optional, Tuple
 
-# =============== Config ===============
-AREA_GROUPS = {
-    1: [1, 13, 55, 54, 3, 9, 24, 52, 53, 50, 49, 99],    # north campus - west
-    2: [22, 27, 95, 26, 23, 36, 40, 35, 37, 34, 39, 97],  # north campus - east
-    3: []  # south campus (fill later)
-}
-
-AREA_NAME_OPTIONS = [
-    "SIP Campus-Meeting Rooms in Central Building",
-    "Foundation Building",
-    "Central Building",
-    "...(not imported yet)"
-]
+from planner import (AREA_GROUPS, AREA_NAME_OPTIONS, FACILITY_OPTIONS, DEFAULT_TTL_MINUTES, AREA_TTL_MINUTES,
+                     parse_hhmm, floor_to_half_hour, slot_index_from_time, print_summary)
+import sub
 
-FACILITY_OPTIONS = [
-    "Online meeting available",
-    "86 inch MAXHUB",
-    "...(not imported yet)"
-]
+# =============== Config ===============
+# Area groups, filter keywords, slot base and TTLs live in planner.py (shared with pipeline.py).
 
-DAY_BASE_HOUR = 8       # slot 1 => 08:00-08:30
-DAY_BASE_MINUTE = 0
-MIN_SLOT_INDEX = 1
+# On-demand fetch (opt-in): before solving, re-fetch the chosen group's areas whose ready data
+# is older than the TTL (minutes), then refresh all other areas in the background.
+# Set ON_DEMAND_FETCH=1 (always) or 0 (never) in the environment or .env; unset = ask each run.
+ON_DEMAND_FETCH_ENV = "ON_DEMAND_FETCH"
 
 # =============== Utilities ===============
-def parse_hhmm(s: str) -> Tuple[int, int]:
-    s = s.strip()
-    try:
-        hh, mm = s.split(":")
-        hh = int(hh); mm = int(mm)
-        if not (0 <= hh < 24 and 0 <= mm < 60):
-            raise ValueError
-        return hh, mm
-    except Exception:
-        raise ValueError(f"Invalid time: {s}. Use HH:MM (e.g., 09:13).")
-
-def floor_to_half_hour(h: int, m: int) -> Tuple[int, int]:
-    return (h, 0) if m < 30 else (h, 30)
-
-def slot_index_from_time(h: int, m: int) -> int:
-    base_minutes = DAY_BASE_HOUR * 60 + DAY_BASE_MINUTE
-    cur_minutes = h * 60 + m
-    delta = cur_minutes - base_minutes
-    half_hours = delta // 30
-    idx = half_hours + 1
-    if idx < MIN_SLOT_INDEX:
-        idx = MIN_SLOT_INDEX
-    return int(idx)
-
-def slot_to_hhmm(idx: int) -> str:
-    # Convert slot index -> wall clock time at slot boundary
-    minutes = DAY_BASE_HOUR * 60 + DAY_BASE_MINUTE + (idx - 1) * 30
-    hh = (minutes // 60) % 24
-    mm = minutes % 60
-    return f"{hh:02d}:{mm:02d}"
-
 def pick_filters_from_options(options: List[str], title: str) -> Tuple[List[str], List[str]]:
     print(f"\nAvailable {title} keywords:")
     for i, opt in enumerate(options, 1):
@@ -101,56 +59,106 @@ def print_progress(current: int, total: int):
     sys.stdout.write(f"\rRunning: [{bar}] {current}/{total}")
     sys.stdout.flush()
 
-def run_sub_for_area(area_id: int,
-                     start_slot: int,
-                     end_slot: int,
-                     req_area_names: List[str],
-                     forb_area_names: List[str],
-                     req_facilities: List[str],
-                     forb_facilities: List[str],
-                     log_f,
-                     ready_folder: str = "",
-                     allow_three_changes: bool = False,
-                     top_k_zero_change: int = 50) -> Dict[str, Any]:
-    py = sys.executable
-    sub_path = Path(__file__).resolve().parent / "sub.py"
-    cmd = [
-        py, str(sub_path),
-        "--area-id", str(area_id),
-        "--start-slot", str(start_slot),
-        "--end-slot", str(end_slot),
-        "--required-facilities", ";".join(req_facilities),
-        "--forbidden-facilities", ";".join(forb_facilities),
-        "--require-area-names", ";".join(req_area_names),
-        "--forbid-area-names", ";".join(forb_area_names),
-        "--top-k-zero-change", str(top_k_zero_change)
-    ]
-    if ready_folder:
-        cmd += ["--ready-folder", ready_folder]
-    if allow_three_changes:
-        cmd += ["--allow-three-changes"]
-
-    proc = subprocess.Popen(
-        cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True, encoding="utf-8", errors="replace"
-    )
-
-    summary: Dict[str, Any] = {"area_id": str(area_id), "ok": False}
+def solve_area(snapshot: sub.Snapshot,
+               area_id: int,
+               start_slot: int,
+               end_slot: int,
+               req_area_names: List[str],
+               forb_area_names: List[str],
+               req_facilities: List[str],
+               forb_facilities: List[str],
+               log_f,
+               allow_three_changes: bool = False,
+               top_k_zero_change: int = 50) -> Dict[str, Any]:
+    """Solve one area in-process from the shared snapshot; the solver's output goes to the run log."""
     sep = "=" * 60
     log_f.write(f"\n{sep}\nAREA {area_id} START\n{sep}\n")
-    if proc.stdout is not None:
-        for line in proc.stdout:
-            log_f.write(line)
-            if line.startswith("SUMMARY "):
-                try:
-                    js = json.loads(line[len("SUMMARY "):].strip())
-                    summary = js
-                except Exception:
-                    pass
-    proc.wait()
+    with contextlib.redirect_stdout(log_f):
+        summary = sub.run(
+            area_id=str(area_id),
+            time_start=start_slot,
+            time_end=end_slot,
+            required_facilities=req_facilities,
+            forbidden_facilities=forb_facilities,
+            require_area_name_contains=req_area_names,
+            forbid_area_name_contains=forb_area_names,
+            ready_folder=None,
+            allow_three_changes=allow_three_changes,
+            top_k_zero_change=top_k_zero_change,
+            snapshot=snapshot
+        )
     log_f.write(f"\n{sep}\nAREA {area_id} END\n{sep}\n")
     log_f.flush()
     return summary
 
+def on_demand_setting() -> Optional[bool]:
+    """ON_DEMAND_FETCH from the environment/.env: True = always, False = never, None = ask."""
+    setting = os.getenv(ON_DEMAND_FETCH_ENV, "").strip().lower()
+    if setting in ("1", "true", "yes", "on"):
+        return True
+    if setting in ("0", "false", "no", "off"):
+        return False
+    return None
+
+def refresh_on_demand(area_ids: List[int], target_date: str) -> None:
+    """Fetch stale areas of this query in the foreground, the rest in a background process.
+    Opt-in via ON_DEMAND_FETCH or the prompt, and only offered when a usable session exists.
+    Any failure is reported and the run continues with whatever data is on disk."""
+    try:
+        from dotenv import load_dotenv
+        import area_mapping
+        import lazy_fetch
+        import session
+    except ImportError as e:
+        print(f"On-demand fetch unavailable ({e}); using existing data.")
+        return
+
+    load_dotenv()
+    setting = on_demand_setting()
+    if setting is False:
+        return
+    cookie = os.getenv("MRBS_COOKIE")
+    area_map = area_mapping.load_mapping()
+    if not cookie or not area_map:
+        if setting:
+            print("On-demand fetch skipped: run 1-auth.py first (no cookie or area_mapping.json).")
+        return
+    proceed, message = session.fetch_gate(cookie)
+    if not proceed:
+        print(f"On-demand fetch skipped: {message}")
+        return
+    if message:
+        print(message)
+    if setting is None and input("Fetch fresh data for stale areas first (y/N): ").strip().lower() not in ("y", "yes"):
+        return
+
+    day = date.fromisoformat(target_date) if target_date else date.today()
+    ids = [str(a) for a in area_ids if str(a) in area_map]
+    area_ttls = {str(k): v for k, v in AREA_TTL_MINUTES.items()}
+    stale = lazy_fetch.stale_areas(ids, day, DEFAULT_TTL_MINUTES, area_ttls)
+    if stale:
+        print(f"Fetching {len(stale)} stale area(s) for this query...")
+        try:
+            run = lazy_fetch.ensure_fresh(stale, day, cookie, area_map, DEFAULT_TTL_MINUTES, area_ttls,
+                                          base_url=os.getenv("MRBS_BASE_URL", lazy_fetch.BASE_URL))
+        except Exception as e:
+            print(f"On-demand fetch failed ({e}); using existing data.")
+            return
+        if run.aborted:
+            print(f"On-demand fetch stopped: {run.aborted}")
+            return
+    else:
+        print(f"Data for this query is younger than {DEFAULT_TTL_MINUTES} min; no fetch needed.")
+
+    running = lazy_fetch.background_pid()
+    if running is not None:
+        print(f"A background refresh is still running (pid {running}); not starting another.")
+        return
+    rest = [aid for aid in area_map if aid not in set(ids)]
+    proc = lazy_fetch.refresh_rest_in_background(rest, day, DEFAULT_TTL_MINUTES)
+    if proc is not None:
+        print(f"Refreshing the other {len(rest)} area(s) in the background (pid {proc.pid}).")
+
 def main():
     print("Select your location:")
     print("  1) north campus - west")
@@ -190,11 +198,31 @@ def main():
     req_facilities, forb_facilities = pick_filters_from_options(FACILITY_OPTIONS, "facilities")
 
     ready_folder = input("Specify ready_data folder (empty = auto-pick latest): ").strip()
+    target_date = ""
+    if not ready_folder:
+        while True:
+            target_date = input("Date to plan for (YYYY-MM-DD, empty = today): ").strip()
+            try:
+                if target_date:
+                    date.fromisoformat(target_date)
+                break
+            except ValueError:
+                print("Invalid date. Use YYYY-MM-DD.")
     allow_three_changes = input("Allow 3 changes (y/N): ").strip().lower() in ("y", "yes")
 
     area_ids = AREA_GROUPS.get(loc, [])
     if not area_ids:
-        print("This location has no configured area_ids yet. Please update main.py.")
+        print("This location has no configured area_ids yet. Please update planner.py.")
+        return
+    if not ready_folder:
+        refresh_on_demand(area_ids, target_date)
+
+    # Load every area of the group once; all areas are then solved from this one snapshot
+    try:
+        snapshot = sub.load_snapshot(area_ids, ready_folder or None,
+                                     date.fromisoformat(target_date) if target_date else None)
+    except Exception as e:
+        print(f"Loading ready data failed: {e}")
         return
 
     # One shared log file per run
@@ -213,6 +241,8 @@ def main():
             "require_facilities": req_facilities,
             "forbid_facilities": forb_facilities,
             "ready_folder": ready_folder or "(auto)",
+            "snapshot": snapshot.label,
+            "date": target_date or "(today)",
             "allow_three_changes": allow_three_changes,
         }
         log_f.write("RUN CONFIG:\n" + json.dumps(config, ensure_ascii=False, indent=2) + "\n")
@@ -221,7 +251,8 @@ def main():
         summaries: List[Dict[str, Any]] = []
         total = len(area_ids)
         for i, aid in enumerate(area_ids, 1):
-            s = run_sub_for_area(
+            s = solve_area(
+                snapshot=snapshot,
                 area_id=aid,
                 start_slot=start_slot,
                 end_slot=end_slot,
@@ -230,7 +261,6 @@ def main():
                 req_facilities=req_facilities,
                 forb_facilities=forb_facilities,
                 log_f=log_f,
-                ready_folder=ready_folder,
                 allow_three_changes=allow_three_changes,
                 top_k_zero_change=50
             )
@@ -239,45 +269,7 @@ def main():
 
     print()  # newline after progress bar
 
-    # Final summary (readable and complete)
-    print("\n===== Summary =====")
-    ok_list = [x for x in summaries if x.get("ok")]
-    if not ok_list:
-        print("No feasible plans found.")
-    else:
-        for info in ok_list:
-            aid = info.get("area_id")
-            chg = info.get("changes")
-            segs = info.get("segments") or []
-            area_name = segs[0]["area_name"] if segs else ""
-            print(f"\narea_id={aid} | area_name={area_name}")
-
-            if chg == 0:
-                print(f"- 0 changes: {len(segs)} single-room option(s)")
-                for i, s in enumerate(segs, 1):
-                    st, et = slot_to_hhmm(int(s['start'])), slot_to_hhmm(int(s['end']))
-                    print(f"  Option {i}: {s['room_name']} (cap {s['capacity']})  {st}-{et}  slots [{s['start']}, {s['end']})")
-            else:
-                print(f"- Plan: {chg} change(s), {len(segs)} segment(s)")
-                for j, s in enumerate(segs, 1):
-                    st, et = slot_to_hhmm(int(s['start'])), slot_to_hhmm(int(s['end']))
-                    print(f"  Seg{j}: {s['room_name']} (cap {s['capacity']})  {st}-{et}  slots [{s['start']}, {s['end']})")
-                switches = info.get("switches") or []
-                for j, (a, b) in enumerate(switches, 1):
-                    print(f"  Switch window {j}: {slot_to_hhmm(int(a))}-{slot_to_hhmm(int(b))}  slots [{a}, {b})")
-
-                alts = info.get("alternatives") or []
-                for k, alt in enumerate(alts, 1):
-                    a_chg = alt.get("changes")
-                    a_segs = alt.get("segments", [])
-                    note = alt.get("note", "")
-                    print(f"  Alternative {k}: {a_chg} change(s) ({note})")
-                    for j, s in enumerate(a_segs, 1):
-                        st, et = slot_to_hhmm(int(s['start'])), slot_to_hhmm(int(s['end']))
-                        print(f"    Seg{j}: {s['room_name']} (cap {s['capacity']})  {st}-{et}  slots [{s['start']}, {s['end']})")
-                    if "switch_point" in alt:
-                        sp = alt["switch_point"]
-                        print(f"    Switch at: {slot_to_hhmm(int(sp))}  slot {sp}")
+    print_summary(summaries)
 
     print(f"\nLog saved to: {log_path}")
 
@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+area_mapping.json 的解析、缓存与刷新，不需要浏览器。
+
+area_mapping.json 仍是 {area_id: 区域名称} 的普通字典，其他脚本照常读取；
+旁边的 area_mapping.meta.json 记录上次核对的时间、内容哈希，以及最近一次
+变化中新增/删除/改名的区域，供下游索引做增量更新。
+
+refresh_mapping 在 TTL 之内不发任何请求；过期后用保存的 Cookie 请求一次今天的
+日视图，从 <select name="area"> 中解析区域列表，内容哈希没变就只更新核对时间。
+
+  python area_mapping.py                 过期才刷新（默认 TTL 24 小时）
+  python area_mapping.py --force         立即刷新
+"""
+
+from __future__ import annotations
+import argparse
+import hashlib
+import html as html_lib
+import json
+import os
+import re
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+from dotenv import load_dotenv
+
+from session import probe_session
+from fetcher import BASE_URL
+
+AREA_MAPPING_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'area_mapping.json')
+DEFAULT_TTL_HOURS = 24
+
+def extract_area_mapping_from_html(html: str) -> dict:
+    """
+    从HTML中提取 <select name="area"> 内的 <option value="ID">名称</option>。
+    返回形如 {"24":"SIP Campus-GF Classrooms in Foundation Building", ...}
+    """
+    m = re.search(r'<select[^>]*name=["\']area["\'][^>]*>(.*?)</select>', html, flags=re.I | re.S)
+    if not m:
+        return {}
+    select_html = m.group(1)
+    options = re.findall(r'<option[^>]*value=["\'](\d+)["\'][^>]*>(.*?)</option>', select_html, flags=re.I | re.S)
+
+    area_map = {}
+    for aid, raw_text in options:
+        # 去标签、反转义、压缩空白
+        text = re.sub(r'<[^>]+>', '', raw_text)
+        text = html_lib.unescape(text)
+        text = re.sub(r'\s+', ' ', text).strip()
+        if text:
+            area_map[aid] = text
+    return area_map
+
+def mapping_hash(area_map: dict) -> str:
+    data = json.dumps(area_map, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+def meta_path(path: str) -> str:
+    root, _ = os.path.splitext(path)
+    return root + ".meta.json"
+
+@dataclass
+class MappingDiff:
+    added: List[str] = field(default_factory=list)
+    removed: List[str] = field(default_factory=list)
+    renamed: List[str] = field(default_factory=list)
+
+    def __bool__(self) -> bool:
+        return bool(self.added or self.removed or self.renamed)
+
+    def describe(self, old: dict, new: dict) -> List[str]:
+        lines = [f"  + {aid} {new[aid]}" for aid in self.added]
+        lines += [f"  - {aid} {old[aid]}" for aid in self.removed]
+        lines += [f"  ~ {aid} {old[aid]} -> {new[aid]}" for aid in self.renamed]
+        return lines
+
+def _sorted_ids(ids) -> List[str]:
+    return sorted(ids, key=lambda x: (len(x), x))
+
+def diff_mappings(old: dict, new: dict) -> MappingDiff:
+    return MappingDiff(
+        added=_sorted_ids(new.keys() - old.keys()),
+        removed=_sorted_ids(old.keys() - new.keys()),
+        renamed=_sorted_ids(aid for aid in old.keys() & new.keys() if old[aid] != new[aid]),
+    )
+
+def _read_json(path: str) -> dict:
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+    return data if isinstance(data, dict) else {}
+
+def _write_json(path: str, data: dict) -> None:
+    tmp = path + ".tmp"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    os.replace(tmp, path)
+
+def load_mapping(path: str = AREA_MAPPING_PATH) -> dict:
+    return _read_json(path)
+
+def load_meta(path: str = AREA_MAPPING_PATH) -> dict:
+    return _read_json(meta_path(path))
+
+def is_fresh(meta: dict, ttl_hours: float, now: Optional[datetime] = None) -> bool:
+    try:
+        checked = datetime.fromisoformat(meta.get("checked_at", ""))
+    except ValueError:
+        return False
+    return (now or datetime.now()) - checked < timedelta(hours=ttl_hours)
+
+def save_mapping(area_map: dict, path: str = AREA_MAPPING_PATH) -> MappingDiff:
+    """写入映射和元数据，返回与旧映射相比的变化。内容没变时只更新核对时间。"""
+    old = load_mapping(path)
+    meta = load_meta(path)
+    now = datetime.now().isoformat(timespec="seconds")
+    diff = diff_mappings(old, area_map)
+    digest = mapping_hash(area_map)
+    if digest != meta.get("content_hash") or not os.path.exists(path):
+        _write_json(path, area_map)
+        meta["changed_at"] = now
+        meta["last_change"] = {"added": diff.added, "removed": diff.removed, "renamed": diff.renamed}
+    meta.update(content_hash=digest, checked_at=now, areas=len(area_map))
+    _write_json(meta_path(path), meta)
+    return diff
+
+@dataclass
+class RefreshResult:
+    status: str                    # "fresh" | "unchanged" | "updated" | "failed"
+    area_map: dict
+    diff: MappingDiff = field(default_factory=MappingDiff)
+    reason: str = ""
+
+def refresh_mapping(cookie: Optional[str], path: str = AREA_MAPPING_PATH, ttl_hours: float = DEFAULT_TTL_HOURS,
+                    force: bool = False, base_url: str = BASE_URL, html: Optional[str] = None) -> RefreshResult:
+    """
+    TTL 内直接返回缓存的映射；否则最多发一个请求重新解析。
+    已经拿到今天日视图页面的调用方（如 1-auth.py 的会话探测）可以通过 html 传入，省掉这次请求。
+    失败时保留原文件不动。
+    """
+    current = load_mapping(path)
+    if current and not force and is_fresh(load_meta(path), ttl_hours):
+        return RefreshResult("fresh", current)
+    if html is None:
+        probe = probe_session(cookie, base_url)
+        if not probe.alive:
+            return RefreshResult("failed", current, reason=probe.reason)
+        html = probe.html
+    area_map = extract_area_mapping_from_html(html)
+    if not area_map:
+        return RefreshResult("failed", current, reason="页面中没有区域下拉框")
+    diff = save_mapping(area_map, path)
+    return RefreshResult("updated" if diff or not current else "unchanged", area_map, diff)
+
+def report(result: RefreshResult, old: dict) -> None:
+    if result.status == "fresh":
+        print(f"区域映射在有效期内，共 {len(result.area_map)} 个区域（未发请求）。")
+    elif result.status == "failed":
+        print(f"刷新区域映射失败（{result.reason}），继续使用现有的 {len(result.area_map)} 个区域。")
+    elif result.status == "unchanged":
+        print(f"区域映射已核对，无变化，共 {len(result.area_map)} 个区域。")
+    else:
+        print(f"✓ 区域映射已更新，共 {len(result.area_map)} 个区域"
+              f"（新增 {len(result.diff.added)}，删除 {len(result.diff.removed)}，改名 {len(result.diff.renamed)}）")
+        if old:
+            for line in result.diff.describe(old, result.area_map):
+                print(line)
+
+def main():
+    load_dotenv()
+    ap = argparse.ArgumentParser(description="不启动浏览器刷新 area_mapping.json")
+    ap.add_argument("--path", default=AREA_MAPPING_PATH)
+    ap.add_argument("--ttl-hours", type=float, default=DEFAULT_TTL_HOURS,
+                    help=f"上次核对后多久之内不再请求（默认 {DEFAULT_TTL_HOURS}）")
+    ap.add_argument("--force", action="store_true", help="忽略 TTL 立即刷新")
+    ap.add_argument("--base-url", default=os.getenv("MRBS_BASE_URL", BASE_URL))
+    args = ap.parse_args()
+
+    old = load_mapping(args.path)
+    result = refresh_mapping(os.getenv("MRBS_COOKIE"), args.path, args.ttl_hours, args.force, args.base_url)
+    report(result, old)
+    if result.status == "failed" and not result.area_map:
+        exit(1)
+
+if __name__ == "__main__":
+    main()
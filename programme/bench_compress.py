@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+空闲区间压缩基准：比较三种实现在整校、多天数据上的耗时，并核对结果完全一致。
+
+  reference  对每个房间的 {时刻: 预订名} 调用 vectorize.compress_available（参照实现）
+  slots      vectorize.slots_to_vectors，逐房间在空闲位图上找连续段
+  numpy      vectorize_np.areas_to_vectors，整批区域一次 diff / nonzero
+
+  python bench_compress.py                              120 个区域 × 25 个房间 × 7 天
+  python bench_compress.py --areas 40 --rooms 100 --days 3 --slot-minutes 15
+
+分别计时“只找区间”和“生成完整向量”两步。任何一个区域的结果与参照实现不同时退出码为 1。
+"""
+
+from __future__ import annotations
+import argparse
+import json
+import time
+from datetime import date, timedelta
+from typing import Dict, List
+
+import synth_pages
+import vectorize
+import vectorize_np
+from mrbs_pages import day_slots_parser
+
+def make_areas(args) -> List:
+    """合成页面并用快速解析器解析（不计时），返回 AreaSlots 列表（区域 × 天）。"""
+    area_map = {str(i): f"Area {i}" for i in range(1, args.areas + 1)}
+    parse = day_slots_parser("fast")
+    day_end = 22 * 60
+    out = []
+    for k in range(args.days):
+        d = date.today() + timedelta(days=k)
+        for aid in area_map:
+            html, _ = synth_pages.build_day_page(aid, area_map, d, n_rooms=args.rooms, seed=args.seed + k,
+                                                 slot_minutes=args.slot_minutes, density=args.density,
+                                                 day_start=8 * 60, day_end=day_end, odd_layout=args.odd_layout)
+            area = parse(html, aid, area_map)
+            if area is not None:
+                out.append(area)
+    return out
+
+def reference_intervals(rooms_by_area):
+    return [[vectorize.compress_available(r["schedule"])[0] for r in rooms] for rooms in rooms_by_area]
+
+def slots_intervals(areas):
+    return [[a.room_intervals(r)[0] for r in a.rooms] for a in areas]
+
+def numpy_intervals(areas):
+    return [[iv for iv, _, _ in rooms] for rooms in vectorize_np.area_intervals(areas)]
+
+def best_of(fn, arg, repeat: int):
+    best, result = float("inf"), None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = fn(arg)
+        best = min(best, time.perf_counter() - t0)
+    return best * 1000, result
+
+def main():
+    ap = argparse.ArgumentParser(description="比较空闲区间压缩的三种实现并核对结果")
+    ap.add_argument("--areas", type=int, default=120)
+    ap.add_argument("--rooms", type=int, default=25, help="每个区域的房间数")
+    ap.add_argument("--days", type=int, default=7)
+    ap.add_argument("--slot-minutes", type=int, default=30)
+    ap.add_argument("--density", type=float, default=0.35)
+    ap.add_argument("--odd-layout", action="store_true", help="混入不常见的页面写法（含缺时段的房间）")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--repeat", type=int, default=3, help="每项重复次数，取最小值")
+    ap.add_argument("--json", default=None, help="把结果另存为 JSON")
+    args = ap.parse_args()
+
+    if not vectorize_np.AVAILABLE:
+        print("未安装 numpy，无法比较 numpy 实现。")
+        exit(1)
+    areas = make_areas(args)
+    rooms_by_area = [a.to_rooms() for a in areas]
+    n_rooms = sum(len(a.rooms) for a in areas)
+    print(f"{len(areas)} 个区域日程（{args.areas} 区域 × {args.days} 天），共 {n_rooms} 个房间日程")
+
+    rows: Dict[str, dict] = {}
+    t, ref = best_of(reference_intervals, rooms_by_area, args.repeat)
+    rows["reference"] = {"intervals_ms": t}
+    t, got_slots = best_of(slots_intervals, areas, args.repeat)
+    rows["slots"] = {"intervals_ms": t}
+    t, got_np = best_of(numpy_intervals, areas, args.repeat)
+    rows["numpy"] = {"intervals_ms": t}
+
+    t, ref_vec = best_of(lambda rs: [vectorize.rooms_to_vectors(r) for r in rs], rooms_by_area, args.repeat)
+    rows["reference"]["vectors_ms"] = t
+    t, slots_vec = best_of(lambda xs: [vectorize.slots_to_vectors(a) for a in xs], areas, args.repeat)
+    rows["slots"]["vectors_ms"] = t
+    t, np_vec = best_of(vectorize_np.areas_to_vectors, areas, args.repeat)
+    rows["numpy"]["vectors_ms"] = t
+
+    mismatched = []
+    for name, iv, vec in (("slots", got_slots, slots_vec), ("numpy", got_np, np_vec)):
+        for k, a in enumerate(areas):
+            if [list(x) for x in iv[k]] != [list(x) for x in ref[k]] or vec[k] != ref_vec[k]:
+                mismatched.append(f"{name}: area {a.area_id}（第 {k // max(1, args.areas) + 1} 天）")
+
+    base_iv, base_vec = rows["reference"]["intervals_ms"], rows["reference"]["vectors_ms"]
+    print(f"{'实现':<10} {'找区间':>10} {'加速':>7} {'完整向量':>10} {'加速':>7}")
+    for name, row in rows.items():
+        row["intervals_speedup"] = base_iv / row["intervals_ms"] if row["intervals_ms"] else 0.0
+        row["vectors_speedup"] = base_vec / row["vectors_ms"] if row["vectors_ms"] else 0.0
+        print(f"{name:<10} {row['intervals_ms']:>8.1f}ms {row['intervals_speedup']:>6.1f}x "
+              f"{row['vectors_ms']:>8.1f}ms {row['vectors_speedup']:>6.1f}x")
+    if mismatched:
+        print("结果与参照实现不一致：")
+        for line in mismatched[:20]:
+            print(f"  {line}")
+    else:
+        print("所有实现的结果与参照实现完全一致。")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"args": vars(args), "rooms": n_rooms, "rows": rows, "mismatched": mismatched},
+                      f, ensure_ascii=False, indent=2)
+        print(f"结果已保存到 {args.json}")
+    if mismatched:
+        exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+抓取阶段的端到端吞吐基准：在本进程内启动 fake_mrbs 替身服务器，
+用与 2-getdata.py 相同的 fetcher.fetch_jobs + FetchScheduler 抓取所有区域，
+报告墙钟时间、吞吐量（请求/秒）和单请求延迟的 p50/p99。
+
+  python bench_fetch.py --areas 40 --latency-ms 80 --jitter-ms 40 --concurrency 1,4,8,16
+  python bench_fetch.py --error-rate 0.05 --repeat 3
+  python bench_fetch.py --revalidate       # 第二轮带 ETag，测 304 路径
+
+不访问真实服务器，不需要 Cookie。
+"""
+
+from __future__ import annotations
+import argparse
+import asyncio
+import json
+import time
+from datetime import date
+from typing import Dict, List, Optional
+
+from fake_mrbs import FakeConfig, start_server, stop_server, base_url
+from fetcher import (FetchJob, FetchResult, FetchScheduler, RetryPolicy, CircuitBreaker, CircuitOpen,
+                     fetch_jobs, latency_stats, DEFAULT_RATE, DEFAULT_MAX_ATTEMPTS, DEFAULT_RETRY_BUDGET)
+
+async def run_once(url: str, jobs: List[FetchJob], concurrency: int, rate: float,
+                   max_attempts: int, retry_budget: float,
+                   validators: Optional[Dict[FetchJob, dict]] = None) -> dict:
+    scheduler = FetchScheduler(rate=rate,
+                               retry=RetryPolicy(max_attempts=max_attempts, budget_ratio=retry_budget),
+                               breaker=CircuitBreaker(failure_threshold=0))
+    results: List[FetchResult] = []
+    aborted = None
+    t0 = time.perf_counter()
+    try:
+        async for result in fetch_jobs(jobs, "bench=1", concurrency=concurrency, base_url=url,
+                                       validators=validators, scheduler=scheduler):
+            results.append(result)
+    except CircuitOpen as e:
+        aborted = str(e)
+    wall = time.perf_counter() - t0
+    stats = latency_stats(results)
+    return {
+        "concurrency": concurrency,
+        "requests": len(results),
+        "ok": sum(r.ok for r in results),
+        "not_modified": sum(r.not_modified for r in results),
+        "failed": sum(not r.ok for r in results),
+        "retries": scheduler.retries_used,
+        "wall_s": wall,
+        "throughput": len(results) / wall if wall > 0 else 0.0,
+        "p50_ms": stats["p50"] * 1000,
+        "p99_ms": stats["p99"] * 1000,
+        "max_ms": stats["max"] * 1000,
+        "aborted": aborted,
+        "results": results,
+    }
+
+def print_row(row: dict) -> None:
+    print(f"{row['concurrency']:>5} {row['requests']:>6} {row['ok']:>5} {row['not_modified']:>5} "
+          f"{row['failed']:>5} {row['retries']:>5} {row['wall_s']:>8.2f} {row['throughput']:>8.1f} "
+          f"{row['p50_ms']:>8.1f} {row['p99_ms']:>8.1f}")
+    if row["aborted"]:
+        print(f"      熔断: {row['aborted']}")
+
+def parse_concurrency(text: str) -> List[int]:
+    return [max(1, int(x)) for x in text.split(",") if x.strip()]
+
+def main():
+    ap = argparse.ArgumentParser(description="抓取阶段吞吐基准（本地替身服务器）")
+    ap.add_argument("--areas", type=int, default=40, help="区域数量，即每轮请求数")
+    ap.add_argument("--rooms", type=int, default=12, help="每个区域的房间数（影响页面大小）")
+    ap.add_argument("--view", choices=["day", "week"], default="day")
+    ap.add_argument("--concurrency", type=parse_concurrency, default=[1, 4, 8, 16],
+                    help="逗号分隔的并发数列表，逐个测量（默认 1,4,8,16）")
+    ap.add_argument("--latency-ms", type=float, default=50.0, help="服务端延迟")
+    ap.add_argument("--jitter-ms", type=float, default=20.0, help="服务端延迟抖动（±）")
+    ap.add_argument("--error-rate", type=float, default=0.0, help="503 比例")
+    ap.add_argument("--sso-rate", type=float, default=0.0, help="SSO 跳转比例")
+    ap.add_argument("--rate", type=float, default=DEFAULT_RATE * 100,
+                    help="客户端限速（默认放宽到不成为瓶颈）")
+    ap.add_argument("--max-attempts", type=int, default=DEFAULT_MAX_ATTEMPTS)
+    ap.add_argument("--retry-budget", type=float, default=DEFAULT_RETRY_BUDGET)
+    ap.add_argument("--repeat", type=int, default=1, help="每个并发数重复的次数")
+    ap.add_argument("--revalidate", action="store_true",
+                    help="每次测量后再带 ETag 抓一轮，测条件请求（304）路径")
+    ap.add_argument("--json", default=None, help="把结果另存为 JSON")
+    args = ap.parse_args()
+
+    config = FakeConfig(areas=args.areas, rooms=args.rooms, latency_ms=args.latency_ms,
+                        jitter_ms=args.jitter_ms, error_rate=args.error_rate, sso_rate=args.sso_rate)
+    srv = start_server(config)
+    url = base_url(srv)
+    today = date.today()
+    jobs = [FetchJob(aid, name, today, args.view) for aid, name in config.area_names().items()]
+    print(f"替身服务器: {url}  区域 {args.areas}  视图 {args.view}  "
+          f"延迟 {args.latency_ms:g}±{args.jitter_ms:g} ms  503 比例 {args.error_rate:g}")
+    print(f"{'并发':>5} {'请求':>6} {'成功':>5} {'304':>5} {'失败':>5} {'重试':>5} "
+          f"{'墙钟s':>8} {'req/s':>8} {'p50ms':>8} {'p99ms':>8}")
+
+    rows = []
+    try:
+        for c in args.concurrency:
+            for _ in range(max(1, args.repeat)):
+                row = asyncio.run(run_once(url, jobs, c, args.rate, args.max_attempts, args.retry_budget))
+                print_row(row)
+                rows.append({k: v for k, v in row.items() if k != "results"} | {"pass": "full"})
+                if args.revalidate:
+                    validators = {FetchJob(r.area_id, r.area_name, r.target_date, r.view): {"etag": r.etag}
+                                  for r in row["results"] if r.ok and r.etag}
+                    row = asyncio.run(run_once(url, jobs, c, args.rate, args.max_attempts,
+                                               args.retry_budget, validators))
+                    print_row(row)
+                    rows.append({k: v for k, v in row.items() if k != "results"} | {"pass": "revalidate"})
+    finally:
+        stop_server(srv)
+
+    print("服务器统计: " + ", ".join(f"{k}={v}" for k, v in srv.stats.items()))
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"config": vars(args) | {"concurrency": args.concurrency}, "runs": rows},
+                      f, ensure_ascii=False, indent=2)
+        print(f"结果已保存到 {args.json}")
+
+if __name__ == "__main__":
+    main()
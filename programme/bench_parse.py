@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+日视图解析基准：比较 mrbs_pages.DAY_PARSERS 中各解析器的单页耗时，并逐页核对输出是否一致。
+
+  python bench_parse.py                          合成 20 个区域、每区域 12 个房间的页面
+  python bench_parse.py --rooms 40 --repeat 10
+  python bench_parse.py --pages pages_17-10-2026 用真实抓取的页面
+
+任何一页的输出与 bs4 参照实现不同都会列出，退出码为 1。
+"""
+
+from __future__ import annotations
+import argparse
+import json
+import statistics
+import time
+from datetime import date
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+import synth_pages
+from mrbs_pages import DAY_PARSERS
+
+REFERENCE = "bs4"
+
+def load_pages(folder: str) -> Tuple[List[Tuple[str, str]], dict]:
+    base = Path(folder)
+    pages = []
+    for path in sorted(base.glob("area_*.html")):
+        if path.name.endswith(".week.html"):
+            continue
+        pages.append((path.stem[len("area_"):], path.read_text(encoding="utf-8")))
+    mapping_path = Path(__file__).resolve().parent / "area_mapping.json"
+    area_map = json.loads(mapping_path.read_text(encoding="utf-8")) if mapping_path.exists() else {}
+    return pages, area_map
+
+def synth(areas: int, rooms: int, seed: int) -> Tuple[List[Tuple[str, str]], dict]:
+    area_map = {str(i): f"Area {i}" for i in range(1, areas + 1)}
+    today = date.today()
+    pages = [(aid, synth_pages.make_day_page(aid, area_map, today, n_rooms=rooms, seed=seed))
+             for aid in area_map]
+    return pages, area_map
+
+def time_parser(parse, pages, area_map, repeat: int) -> Tuple[List[float], list]:
+    """返回 (每页耗时毫秒，按页取 repeat 次中的最小值, 最后一轮的输出)。"""
+    best = [float("inf")] * len(pages)
+    outputs = [None] * len(pages)
+    for _ in range(repeat):
+        for i, (aid, html) in enumerate(pages):
+            t0 = time.perf_counter()
+            outputs[i] = parse(html, aid, area_map)
+            best[i] = min(best[i], (time.perf_counter() - t0) * 1000)
+    return best, outputs
+
+def main():
+    ap = argparse.ArgumentParser(description="比较日视图解析器的速度并核对输出")
+    ap.add_argument("--pages", default=None, help="pages_ 目录；不给时使用合成页面")
+    ap.add_argument("--areas", type=int, default=20, help="合成页面的区域数")
+    ap.add_argument("--rooms", type=int, default=12, help="合成页面每区域的房间数")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--repeat", type=int, default=5, help="每页重复解析次数，取最小值")
+    ap.add_argument("--json", default=None, help="把结果另存为 JSON")
+    args = ap.parse_args()
+
+    if args.pages:
+        pages, area_map = load_pages(args.pages)
+        source = args.pages
+    else:
+        pages, area_map = synth(args.areas, args.rooms, args.seed)
+        source = f"合成 {args.areas} 区域 × {args.rooms} 房间"
+    if not pages:
+        print("没有可用的页面。")
+        exit(1)
+    size = sum(len(h) for _, h in pages) / len(pages)
+    print(f"页面: {source}，共 {len(pages)} 页，平均 {size/1024:.1f} KiB，每页重复 {args.repeat} 次")
+
+    rows: Dict[str, dict] = {}
+    outputs: Dict[str, list] = {}
+    for name, parse in DAY_PARSERS.items():
+        times, outputs[name] = time_parser(parse, pages, area_map, max(1, args.repeat))
+        rows[name] = {"mean_ms": statistics.mean(times), "p50_ms": statistics.median(times),
+                      "max_ms": max(times), "total_ms": sum(times)}
+
+    ref = rows[REFERENCE]["mean_ms"]
+    print(f"{'解析器':<8} {'平均':>9} {'p50':>9} {'最大':>9} {'总计':>10} {'加速':>7}")
+    for name, row in rows.items():
+        row["speedup"] = ref / row["mean_ms"] if row["mean_ms"] else 0.0
+        print(f"{name:<8} {row['mean_ms']:>7.2f}ms {row['p50_ms']:>7.2f}ms {row['max_ms']:>7.2f}ms "
+              f"{row['total_ms']:>8.1f}ms {row['speedup']:>6.1f}x")
+
+    mismatched = []
+    for name in DAY_PARSERS:
+        for (aid, _), a, b in zip(pages, outputs[REFERENCE], outputs[name]):
+            if json.dumps(a, ensure_ascii=False) != json.dumps(b, ensure_ascii=False):
+                mismatched.append(f"{name}: area {aid}")
+    if mismatched:
+        print("输出与 bs4 不一致：")
+        for line in mismatched:
+            print(f"  {line}")
+    else:
+        print("所有解析器的输出与 bs4 完全一致。")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"pages": len(pages), "source": source, "parsers": rows,
+                       "mismatched": mismatched}, f, ensure_ascii=False, indent=2)
+        print(f"结果已保存到 {args.json}")
+    if mismatched:
+        exit(1)
+
+if __name__ == "__main__":
+    main()
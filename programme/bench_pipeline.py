@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+3/4 阶段的规模基准：用 synth_pages 按房间总数生成日视图页面（附标准答案），
+依次计时 3 阶段（解析 + 写 data_ 文件）和 4 阶段（读 data_ + 压缩成向量 + 写 ready_data_），
+并把两阶段的结果与标准答案逐房间核对。
+
+  python bench_pipeline.py                                  10 / 100 / 1000 / 10000 个房间
+  python bench_pipeline.py --rooms 100,1000 --rooms-per-area 0   所有房间放在同一个区域
+  python bench_pipeline.py --odd-layout --slot-minutes 15 --day-start 07:00 --max-span 8
+
+解析器：fast 为默认路径（快速扫描 + 紧凑 slots 格式），bs4 为 BeautifulSoup + 逐房间字典的旧路径；
+bs4 很慢，房间数超过 --max-bs4-rooms 时跳过。文件写在临时目录中，不影响 programme 下的数据。
+任何一项核对失败时退出码为 1。
+"""
+
+from __future__ import annotations
+import argparse
+import json
+import math
+import tempfile
+import time
+from datetime import date
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+import slots
+import synth_pages
+from mrbs_pages import day_slots_parser, parse_html_to_schedule
+from vectorize import data_to_vectors, write_vectors
+
+def parse_hhmm(text: str) -> int:
+    h, m = map(int, text.split(":"))
+    return h * 60 + m
+
+def make_corpus(total_rooms: int, per_area: int, args) -> Tuple[List[Tuple[str, str]], Dict[str, list], dict]:
+    """返回 ([(area_id, html)], {area_id: 标准答案}, area_map)。"""
+    per_area = per_area if per_area > 0 else total_rooms
+    n_areas = max(1, math.ceil(total_rooms / per_area))
+    area_map = {str(i): f"Synthetic Area {i}" for i in range(1, n_areas + 1)}
+    pages, truth = [], {}
+    left = total_rooms
+    for aid in area_map:
+        n = min(per_area, left)
+        left -= n
+        html, expected = synth_pages.build_day_page(
+            aid, area_map, date.today(), n_rooms=n, seed=args.seed, slot_minutes=args.slot_minutes,
+            density=args.density, max_span=args.max_span, day_start=parse_hhmm(args.day_start),
+            day_end=parse_hhmm(args.day_end), odd_layout=args.odd_layout)
+        pages.append((aid, html))
+        truth[aid] = expected
+    return pages, truth, area_map
+
+def stage3(parser: str, pages, area_map: dict, out_dir: Path) -> Tuple[float, Dict[str, object]]:
+    """解析并写 data_ 文件（fast 写紧凑格式，bs4 写逐房间字典，与 3-html2rawdata.py 相同）。"""
+    parse_slots = day_slots_parser("fast")
+    parsed = {}
+    t0 = time.perf_counter()
+    for aid, html in pages:
+        if parser == "fast":
+            area = parse_slots(html, aid, area_map)
+            data = area.to_json()
+            dump = dict(ensure_ascii=False, separators=(",", ":"))
+        else:
+            data = parse_html_to_schedule(html, aid, area_map)
+            dump = dict(ensure_ascii=False, indent=2)
+        with (out_dir / f"area_{aid}.json").open("w", encoding="utf-8") as f:
+            json.dump(data, f, **dump)
+        parsed[aid] = data
+    return time.perf_counter() - t0, parsed
+
+def stage4(data_dir: Path, ready_dir: Path) -> Tuple[float, Dict[str, list]]:
+    vectors = {}
+    t0 = time.perf_counter()
+    for fp in sorted(data_dir.glob("area_*.json")):
+        with fp.open("r", encoding="utf-8") as f:
+            data = json.load(f)
+        outputs = data_to_vectors(data, "json")
+        write_vectors(ready_dir / fp.name, outputs, "json")
+        vectors[fp.stem[len("area_"):]] = outputs
+    return time.perf_counter() - t0, vectors
+
+def check(parsed: Dict[str, object], vectors: Dict[str, list], truth: Dict[str, list]) -> List[str]:
+    errors = []
+    for aid, expected in truth.items():
+        data = parsed.get(aid)
+        rooms = slots.AreaSlots.from_json(data).to_rooms() if slots.is_slots_data(data) else data
+        want = [{k: v for k, v in room.items() if k != "free"} for room in expected]
+        if rooms != want:
+            bad = next((w["room_id"] for r, w in zip(rooms or [], want) if r != w), "?")
+            errors.append(f"区域 {aid}: 3 阶段结果与标准答案不符（首个不符的房间 {bad}）")
+        got = sorted((v["room_id"], v["start_index"], v["end_index"]) for v in vectors.get(aid, []))
+        exp = sorted((room["room_id"], s, e) for room in expected for s, e in room["free"])
+        if got != exp:
+            errors.append(f"区域 {aid}: 向量与标准答案不符（{len(got)} / {len(exp)} 条）")
+    return errors
+
+def main():
+    ap = argparse.ArgumentParser(description="3/4 阶段从 10 到 10000 个房间的规模基准，并与标准答案核对")
+    ap.add_argument("--rooms", default="10,100,1000,10000", help="房间总数，逗号分隔")
+    ap.add_argument("--rooms-per-area", type=int, default=25, help="每个区域的房间数；0 表示全部放在一个区域")
+    ap.add_argument("--parsers", default="fast,bs4", help="要测的路径，逗号分隔（fast / bs4）")
+    ap.add_argument("--max-bs4-rooms", type=int, default=1000, help="房间数超过此值时跳过 bs4")
+    ap.add_argument("--slot-minutes", type=int, default=30)
+    ap.add_argument("--day-start", default="08:00")
+    ap.add_argument("--day-end", default="22:00")
+    ap.add_argument("--density", type=float, default=0.35, help="每个空格开始一个预订的概率")
+    ap.add_argument("--max-span", type=int, default=4, help="预订最多跨越的时段数（rowspan）")
+    ap.add_argument("--odd-layout", action="store_true", help="混入不常见的页面写法")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--json", default=None, help="把结果另存为 JSON")
+    args = ap.parse_args()
+
+    sizes = [int(x) for x in args.rooms.replace(",", " ").split()]
+    parsers = [x for x in args.parsers.replace(",", " ").split() if x]
+    print(f"{'房间':>6} {'区域':>5} {'页面MiB':>8} {'路径':<5} {'3阶段ms':>9} {'µs/房间':>8} "
+          f"{'4阶段ms':>9} {'µs/房间':>8} {'向量':>8}  核对")
+    rows, failed = [], False
+    for n in sizes:
+        pages, truth, area_map = make_corpus(n, args.rooms_per_area, args)
+        size_mib = sum(len(h) for _, h in pages) / 2**20
+        for parser in parsers:
+            if parser == "bs4" and n > args.max_bs4_rooms:
+                continue
+            with tempfile.TemporaryDirectory(prefix="bench_pipeline_") as tmp:
+                data_dir, ready_dir = Path(tmp) / "data", Path(tmp) / "ready"
+                data_dir.mkdir()
+                ready_dir.mkdir()
+                t3, parsed = stage3(parser, pages, area_map, data_dir)
+                t4, vectors = stage4(data_dir, ready_dir)
+            errors = check(parsed, vectors, truth)
+            failed = failed or bool(errors)
+            n_vec = sum(len(v) for v in vectors.values())
+            row = {"rooms": n, "areas": len(pages), "page_mib": round(size_mib, 2), "parser": parser,
+                   "stage3_ms": t3 * 1000, "stage4_ms": t4 * 1000, "vectors": n_vec, "errors": errors}
+            rows.append(row)
+            print(f"{n:>6} {len(pages):>5} {size_mib:>8.2f} {parser:<5} {t3*1000:>9.1f} {t3*1e6/n:>8.1f} "
+                  f"{t4*1000:>9.1f} {t4*1e6/n:>8.1f} {n_vec:>8}  {'✓' if not errors else '✗'}")
+            for line in errors[:5]:
+                print(f"       {line}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"args": vars(args), "rows": rows}, f, ensure_ascii=False, indent=2)
+        print(f"结果已保存到 {args.json}")
+    if failed:
+        exit(1)
+
+if __name__ == "__main__":
+    main()
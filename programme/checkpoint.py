@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+抓取断点清单与数据完整性标记。
+
+2-getdata.py 在每个输出目录（pages_ 或流式模式下的 ready_data_）写 _checkpoint.json：
+
+  {"run_id": ..., "started": ..., "updated": ..., "complete": false,
+   "pages": {"24": {"status": "ok", "attempts": 1, "bytes": 51234, "sha256": "...",
+                    "error": "", "updated": ...},
+             "week:25": {"status": "failed", "attempts": 3, "error": "HTTP 503", ...},
+             "31": {"status": "pending", ...}}}
+
+每个结果落盘后立即更新（原子写），进程中途被杀也能知道哪些区域已经完成；
+--resume 时只重抓不是 ok、或文件已丢失/被改动的区域。
+
+下游阶段用 incomplete_areas() 判断上游目录是否完整：抓取清单中未完成的区域，
+加上上游阶段传下来的 _incomplete.json 标记。3-html2rawdata.py 默认拒绝不完整的
+pages_ 目录；允许处理时把缺失的区域写进输出目录的 _incomplete.json，一路传到 ready_data_。
+"""
+
+from __future__ import annotations
+import hashlib
+import json
+import os
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+
+CHECKPOINT_FILE = "_checkpoint.json"
+INCOMPLETE_FILE = "_incomplete.json"
+
+def _now() -> str:
+    return datetime.now().isoformat(timespec="seconds")
+
+def _read_json(path: str) -> dict:
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+    return data if isinstance(data, dict) else {}
+
+def _write_json(path: str, data: dict) -> None:
+    tmp = path + ".tmp"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=1, sort_keys=True)
+    os.replace(tmp, path)
+
+def file_digest(path: str) -> Optional[tuple]:
+    """返回 (字节数, sha256)；文件不存在时返回 None。"""
+    try:
+        with open(path, 'rb') as f:
+            data = f.read()
+    except OSError:
+        return None
+    return len(data), hashlib.sha256(data).hexdigest()
+
+def area_of(key: str) -> str:
+    """清单键（"24" 或 "week:24"）对应的区域 id。"""
+    return key.split(":", 1)[1] if ":" in key else key
+
+class Checkpoint:
+    def __init__(self, folder: str, data: Optional[dict] = None):
+        self.folder = folder
+        self.path = os.path.join(folder, CHECKPOINT_FILE)
+        now = _now()
+        self.data = data or {"run_id": datetime.now().strftime("%Y%m%dT%H%M%S"),
+                             "started": now, "updated": now, "complete": False, "pages": {}}
+
+    @classmethod
+    def load(cls, folder: str) -> "Checkpoint":
+        """读取已有清单（--resume）；没有或损坏时返回新的空清单。"""
+        data = _read_json(os.path.join(folder, CHECKPOINT_FILE))
+        return cls(folder, data if isinstance(data.get("pages"), dict) else None)
+
+    @property
+    def pages(self) -> Dict[str, dict]:
+        return self.data["pages"]
+
+    def expect(self, keys: Iterable[str]) -> None:
+        for key in keys:
+            self.pages.setdefault(key, {"status": "pending", "attempts": 0})
+
+    def is_done(self, key: str, path: Optional[str] = None) -> bool:
+        """清单记录为 ok；给出 path 时还要求文件仍在且内容与记录一致。"""
+        entry = self.pages.get(key, {})
+        if entry.get("status") != "ok":
+            return False
+        if path is None:
+            return True
+        digest = file_digest(path)
+        return digest is not None and digest[1] == entry.get("sha256")
+
+    def record(self, key: str, ok: bool, attempts: int = 1, content: Optional[str] = None,
+               path: Optional[str] = None, error: str = "") -> None:
+        """
+        记录一个页面的结果。content 为本次拿到的页面；304 等没有正文的情况下
+        从 path 读取磁盘上的文件，都没有时沿用上次记录的大小和哈希。
+        """
+        prev = self.pages.get(key, {})
+        entry = {
+            "status": "ok" if ok else "failed",
+            "attempts": prev.get("attempts", 0) + attempts,
+            "bytes": prev.get("bytes"),
+            "sha256": prev.get("sha256"),
+            "error": error,
+            "updated": _now(),
+        }
+        if ok:
+            if content is not None:
+                data = content.encode("utf-8")
+                entry["bytes"], entry["sha256"] = len(data), hashlib.sha256(data).hexdigest()
+            elif path is not None:
+                digest = file_digest(path)
+                if digest is not None:
+                    entry["bytes"], entry["sha256"] = digest
+        self.pages[key] = entry
+
+    def missing(self) -> List[str]:
+        return sorted((k for k, v in self.pages.items() if v.get("status") != "ok"),
+                      key=lambda k: (len(area_of(k)), area_of(k), k))
+
+    def counts(self) -> Dict[str, int]:
+        out: Dict[str, int] = {}
+        for v in self.pages.values():
+            out[v.get("status", "pending")] = out.get(v.get("status", "pending"), 0) + 1
+        return out
+
+    def save(self) -> None:
+        self.data["updated"] = _now()
+        self.data["complete"] = not self.missing()
+        os.makedirs(self.folder, exist_ok=True)
+        _write_json(self.path, self.data)
+
+# ---------- 下游阶段 ----------
+
+def incomplete_areas(folder: str) -> List[str]:
+    """
+    目录中缺失的区域 id：抓取清单里不是 ok 的，加上 _incomplete.json 里上游传下来的。
+    没有任何记录（旧版本生成的目录）时视为完整，返回空列表。
+    """
+    areas = set()
+    cp = _read_json(os.path.join(folder, CHECKPOINT_FILE))
+    for key, entry in (cp.get("pages") or {}).items():
+        if isinstance(entry, dict) and entry.get("status") != "ok":
+            areas.add(area_of(key))
+    areas.update(_read_json(os.path.join(folder, INCOMPLETE_FILE)).get("areas", []))
+    return sorted(areas, key=lambda x: (len(x), x))
+
+def mark_incomplete(folder: str, areas: Iterable[str], source: str) -> None:
+    areas = sorted(set(areas), key=lambda x: (len(x), x))
+    path = os.path.join(folder, INCOMPLETE_FILE)
+    if not areas:
+        clear_incomplete(folder)
+        return
+    _write_json(path, {"areas": areas, "source": source, "marked": _now()})
+
+def clear_incomplete(folder: str) -> None:
+    try:
+        os.remove(os.path.join(folder, INCOMPLETE_FILE))
+    except FileNotFoundError:
+        pass
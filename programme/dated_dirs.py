@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+pages_/data_/ready_data_ 这类按日期命名（前缀 + dd-mm-yyyy）的目录的查找与清理。
+ready_data_ 目录内部按版本发布（见 versions.py），仍有读取方持有版本的过期目录暂不删除。
+"""
+
+from __future__ import annotations
+import re
+import shutil
+from datetime import date
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+import versions
+
+DATE_FMT = "%d-%m-%Y"
+
+def dir_name(prefix: str, d: date) -> str:
+    return f"{prefix}{d.strftime(DATE_FMT)}"
+
+def parse_dir_date(name: str, prefix: str) -> Optional[date]:
+    m = re.fullmatch(re.escape(prefix) + r"(\d{2})-(\d{2})-(\d{4})", name)
+    if not m:
+        return None
+    dd, mm, yyyy = map(int, m.groups())
+    try:
+        return date(yyyy, mm, dd)
+    except ValueError:
+        return None
+
+def list_dated_dirs(base: Path, prefix: str) -> List[Tuple[date, Path]]:
+    """返回 base 下所有 prefix 日期目录，按日期升序。"""
+    out = []
+    for p in Path(base).iterdir():
+        if p.is_dir():
+            d = parse_dir_date(p.name, prefix)
+            if d is not None:
+                out.append((d, p))
+    out.sort(key=lambda x: x[0])
+    return out
+
+def pick_dir(base: Path, prefix: str, target: Optional[date] = None) -> Optional[Path]:
+    """
+    指定 target 时只返回该日期的目录；否则优先今天，其次今天之前最新的一个，
+    再其次（只有未来日期时）最早的一个。
+    """
+    dirs = list_dated_dirs(base, prefix)
+    if target is not None:
+        return next((p for d, p in dirs if d == target), None)
+    if not dirs:
+        return None
+    today = date.today()
+    past = [p for d, p in dirs if d <= today]
+    return past[-1] if past else dirs[0][1]
+
+def current_dirs(base: Path, prefix: str) -> List[Tuple[date, Path]]:
+    """今天及以后的目录；若一个都没有，则退回到最新的那个。"""
+    dirs = list_dated_dirs(base, prefix)
+    today = date.today()
+    upcoming = [(d, p) for d, p in dirs if d >= today]
+    return upcoming or dirs[-1:]
+
+def remove_expired(base: Path, prefix: str, keep: Optional[Path] = None, log=print) -> None:
+    """删除日期早于今天的 prefix 目录（keep 指定的目录以及仍有读取方的目录除外）。"""
+    today = date.today()
+    for d, p in list_dated_dirs(base, prefix):
+        if d < today and (keep is None or p.resolve() != Path(keep).resolve()):
+            if versions.is_pinned(p):
+                log(f"过期文件夹 {p.name} 仍有查询在读取，下次再清理")
+                continue
+            try:
+                shutil.rmtree(p)
+                log(f"清理过期文件夹: {p.name}")
+            except OSError as e:
+                log(f"删除文件夹失败 {p.name}：{e}")
@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+本地的 MRBS 替身服务器，用于离线测试抓取阶段和做吞吐基准。
+
+只实现 2-getdata.py 用到的部分：
+  GET /index.php?view=day|week&view_all=1&page_date=YYYY-MM-DD&area=<id>
+页面来自 --fixtures 目录（area_{id}.html / area_{id}.week.html，与 pages_ 目录相同），
+没有对应文件时由 synth_pages 即时合成。每个响应带 ETag，请求带匹配的
+If-None-Match 时返回 304。
+
+可模拟的情况：
+  --latency-ms / --jitter-ms   每个请求的服务端延迟
+  --error-rate                 按比例返回 503（带 Retry-After）
+  --sso-rate / --sso-areas     302 跳转到本地的 /sso.xjtlu.edu.cn/login，模拟会话过期
+  --change-rate                每次请求有一定概率使该区域的内容换一个版本
+  --session-cookie             只接受 Cookie 中含有该片段的请求，其余跳转到 SSO
+
+用法：
+  python fake_mrbs.py --port 8765 --areas 40 --latency-ms 80
+  然后 python 2-getdata.py --base-url http://127.0.0.1:8765/index.php
+"""
+
+from __future__ import annotations
+import argparse
+import hashlib
+import random
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import date
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, List, Optional
+from urllib.parse import parse_qs, urlparse
+
+import synth_pages
+
+SSO_PATH = "/sso.xjtlu.edu.cn/login"
+
+@dataclass
+class FakeConfig:
+    areas: int = 20
+    rooms: int = 12
+    latency_ms: float = 0.0
+    jitter_ms: float = 0.0
+    error_rate: float = 0.0
+    sso_rate: float = 0.0
+    sso_areas: List[str] = field(default_factory=list)
+    change_rate: float = 0.0
+    session_cookie: str = ""
+    seed: int = 0
+    fixtures: Optional[Path] = None
+
+    def area_names(self) -> Dict[str, str]:
+        return {str(i): f"Area {i}" for i in range(1, self.areas + 1)}
+
+class FakeMRBS(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128
+
+    def __init__(self, address, config: FakeConfig):
+        super().__init__(address, FakeHandler)
+        self.config = config
+        self.area_names = config.area_names()
+        self.rnd = random.Random(config.seed)
+        self.lock = threading.Lock()
+        self.versions: Dict[str, int] = {}
+        self.stats: Dict[str, int] = {"requests": 0, "200": 0, "304": 0, "302": 0, "503": 0, "404": 0}
+        self._cache: Dict[tuple, tuple] = {}
+
+    # ---------- 状态 ----------
+    def count(self, key: str) -> None:
+        with self.lock:
+            self.stats[key] = self.stats.get(key, 0) + 1
+
+    def roll(self, rate: float) -> bool:
+        if rate <= 0:
+            return False
+        with self.lock:
+            return self.rnd.random() < rate
+
+    def delay(self) -> float:
+        cfg = self.config
+        if cfg.latency_ms <= 0 and cfg.jitter_ms <= 0:
+            return 0.0
+        with self.lock:
+            jitter = self.rnd.uniform(-cfg.jitter_ms, cfg.jitter_ms)
+        return max(0.0, cfg.latency_ms + jitter) / 1000.0
+
+    def version_of(self, area_id: str) -> int:
+        with self.lock:
+            if self.config.change_rate > 0 and self.rnd.random() < self.config.change_rate:
+                self.versions[area_id] = self.versions.get(area_id, 0) + 1
+            return self.versions.get(area_id, 0)
+
+    # ---------- 页面 ----------
+    def page(self, area_id: str, view: str, page_date: date) -> Optional[tuple]:
+        """返回 (body bytes, etag)；区域不存在时返回 None。"""
+        fixtures = self.config.fixtures
+        if fixtures is not None:
+            name = f"area_{area_id}.week.html" if view == "week" else f"area_{area_id}.html"
+            path = fixtures / name
+            if path.exists():
+                body = path.read_bytes()
+                return body, '"' + hashlib.sha256(body).hexdigest()[:16] + '"'
+        if area_id not in self.area_names:
+            return None
+        version = self.version_of(area_id)
+        key = (area_id, view, page_date, version)
+        with self.lock:
+            cached = self._cache.get(key)
+        if cached is not None:
+            return cached
+        make = synth_pages.make_week_page if view == "week" else synth_pages.make_day_page
+        body = make(area_id, self.area_names, page_date, n_rooms=self.config.rooms,
+                    seed=self.config.seed, version=version).encode("utf-8")
+        entry = (body, '"' + hashlib.sha256(body).hexdigest()[:16] + '"')
+        with self.lock:
+            self._cache[key] = entry
+        return entry
+
+class FakeHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: FakeMRBS
+
+    def log_message(self, format, *args):
+        pass
+
+    def _reply(self, status: int, body: bytes = b"", headers: Optional[dict] = None) -> None:
+        self.send_response(status)
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if body:
+            self.wfile.write(body)
+        self.server.count(str(status))
+
+    def do_GET(self):
+        srv = self.server
+        srv.count("requests")
+        url = urlparse(self.path)
+        if url.path == SSO_PATH:
+            self._reply(200, b"<html><body>SSO login</body></html>", {"Content-Type": "text/html; charset=utf-8"})
+            return
+        if not url.path.endswith("index.php"):
+            self._reply(404, b"not found")
+            return
+
+        qs = parse_qs(url.query)
+        # 不带 area 参数时 MRBS 显示默认区域
+        area_id = qs.get("area", [""])[0] or next(iter(srv.area_names), "")
+        view = qs.get("view", ["day"])[0]
+        try:
+            page_date = date.fromisoformat(qs.get("page_date", [""])[0])
+        except ValueError:
+            page_date = date.today()
+
+        wait = srv.delay()
+        if wait:
+            time.sleep(wait)
+
+        cfg = srv.config
+        logged_out = bool(cfg.session_cookie) and cfg.session_cookie not in self.headers.get("Cookie", "")
+        if logged_out or area_id in cfg.sso_areas or srv.roll(cfg.sso_rate):
+            self._reply(302, headers={"Location": f"http://{self.headers.get('Host', 'localhost')}{SSO_PATH}"})
+            return
+        if srv.roll(cfg.error_rate):
+            self._reply(503, b"busy", {"Retry-After": "0"})
+            return
+
+        page = srv.page(area_id, view, page_date)
+        if page is None:
+            self._reply(404, b"unknown area")
+            return
+        body, etag = page
+        if self.headers.get("If-None-Match") == etag:
+            self._reply(304, headers={"ETag": etag})
+            return
+        self._reply(200, body, {"Content-Type": "text/html; charset=utf-8", "ETag": etag})
+
+def start_server(config: FakeConfig, host: str = "127.0.0.1", port: int = 0) -> FakeMRBS:
+    """在后台线程中启动服务器；port=0 时自动选择空闲端口。用完调用 stop_server。"""
+    srv = FakeMRBS((host, port), config)
+    threading.Thread(target=srv.serve_forever, name="fake-mrbs", daemon=True).start()
+    return srv
+
+def stop_server(srv: FakeMRBS) -> None:
+    srv.shutdown()
+    srv.server_close()
+
+def base_url(srv: FakeMRBS) -> str:
+    host, port = srv.server_address[:2]
+    return f"http://{host}:{port}/index.php"
+
+def main():
+    ap = argparse.ArgumentParser(description="本地 MRBS 替身服务器")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8765)
+    ap.add_argument("--areas", type=int, default=20, help="合成区域数量（area id 为 1..N）")
+    ap.add_argument("--rooms", type=int, default=12, help="每个区域的房间数")
+    ap.add_argument("--fixtures", default=None, help="页面目录（如某个 pages_ 目录），优先于合成页面")
+    ap.add_argument("--latency-ms", type=float, default=0.0)
+    ap.add_argument("--jitter-ms", type=float, default=0.0)
+    ap.add_argument("--error-rate", type=float, default=0.0, help="返回 503 的比例")
+    ap.add_argument("--sso-rate", type=float, default=0.0, help="跳转到 SSO 的比例")
+    ap.add_argument("--sso-areas", default="", help="总是跳转到 SSO 的区域，逗号分隔")
+    ap.add_argument("--change-rate", type=float, default=0.0, help="每次请求使内容变化的概率")
+    ap.add_argument("--session-cookie", default="", help="有效会话的 Cookie 片段，如 MRBS_SESSID=abc")
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args()
+
+    config = FakeConfig(
+        areas=args.areas, rooms=args.rooms,
+        latency_ms=args.latency_ms, jitter_ms=args.jitter_ms,
+        error_rate=args.error_rate, sso_rate=args.sso_rate,
+        sso_areas=[s.strip() for s in args.sso_areas.split(",") if s.strip()],
+        change_rate=args.change_rate, session_cookie=args.session_cookie, seed=args.seed,
+        fixtures=Path(args.fixtures) if args.fixtures else None,
+    )
+    srv = FakeMRBS((args.host, args.port), config)
+    print(f"MRBS 替身服务器已启动: {base_url(srv)}  （{config.areas} 个区域，Ctrl+C 退出）")
+    try:
+        srv.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        srv.server_close()
+        print("请求统计: " + ", ".join(f"{k}={v}" for k, v in srv.stats.items()))
+
+if __name__ == "__main__":
+    main()
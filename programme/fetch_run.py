@@ -0,0 +1,427 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+抓取任务：把 fetcher 的结果落盘到按日期命名的目录，维护增量状态和断点清单。
+
+FetchRun 把页面写入 pages_dd-mm-yyyy；StreamRun 直接解析、压缩成向量写入
+ready_data_dd-mm-yyyy 的暂存版本，由调用方在抓取结束后 publish（见 versions.py）。
+2-getdata.py 和按需抓取（lazy_fetch.py）共用这两个类。
+"""
+
+from __future__ import annotations
+import os
+import asyncio
+from pathlib import Path
+from datetime import date, datetime
+from typing import Dict, Optional
+
+import refresh
+import dated_dirs
+import ready_snapshot
+import versions
+from checkpoint import Checkpoint
+from mrbs_pages import (page_filename, page_state_key, week_dates, day_slots_parser, parse_week_html_to_schedules,
+                        DEFAULT_DAY_PARSER, PARSER_VERSION)
+import slots
+from vectorize import slots_to_vectors, write_vectors, VECTOR_VERSION
+from pagestore import PageStore
+from fetcher import (FetchJob, FetchResult, FetchScheduler, CircuitOpen, fetch_jobs, BASE_URL)
+
+def report_failure(result: FetchResult) -> str:
+    if result.sso_redirect:
+        print(f"  [失败] -> ID: {result.area_id:<4} Cookie已过期或无效。")
+    else:
+        print(f"  [失败] -> ID: {result.area_id:<4} 网络错误: {result.error}")
+    return "failed"
+
+def result_label(result: FetchResult) -> str:
+    if result.view == "day":
+        return f"{result.area_id:<4}"
+    return f"{result.area_id:<4} ({result.view} {result.target_date})"
+
+def now_stamp() -> str:
+    return datetime.now().isoformat(timespec="seconds")
+
+def age_minutes(entry: Optional[dict], now: Optional[datetime] = None) -> Optional[float]:
+    """状态条目距上次成功抓取（含 304/内容未变）过去的分钟数；没有记录时返回 None。"""
+    try:
+        fetched = datetime.fromisoformat((entry or {}).get("fetched_at", ""))
+    except ValueError:
+        return None
+    return ((now or datetime.now()) - fetched).total_seconds() / 60
+
+def save_result(result: FetchResult, save_dir: str, state: dict, store: PageStore | None = None) -> str:
+    """
+    落盘一个抓取结果并更新增量状态，返回 'changed' / 'unchanged' / 'failed'。
+    304 或 day_main 哈希未变时不重写文件，下游阶段据此跳过该区域。
+    给出 store 时同时把页面归档进内容寻址存储，未变化的页面直接复用上次的 blob。
+    """
+    area_id = result.area_id
+    if not result.ok:
+        return report_failure(result)
+
+    file_path = os.path.join(save_dir, page_filename(area_id, result.view))
+    key = page_state_key(area_id, result.view)
+    prev = state.get(key, {})
+    if result.not_modified:
+        # 304 没有正文：只要本地页面还在就算未变化，即使上次没记下哈希
+        if not os.path.exists(file_path):
+            print(f"  [失败] -> ID: {result_label(result)} 服务器返回 304，但本地页面已不存在。")
+            return "failed"
+        new_hash = prev.get("source_hash")
+        if not new_hash:
+            with open(file_path, 'r', encoding='utf-8') as f:
+                new_hash = refresh.day_main_hash(f.read())
+        changed = False
+    else:
+        new_hash = refresh.day_main_hash(result.text)
+        changed = not (new_hash and new_hash == prev.get("source_hash") and os.path.exists(file_path))
+
+    if changed:
+        with open(file_path, 'w', encoding='utf-8') as f:
+            f.write(result.text)
+    entry = {
+        "source_hash": new_hash,
+        "etag": result.etag,
+        "last_modified": result.last_modified,
+        "changed": changed,
+        "fetched_at": now_stamp(),
+    }
+    if store is not None:
+        blob = prev.get("blob")
+        if changed or not blob or not store.has(blob):
+            if result.not_modified:
+                with open(file_path, 'r', encoding='utf-8') as f:
+                    blob = store.put(f.read())
+            else:
+                blob = store.put(result.text)
+        entry["blob"] = blob
+    if result.view == "week":
+        # 记录周视图覆盖的日期，304 时沿用上次的结果
+        entry["dates"] = [d.isoformat() for d in week_dates(result.text)] if changed else prev.get("dates", [])
+    state[key] = entry
+
+    label = result_label(result)
+    if changed:
+        print(f"  [成功] -> ID: {label} {result.elapsed*1000:6.0f} ms  数据已保存至 {file_path}")
+        return "changed"
+    reason = "304" if result.not_modified else "内容哈希一致"
+    print(f"  [未变] -> ID: {label} {result.elapsed*1000:6.0f} ms  {reason}，保留原文件")
+    return "unchanged"
+
+def setup_directories(today_str: str) -> str:
+    """创建指定日期的 pages_ 目录，并清理日期早于今天的旧目录（今天和未来的预取保留）。"""
+    base_dir = os.path.dirname(os.path.abspath(__file__))
+    today_full_path = os.path.join(base_dir, f"pages_{today_str}")
+    dated_dirs.remove_expired(Path(base_dir), "pages_", keep=Path(today_full_path))
+    os.makedirs(today_full_path, exist_ok=True)
+    return today_full_path
+
+class FetchRun:
+    """
+    一次抓取任务：按日期分目录保存结果，并维护各目录的增量状态和断点清单。
+    resume=True 时沿用目录中已有的 _checkpoint.json，清单中已完成且文件完好的区域不再请求。
+    给出 max_age（分钟，area_ttls 可按区域覆盖）时，上次成功抓取距今不超过该时长的区域不再请求。
+    """
+
+    def __init__(self, cookie: str, concurrency: int, timeout: float, store: PageStore | None = None,
+                 scheduler: FetchScheduler | None = None, base_url: str = BASE_URL, resume: bool = False,
+                 max_age: float | None = None, area_ttls: Dict[str, float] | None = None):
+        self.cookie = cookie
+        self.base_url = base_url
+        self.resume = resume
+        self.max_age = max_age
+        self.area_ttls = {str(k): v for k, v in (area_ttls or {}).items()}
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.store = store
+        self.scheduler = scheduler or FetchScheduler()
+        self.aborted: CircuitOpen | None = None
+        self.archived = []
+        self.dirs = {}
+        self.states = {}
+        self.checkpoints = {}
+        self.results = []
+        self.resumed = 0
+        self.fresh = 0
+        self.counts = {"changed": 0, "unchanged": 0, "failed": 0}
+
+    def _register_dir(self, d: date, path: str) -> None:
+        self.dirs[d] = path
+        self.states[d] = refresh.load_state(path)
+        self.checkpoints[d] = Checkpoint.load(path) if self.resume else Checkpoint(path)
+
+    def dir_for(self, d: date) -> str:
+        if d not in self.dirs:
+            self._register_dir(d, setup_directories(d.strftime("%d-%m-%Y")))
+        return self.dirs[d]
+
+    def dir_label(self, d: date) -> str:
+        return os.path.basename(self.dirs[d])
+
+    def handle(self, result: FetchResult) -> str:
+        d = result.target_date
+        return save_result(result, self.dir_for(d), self.states[d], self.store)
+
+    def page_path(self, job) -> str | None:
+        return os.path.join(self.dir_for(job.target_date), page_filename(job.area_id, job.view))
+
+    def job_done(self, job: FetchJob) -> bool:
+        return self.checkpoints[job.target_date].is_done(page_state_key(job.area_id, job.view), self.page_path(job))
+
+    def record_checkpoint(self, result: FetchResult, status: str) -> None:
+        cp = self.checkpoints[result.target_date]
+        key = page_state_key(result.area_id, result.view)
+        if status == "failed":
+            cp.record(key, False, result.attempts, error=result.error or "解析失败")
+        else:
+            # 页面落盘时以磁盘上的文件为准；流式模式没有页面文件，记录响应本身
+            path = self.page_path(result)
+            content = None if path or result.not_modified else result.text
+            cp.record(key, True, result.attempts, content=content, path=path)
+        cp.save()
+
+    def skip_done(self, jobs):
+        """--resume：跳过清单中已完成的请求。"""
+        todo = [job for job in jobs if not self.job_done(job)]
+        skipped = len(jobs) - len(todo)
+        if skipped:
+            self.resumed += skipped
+            print(f"[断点] {skipped} 个请求在上次运行中已完成，跳过；剩余 {len(todo)} 个。")
+        return todo
+
+    def ttl_for(self, area_id: str) -> float | None:
+        return self.area_ttls.get(str(area_id), self.max_age)
+
+    def has_output(self, job: FetchJob, entry: dict) -> bool:
+        return os.path.exists(self.page_path(job))
+
+    def is_fresh(self, job: FetchJob) -> bool:
+        ttl = self.ttl_for(job.area_id)
+        if ttl is None:
+            return False
+        entry = self.states[job.target_date].get(page_state_key(job.area_id, job.view))
+        age = age_minutes(entry)
+        return age is not None and age <= ttl and self.has_output(job, entry)
+
+    def skip_fresh(self, jobs):
+        """跳过在 TTL 内抓取过的区域。"""
+        todo = [job for job in jobs if not self.is_fresh(job)]
+        skipped = len(jobs) - len(todo)
+        if skipped:
+            self.fresh += skipped
+            print(f"[缓存] {skipped} 个区域的数据仍在有效期内，跳过；需要抓取 {len(todo)} 个。")
+        return todo
+
+    def validators_for(self, jobs):
+        # 只有本地文件仍在时才发条件请求，否则 304 会让我们拿不到页面
+        out = {}
+        for job in jobs:
+            save_dir = self.dir_for(job.target_date)
+            entry = self.states[job.target_date].get(page_state_key(job.area_id, job.view))
+            if entry and os.path.exists(os.path.join(save_dir, page_filename(job.area_id, job.view))):
+                out[job] = entry
+        return out
+
+    async def run(self, jobs):
+        jobs = list(jobs)
+        for job in jobs:
+            self.dir_for(job.target_date)
+            self.checkpoints[job.target_date].expect([page_state_key(job.area_id, job.view)])
+        if self.resume:
+            jobs = self.skip_done(jobs)
+        if self.max_age is not None or self.area_ttls:
+            jobs = self.skip_fresh(jobs)
+        validators = self.validators_for(jobs)
+        batch = []
+        try:
+            async for result in fetch_jobs(jobs, self.cookie, concurrency=self.concurrency,
+                                           timeout=self.timeout, base_url=self.base_url,
+                                           validators=validators,
+                                           scheduler=self.scheduler):
+                batch.append(result)
+                # 解析/写盘放到线程里，避免阻塞仍在进行的网络请求
+                status = await asyncio.to_thread(self.handle, result)
+                self.record_checkpoint(result, status)
+                self.counts[status] += 1
+                d = result.target_date
+                entry = self.states[d].get(page_state_key(result.area_id, result.view), {})
+                if self.store is not None and status != "failed" and entry.get("blob"):
+                    self.archived.append({"date": d.isoformat(), "area_id": result.area_id,
+                                          "view": result.view, "blob": entry["blob"]})
+        except CircuitOpen as e:
+            self.aborted = e
+            print(f"\n[熔断] {e}")
+        finally:
+            for d, state in self.states.items():
+                refresh.save_state(self.dirs[d], state)
+                self.checkpoints[d].save()
+        self.results.extend(batch)
+        return batch
+
+    async def fetch_days(self, area_items, dates):
+        """逐日请求日视图：所有 (日期, 区域) 组合一起并发。"""
+        jobs = [FetchJob(aid, name, d, "day") for d in dates for aid, name in area_items]
+        await self.run(jobs)
+
+    async def fetch_weeks(self, area_items, dates):
+        """
+        用周视图覆盖日期范围：每轮以尚未覆盖的最早日期请求一次周视图，
+        根据返回页面实际包含的日期（服务器的周起始日不固定）决定下一轮。
+        """
+        remaining = sorted(set(dates))
+        while remaining and not self.aborted:
+            start = remaining[0]
+            await self.run([FetchJob(aid, name, start, "week") for aid, name in area_items])
+            state = self.states[start]
+            covered = set()
+            # 包括 --resume 时跳过的、上次已经完成的周视图
+            for aid, _ in area_items:
+                key = page_state_key(aid, "week")
+                if self.checkpoints[start].is_done(key):
+                    covered.update(date.fromisoformat(x) for x in state.get(key, {}).get("dates", []))
+            if not covered & set(remaining):
+                print(f"[警告] {start} 的周视图未能识别出任何日期，停止后续轮次。可改用 --view day。")
+                break
+            remaining = [d for d in remaining if d not in covered]
+
+STREAM_TOOL = f"stream/{PARSER_VERSION}/{VECTOR_VERSION}/json"
+
+class StreamRun(FetchRun):
+    """
+    流式模式：页面不写入 pages_，每个响应直接解析成紧凑的 slots.AreaSlots（parser 选择，
+    周视图经 parse_week_html_to_schedules 转换），再在空闲位图上取区间写入 ready_data_。
+    省掉 data_ 中间文件和两轮读写；原始页面是否归档由 store 决定。
+    ready_data_ 的 _refresh.json 是完整的构建清单（tool 为 STREAM_TOOL，带 fetched_at），
+    4-raw2vector.py 据此不会用更旧的 data_ 覆盖这些区域。
+    写入的是各日期当前版本的暂存副本，publish 时重写快照并发布，之后读取方才看到本次的结果。
+    """
+
+    def __init__(self, *args, area_map: dict, parser: str = DEFAULT_DAY_PARSER, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.area_map = area_map
+        self.parse_day = day_slots_parser(parser)
+        self.vectors = 0
+        self.staged: Dict[date, versions.Staging] = {}
+        self.written: set = set()       # 本次写过向量文件的日期，发布前重写快照
+
+    def dir_for(self, d: date) -> str:
+        if d not in self.dirs:
+            base = Path(__file__).resolve().parent
+            if not self.dirs:
+                dated_dirs.remove_expired(base, "ready_data_")
+            self.staged[d] = versions.Staging(base / dated_dirs.dir_name("ready_data_", d))
+            self._register_dir(d, str(self.staged[d].path))
+        return self.dirs[d]
+
+    def dir_label(self, d: date) -> str:
+        return self.staged[d].root.name if d in self.staged else dated_dirs.dir_name("ready_data_", d)
+
+    def publish(self) -> None:
+        """把各日期的暂存副本发布为新版本；之后再写入会重新从当前版本开始暂存。"""
+        for d, staging in sorted(self.staged.items()):
+            refresh.save_state(self.dirs[d], self.states[d])
+            self.checkpoints[d].save()
+            if d in self.written:
+                ready_snapshot.write_snapshot(staging.path)
+            published = staging.publish(on_rebase=ready_snapshot.write_snapshot)
+            if published != staging.base:
+                print(f"[发布] {staging.root.name}/{published.name} 已成为当前版本")
+        self.staged.clear()
+        self.written.clear()
+        self.dirs.clear()
+        self.states.clear()
+        self.checkpoints.clear()
+
+    def page_path(self, job) -> str | None:
+        return None
+
+    def job_done(self, job: FetchJob) -> bool:
+        key = page_state_key(job.area_id, job.view)
+        entry = self.states[job.target_date].get(key, {})
+        return (self.checkpoints[job.target_date].is_done(key)
+                and self.outputs_exist(entry, job.area_id, job.view, job.target_date))
+
+    def has_output(self, job: FetchJob, entry: dict) -> bool:
+        return self.outputs_exist(entry or {}, job.area_id, job.view, job.target_date)
+
+    def outputs_exist(self, entry: dict, area_id: str, view: str, d: date) -> bool:
+        if entry.get("format") != "json":
+            return False
+        days = [date.fromisoformat(x) for x in entry.get("dates", [])] if view == "week" else [d]
+        return bool(days) and all(
+            os.path.exists(os.path.join(self.dir_for(x), f"area_{area_id}.json")) for x in days)
+
+    def validators_for(self, jobs):
+        out = {}
+        for job in jobs:
+            self.dir_for(job.target_date)
+            entry = self.states[job.target_date].get(page_state_key(job.area_id, job.view))
+            if entry and self.outputs_exist(entry, job.area_id, job.view, job.target_date):
+                out[job] = entry
+        return out
+
+    def handle(self, result: FetchResult) -> str:
+        if not result.ok:
+            return report_failure(result)
+        aid, d = result.area_id, result.target_date
+        state = self.states[d]
+        key = page_state_key(aid, result.view)
+        prev = state.get(key, {})
+        new_hash = prev.get("source_hash") if result.not_modified else refresh.day_main_hash(result.text)
+
+        if result.not_modified or (new_hash == prev.get("source_hash")
+                                   and self.outputs_exist(prev, aid, result.view, d)):
+            stamp = now_stamp()
+            entry = dict(prev, etag=result.etag, last_modified=result.last_modified, changed=False, fetched_at=stamp)
+            for x in (prev.get("dates", []) if result.view == "week" else []):
+                xd = date.fromisoformat(x)
+                self.dir_for(xd)
+                if self.states[xd].get(aid):
+                    self.states[xd][aid]["fetched_at"] = stamp
+            if self.store is not None and not (entry.get("blob") and self.store.has(entry["blob"])) \
+                    and not result.not_modified:
+                entry["blob"] = self.store.put(result.text)
+            state[key] = entry
+            reason = "304" if result.not_modified else "内容哈希一致"
+            print(f"  [未变] -> ID: {result_label(result)} {result.elapsed*1000:6.0f} ms  {reason}，沿用已有向量")
+            return "unchanged"
+
+        if result.view == "week":
+            per_day = parse_week_html_to_schedules(result.text, aid, self.area_map) or {}
+            name = self.area_map.get(aid, "未知区域")
+            per_day = {x: slots.from_rooms(rooms, aid, name) for x, rooms in per_day.items() if x >= d}
+        else:
+            area = self.parse_day(result.text, aid, self.area_map)
+            per_day = {d: area} if area else {}
+        if not per_day:
+            print(f"  [失败] -> ID: {result_label(result)} 解析HTML时出错。")
+            return "failed"
+
+        n_vectors = 0
+        stamp = now_stamp()
+        out_hash = None
+        for x, area in sorted(per_day.items()):
+            outputs = slots_to_vectors(area, "json")
+            out_hash = write_vectors(Path(self.dir_for(x)) / f"area_{aid}.json", outputs, "json")
+            self.written.add(x)
+            n_vectors += len(outputs)
+            if result.view == "week":
+                self.states[x][aid] = refresh.build_entry(None, new_hash, new_hash, out_hash, STREAM_TOOL,
+                                                          format="json", fetched_at=stamp)
+        if result.view == "week":
+            entry = {"source_hash": new_hash, "format": "json"}
+        else:
+            # 日视图的抓取记录同时就是该区域的构建清单
+            entry = refresh.build_entry(None, new_hash, new_hash, out_hash, STREAM_TOOL, format="json")
+        entry.update(etag=result.etag, last_modified=result.last_modified, changed=True, fetched_at=stamp)
+        if result.view == "week":
+            entry["dates"] = [x.isoformat() for x in sorted(per_day)]
+        if self.store is not None:
+            entry["blob"] = self.store.put(result.text)
+        state[key] = entry
+        self.vectors += n_vectors
+        print(f"  [成功] -> ID: {result_label(result)} {result.elapsed*1000:6.0f} ms  "
+              f"{len(per_day)} 天，{n_vectors} 条向量")
+        return "changed"
@@ -0,0 +1,350 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+MRBS 异步抓取引擎。
+
+所有请求共用一个带连接池的 httpx.AsyncClient（keep-alive、HTTP/2、gzip），
+按并发上限同时抓取多个区域，结果按完成先后逐个返回。
+
+请求节奏由 FetchScheduler 控制：
+  - 令牌桶限速，遇到 429/503 时降速，连续成功后逐步恢复；
+  - 网络错误、429 和 5xx 按带抖动的指数退避重试，整次运行的重试次数有预算上限；
+  - 熔断器：第一次出现 SSO 跳转（Cookie 失效）或连续多次失败时立即终止整次运行，
+    由 fetch_jobs 抛出 SessionExpired / CircuitOpen 通知调用方。
+"""
+
+from __future__ import annotations
+import asyncio
+import importlib.util
+import random
+import time
+from dataclasses import dataclass
+from datetime import date
+from typing import AsyncIterator, Dict, Iterable, List, Optional, Tuple
+
+import httpx
+
+# HTTP/2 需要 httpx[http2]（h2 包）；只探测是否安装，不导入
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+BASE_URL = "https://mrbs.xjtlu.edu.cn/index.php"
+SSO_HOST = "sso.xjtlu.edu.cn"
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
+DEFAULT_CONCURRENCY = 8
+DEFAULT_TIMEOUT = 15
+DEFAULT_RATE = 10.0           # 每秒请求数上限
+DEFAULT_MAX_ATTEMPTS = 3      # 单个请求最多尝试次数（含首次）
+DEFAULT_RETRY_BUDGET = 0.2    # 整次运行的重试次数不超过请求总数的这个比例
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+class CircuitOpen(Exception):
+    """熔断器已打开，整次抓取被终止。"""
+
+class SessionExpired(CircuitOpen):
+    """遇到 SSO 跳转：Cookie 已失效，需要重新运行 1-auth.py。"""
+
+@dataclass
+class FetchResult:
+    area_id: str
+    area_name: str
+    ok: bool
+    text: str = ""
+    status: Optional[int] = None
+    error: str = ""
+    elapsed: float = 0.0          # 单个请求耗时（秒）
+    http_version: str = ""
+    sso_redirect: bool = False
+    not_modified: bool = False    # 条件请求命中 304，text 为空
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    target_date: Optional[date] = None
+    view: str = "day"
+    attempts: int = 1
+    retryable: bool = False       # 网络错误 / 429 / 5xx
+    retry_after: Optional[float] = None
+
+@dataclass(frozen=True)
+class FetchJob:
+    area_id: str
+    area_name: str
+    target_date: date
+    view: str = "day"             # "day" 或 "week"
+
+def build_params(area_id: str, target_date: date, view: str = "day") -> dict:
+    return {
+        'view': view,
+        'view_all': 1,
+        'page_date': target_date.isoformat(),
+        'area': area_id,
+    }
+
+def conditional_headers(validators: Optional[dict]) -> dict:
+    """根据上次记录的 ETag/Last-Modified 构造条件请求头。"""
+    headers = {}
+    if validators:
+        if validators.get('etag'):
+            headers['If-None-Match'] = validators['etag']
+        if validators.get('last_modified'):
+            headers['If-Modified-Since'] = validators['last_modified']
+    return headers
+
+def make_client(cookie: str, concurrency: int = DEFAULT_CONCURRENCY,
+                timeout: float = DEFAULT_TIMEOUT) -> httpx.AsyncClient:
+    limits = httpx.Limits(
+        max_connections=concurrency,
+        max_keepalive_connections=concurrency,
+        keepalive_expiry=30,
+    )
+    headers = {
+        'User-Agent': USER_AGENT,
+        'Cookie': cookie,
+        'Accept-Encoding': 'gzip, deflate',
+    }
+    return httpx.AsyncClient(
+        http2=HTTP2_AVAILABLE,
+        limits=limits,
+        timeout=timeout,
+        headers=headers,
+        follow_redirects=True,  # SSO 跳转需要跟随后才能从最终 URL 判断
+    )
+
+def _retry_after_seconds(value: Optional[str]) -> Optional[float]:
+    try:
+        return max(0.0, float(value)) if value else None
+    except ValueError:
+        return None  # HTTP 日期格式的 Retry-After 不处理，按退避计算
+
+class TokenBucket:
+    """
+    异步令牌桶。rate 会自适应：throttle() 减半（不低于 min_rate），
+    每次成功 reward() 线性回升到 max_rate。
+    """
+
+    def __init__(self, rate: float = DEFAULT_RATE, burst: Optional[float] = None, min_rate: float = 0.5):
+        self.max_rate = max(float(rate), min_rate)
+        self.min_rate = min_rate
+        self.rate = self.max_rate
+        self.capacity = burst if burst is not None else max(1.0, self.max_rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self) -> None:
+        async with self._lock:
+            while True:
+                self._refill()
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+    def throttle(self) -> None:
+        self._refill()
+        self.rate = max(self.min_rate, self.rate / 2)
+
+    def reward(self) -> None:
+        self._refill()
+        self.rate = min(self.max_rate, self.rate + self.max_rate / 20)
+
+@dataclass
+class RetryPolicy:
+    max_attempts: int = DEFAULT_MAX_ATTEMPTS
+    base_delay: float = 0.5
+    max_delay: float = 20.0
+    budget_ratio: float = DEFAULT_RETRY_BUDGET
+    min_budget: int = 3
+
+    def backoff(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        """第 attempt 次失败后的等待时间：full jitter 指数退避，服务器给了 Retry-After 时取较大者。"""
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * (2 ** (attempt - 1))))
+        if retry_after is not None:
+            delay = max(delay, min(retry_after, self.max_delay))
+        return delay
+
+class CircuitBreaker:
+    """SSO 跳转立即熔断；连续 failure_threshold 次失败（重试用尽后）也熔断。"""
+
+    def __init__(self, failure_threshold: int = 8):
+        self.failure_threshold = failure_threshold
+        self.consecutive_failures = 0
+        self.error: Optional[CircuitOpen] = None
+
+    @property
+    def is_open(self) -> bool:
+        return self.error is not None
+
+    def record_success(self) -> None:
+        self.consecutive_failures = 0
+
+    def record_failure(self, result: FetchResult) -> None:
+        if result.sso_redirect:
+            self.error = self.error or SessionExpired(
+                f"区域 {result.area_id} 被重定向到 SSO 登录页：Cookie 已过期，请重新运行 1-auth.py")
+            return
+        self.consecutive_failures += 1
+        if self.failure_threshold and self.consecutive_failures >= self.failure_threshold:
+            self.error = self.error or CircuitOpen(
+                f"连续 {self.consecutive_failures} 个请求失败（最近一次：{result.error}），终止本次抓取")
+
+class FetchScheduler:
+    """把限速、重试预算和熔断组合在一起，决定每个请求何时发、失败后是否重试。"""
+
+    def __init__(self, rate: float = DEFAULT_RATE, retry: Optional[RetryPolicy] = None,
+                 breaker: Optional[CircuitBreaker] = None):
+        self.bucket = TokenBucket(rate)
+        self.retry = retry or RetryPolicy()
+        self.breaker = breaker or CircuitBreaker()
+        self.retry_budget = 0
+        self.retries_used = 0
+
+    def plan(self, n_jobs: int) -> None:
+        self.retry_budget = max(self.retry.min_budget, int(n_jobs * self.retry.budget_ratio))
+
+    def _take_retry(self) -> bool:
+        if self.retries_used >= self.retry_budget:
+            return False
+        self.retries_used += 1
+        return True
+
+    async def run(self, attempt_once) -> FetchResult:
+        """执行 attempt_once()，按策略重试；熔断后直接抛出。"""
+        attempt = 0
+        while True:
+            if self.breaker.is_open:
+                raise self.breaker.error
+            await self.bucket.acquire()
+            if self.breaker.is_open:
+                raise self.breaker.error
+            result = await attempt_once()
+            attempt += 1
+            result.attempts = attempt
+            if result.ok:
+                self.breaker.record_success()
+                self.bucket.reward()
+                return result
+            if result.status in (429, 503):
+                self.bucket.throttle()
+            if (result.retryable and attempt < self.retry.max_attempts
+                    and not self.breaker.is_open and self._take_retry()):
+                await asyncio.sleep(self.retry.backoff(attempt, result.retry_after))
+                continue
+            self.breaker.record_failure(result)
+            return result
+
+async def fetch_area(client: httpx.AsyncClient, area_id: str, area_name: str,
+                     target_date: date, base_url: str = BASE_URL,
+                     validators: Optional[dict] = None, view: str = "day") -> FetchResult:
+    t0 = time.perf_counter()
+    meta = dict(target_date=target_date, view=view)
+    try:
+        response = await client.get(base_url, params=build_params(area_id, target_date, view),
+                                    headers=conditional_headers(validators))
+        # 先看是否被重定向到 SSO：登录页可能返回 4xx，不能让 raise_for_status 把它当成普通 HTTP 错误
+        if SSO_HOST in str(response.url):
+            return FetchResult(area_id, area_name, ok=False, status=response.status_code,
+                               error="Cookie已过期或无效", elapsed=time.perf_counter() - t0,
+                               http_version=response.http_version, sso_redirect=True, **meta)
+        if response.status_code == 304:
+            prev = validators or {}
+            return FetchResult(area_id, area_name, ok=True, status=304,
+                               elapsed=time.perf_counter() - t0,
+                               http_version=response.http_version, not_modified=True,
+                               etag=response.headers.get('ETag') or prev.get('etag'),
+                               last_modified=response.headers.get('Last-Modified') or prev.get('last_modified'),
+                               **meta)
+        response.raise_for_status()
+    except httpx.HTTPStatusError as e:
+        status = e.response.status_code
+        return FetchResult(area_id, area_name, ok=False, status=status, error=f"HTTP {status}",
+                           elapsed=time.perf_counter() - t0, retryable=status in RETRYABLE_STATUS,
+                           retry_after=_retry_after_seconds(e.response.headers.get('Retry-After')),
+                           **meta)
+    except httpx.HTTPError as e:
+        return FetchResult(area_id, area_name, ok=False, error=str(e) or type(e).__name__,
+                           elapsed=time.perf_counter() - t0,
+                           retryable=isinstance(e, httpx.TransportError), **meta)
+
+    elapsed = time.perf_counter() - t0
+    return FetchResult(area_id, area_name, ok=True, text=response.text,
+                       status=response.status_code, elapsed=elapsed,
+                       http_version=response.http_version,
+                       etag=response.headers.get('ETag'),
+                       last_modified=response.headers.get('Last-Modified'),
+                       **meta)
+
+async def fetch_jobs(jobs: Iterable[FetchJob], cookie: str,
+                     concurrency: int = DEFAULT_CONCURRENCY, timeout: float = DEFAULT_TIMEOUT,
+                     base_url: str = BASE_URL,
+                     validators: Optional[Dict[FetchJob, dict]] = None,
+                     scheduler: Optional[FetchScheduler] = None) -> AsyncIterator[FetchResult]:
+    """
+    并发执行一组 FetchJob，按完成顺序逐个 yield FetchResult。
+    同时在途的请求数不超过 concurrency；validators 按 job 提供条件请求所需的
+    etag/last_modified。熔断时先 yield 触发熔断的结果，再抛出 SessionExpired/CircuitOpen，
+    其余未完成的请求全部取消。
+    """
+    jobs = list(jobs)
+    validators = validators or {}
+    scheduler = scheduler or FetchScheduler()
+    scheduler.plan(len(jobs))
+    concurrency = max(1, int(concurrency))
+    sem = asyncio.Semaphore(concurrency)
+
+    async with make_client(cookie, concurrency, timeout) as client:
+        async def worker(job: FetchJob) -> FetchResult:
+            async with sem:
+                return await scheduler.run(lambda: fetch_area(
+                    client, job.area_id, job.area_name, job.target_date, base_url,
+                    validators=validators.get(job), view=job.view))
+
+        tasks = [asyncio.create_task(worker(job)) for job in jobs]
+        try:
+            for fut in asyncio.as_completed(tasks):
+                try:
+                    result = await fut
+                except CircuitOpen:
+                    raise scheduler.breaker.error
+                yield result
+                if scheduler.breaker.is_open:
+                    raise scheduler.breaker.error
+        finally:
+            for t in tasks:
+                t.cancel()
+
+async def fetch_areas(area_items: Iterable[Tuple[str, str]], target_date: date, cookie: str,
+                      concurrency: int = DEFAULT_CONCURRENCY, timeout: float = DEFAULT_TIMEOUT,
+                      base_url: str = BASE_URL,
+                      validators: Optional[Dict[str, dict]] = None,
+                      scheduler: Optional[FetchScheduler] = None) -> AsyncIterator[FetchResult]:
+    """抓取同一天的多个区域日视图；validators 按 area_id 索引。"""
+    validators = validators or {}
+    jobs = [FetchJob(aid, name, target_date) for aid, name in area_items]
+    by_job = {job: validators[job.area_id] for job in jobs if job.area_id in validators}
+    async for result in fetch_jobs(jobs, cookie, concurrency, timeout, base_url, by_job, scheduler):
+        yield result
+
+def percentile(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    xs = sorted(values)
+    k = (len(xs) - 1) * q
+    lo = int(k)
+    hi = min(lo + 1, len(xs) - 1)
+    return xs[lo] + (xs[hi] - xs[lo]) * (k - lo)
+
+def latency_stats(results: List[FetchResult]) -> Dict[str, float]:
+    lat = [r.elapsed for r in results]
+    return {
+        "count": len(lat),
+        "mean": sum(lat) / len(lat) if lat else 0.0,
+        "p50": percentile(lat, 0.50),
+        "p90": percentile(lat, 0.90),
+        "p99": percentile(lat, 0.99),
+        "max": max(lat) if lat else 0.0,
+    }
@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+空闲区间的历史库（SQLite，可选）。
+
+ready_data_ 只保留今天及以后的日期，旧版本发布后很快被回收。4-raw2vector.py --store 在每次
+发布后把当前版本的全部区间追加进一个 SQLite 文件（默认 programme/history.sqlite），
+用于趋势分析，也让 sub.py --store 不经过目录结构直接回答过去或已缓存日期的查询。
+
+  snapshots  每次记录的版本：日期、版本名、发布时间；同一版本只记一次
+  rooms      房间（room_id, room_name, capacity, facilities, area_id, area_name），内容相同的只存一行，
+             即跨日期、跨版本共用的房间目录
+  intervals  (snapshot, date, area_id, room, start, end, start_time, end_time, source)，
+             按 (date, area_id, room, start, end) 和 (snapshot, area_id) 建索引
+
+每个快照在一个事务里用 executemany 批量写入。字段转换规则与 sub.chunk_from_vector 相同
+（见 ready_snapshot.iter_file_fields），同一区域读出的区间与读 JSON 时顺序一致。
+
+  python history_store.py                                  各日期记录的快照数和区间数
+  python history_store.py --area 24 --from 2026-10-01 --to 2026-10-31   该区域每天的空闲时段数
+"""
+
+from __future__ import annotations
+import argparse
+import json
+import sqlite3
+from datetime import date, datetime
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+import dated_dirs
+import ready_snapshot
+import versions
+
+DEFAULT_PATH = Path(__file__).resolve().parent / "history.sqlite"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS snapshots (
+    id INTEGER PRIMARY KEY,
+    date TEXT NOT NULL,
+    version TEXT NOT NULL,
+    published_at TEXT NOT NULL,
+    recorded_at TEXT NOT NULL,
+    UNIQUE (date, version, published_at)
+);
+CREATE TABLE IF NOT EXISTS rooms (
+    id INTEGER PRIMARY KEY,
+    room_id TEXT NOT NULL,
+    room_name TEXT NOT NULL,
+    capacity INTEGER NOT NULL,
+    facilities TEXT NOT NULL,
+    area_id TEXT NOT NULL,
+    area_name TEXT NOT NULL,
+    UNIQUE (room_id, room_name, capacity, facilities, area_id, area_name)
+);
+CREATE TABLE IF NOT EXISTS intervals (
+    snapshot INTEGER NOT NULL REFERENCES snapshots(id) ON DELETE CASCADE,
+    date TEXT NOT NULL,
+    area_id TEXT NOT NULL,
+    room INTEGER NOT NULL REFERENCES rooms(id),
+    start INTEGER NOT NULL,
+    "end" INTEGER NOT NULL,
+    start_time TEXT,
+    end_time TEXT,
+    source TEXT
+);
+CREATE INDEX IF NOT EXISTS intervals_key ON intervals (date, area_id, room, start, "end");
+CREATE INDEX IF NOT EXISTS intervals_snapshot ON intervals (snapshot, area_id);
+"""
+
+def connect(path: Path = DEFAULT_PATH) -> sqlite3.Connection:
+    """打开（必要时创建）历史库。WAL 模式下写入时仍可并发查询。"""
+    conn = sqlite3.connect(str(path))
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA foreign_keys=ON")
+    conn.executescript(SCHEMA)
+    return conn
+
+def _facilities_key(facilities) -> str:
+    return json.dumps(list(facilities), ensure_ascii=False)
+
+# ---------- 写入 ----------
+
+def record_folder(conn: sqlite3.Connection, folder: Path, target_date: date, version: str,
+                  published_at: str) -> Optional[int]:
+    """把一个向量目录（json 或 catalog 格式）作为一个快照写入，返回快照编号；已记录过时返回 None。"""
+    rows = []
+    for fp in ready_snapshot.vector_files(folder):
+        try:
+            with fp.open("r", encoding="utf-8") as f:
+                data = json.load(f)
+        except Exception:
+            continue
+        rows.extend((fields, fp.name) for fields in ready_snapshot.iter_file_fields(folder, data)
+                    if fields[6] < fields[7])
+
+    with conn:
+        cur = conn.execute("INSERT OR IGNORE INTO snapshots (date, version, published_at, recorded_at) "
+                           "VALUES (?, ?, ?, ?)", (target_date.isoformat(), version, published_at,
+                                                   datetime.now().isoformat(timespec="seconds")))
+        if cur.rowcount == 0:
+            return None
+        snapshot = cur.lastrowid
+        rooms = {(f[0], f[1], f[2], _facilities_key(f[3]), f[4], f[5]) for f, _ in rows}
+        conn.executemany("INSERT OR IGNORE INTO rooms (room_id, room_name, capacity, facilities, area_id, area_name) "
+                         "VALUES (?, ?, ?, ?, ?, ?)", rooms)
+        room_ids = {tuple(key): rid for rid, *key in conn.execute(
+            "SELECT id, room_id, room_name, capacity, facilities, area_id, area_name FROM rooms")}
+        day = target_date.isoformat()
+        conn.executemany(
+            'INSERT INTO intervals (snapshot, date, area_id, room, start, "end", start_time, end_time, source) '
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            ((snapshot, day, f[4], room_ids[(f[0], f[1], f[2], _facilities_key(f[3]), f[4], f[5])],
+              f[6], f[7], f[8], f[9], source) for f, source in rows))
+    return snapshot
+
+def record_published(conn: sqlite3.Connection, ready_root: Path) -> Optional[int]:
+    """记录 ready_data_ 日期目录的当前版本（读取期间固定该版本）；已记录过或不是日期目录时返回 None。"""
+    ready_root = Path(ready_root)
+    target_date = dated_dirs.parse_dir_date(ready_root.name, "ready_data_")
+    if target_date is None:
+        return None
+    pointer = versions.read_pointer(ready_root)
+    with versions.pin(ready_root) as folder:
+        return record_folder(conn, folder, target_date, pointer.get("version", folder.name),
+                             pointer.get("published_at", ""))
+
+# ---------- 查询 ----------
+
+def latest_snapshot(conn: sqlite3.Connection, target_date: date) -> Optional[int]:
+    row = conn.execute("SELECT id FROM snapshots WHERE date = ? ORDER BY id DESC LIMIT 1",
+                       (target_date.isoformat(),)).fetchone()
+    return row[0] if row else None
+
+def area_fields(conn: sqlite3.Connection, target_date: date, area_id: str,
+                snapshot: Optional[int] = None) -> List[tuple]:
+    """
+    某天（默认取最新快照）一个区域的全部区间，每条为 sub.Chunk 的字段顺序
+    (room_id, room_name, capacity, facilities, area_id, area_name, start, end, start_time, end_time, source)。
+    """
+    snapshot = snapshot or latest_snapshot(conn, target_date)
+    if snapshot is None:
+        return []
+    cur = conn.execute(
+        'SELECT r.room_id, r.room_name, r.capacity, r.facilities, r.area_id, r.area_name, i.start, i."end", '
+        "i.start_time, i.end_time, i.source FROM intervals i JOIN rooms r ON r.id = i.room "
+        "WHERE i.snapshot = ? AND i.area_id = ? ORDER BY i.rowid", (snapshot, str(area_id)))
+    return [row[:3] + (tuple(json.loads(row[3])),) + row[4:] for row in cur]
+
+def intervals_between(conn: sqlite3.Connection, date_from: date, date_to: date,
+                      area_id: Optional[str] = None) -> List[tuple]:
+    """日期范围内（含两端）每天最新快照的区间：(date, area_id, room_id, room_name, start, end)。"""
+    sql = ('SELECT i.date, i.area_id, r.room_id, r.room_name, i.start, i."end" FROM intervals i '
+           "JOIN rooms r ON r.id = i.room "
+           "WHERE i.date BETWEEN ? AND ? AND i.snapshot = (SELECT MAX(id) FROM snapshots s WHERE s.date = i.date)")
+    args: list = [date_from.isoformat(), date_to.isoformat()]
+    if area_id is not None:
+        sql += " AND i.area_id = ?"
+        args.append(str(area_id))
+    return conn.execute(sql + ' ORDER BY i.date, i.area_id, r.room_id, i.start', args).fetchall()
+
+def free_slots_by_day(conn: sqlite3.Connection, area_id: str, date_from: date,
+                      date_to: date) -> List[Tuple[str, int, int]]:
+    """该区域每天（最新快照）有空闲的房间数和空闲时段总数：[(date, 房间数, 时段数)]。"""
+    return conn.execute(
+        'SELECT i.date, COUNT(DISTINCT i.room), SUM(i."end" - i.start) FROM intervals i '
+        "WHERE i.area_id = ? AND i.date BETWEEN ? AND ? "
+        "AND i.snapshot = (SELECT MAX(id) FROM snapshots s WHERE s.date = i.date) "
+        "GROUP BY i.date ORDER BY i.date", (str(area_id), date_from.isoformat(), date_to.isoformat())).fetchall()
+
+def main():
+    ap = argparse.ArgumentParser(description="查看空闲区间历史库")
+    ap.add_argument("--db", type=Path, default=DEFAULT_PATH, help=f"历史库路径（默认 {DEFAULT_PATH.name}）")
+    ap.add_argument("--area", default=None, help="只看该区域每天的空闲情况")
+    ap.add_argument("--from", dest="date_from", type=date.fromisoformat, default=None, help="起始日期 YYYY-MM-DD")
+    ap.add_argument("--to", dest="date_to", type=date.fromisoformat, default=None, help="结束日期 YYYY-MM-DD")
+    args = ap.parse_args()
+    if not args.db.exists():
+        print(f"历史库不存在：{args.db}（运行 4-raw2vector.py --store 生成）")
+        exit(1)
+
+    conn = connect(args.db)
+    date_from, date_to = args.date_from or date.min, args.date_to or date.max
+    if args.area:
+        rows = free_slots_by_day(conn, args.area, date_from, date_to)
+        print(f"区域 {args.area}：{'日期':<12} {'有空房间':>8} {'空闲时段':>8}")
+        for day, n_rooms, n_slots in rows:
+            print(f"  {day:<12} {n_rooms:>8} {n_slots:>8}")
+        return
+    rows = conn.execute("SELECT s.date, COUNT(DISTINCT s.id), COUNT(i.rowid) FROM snapshots s "
+                        "LEFT JOIN intervals i ON i.snapshot = s.id WHERE s.date BETWEEN ? AND ? "
+                        "GROUP BY s.date ORDER BY s.date", (date_from.isoformat(), date_to.isoformat())).fetchall()
+    n_rooms = conn.execute("SELECT COUNT(*) FROM rooms").fetchone()[0]
+    print(f"{args.db.name}：{len(rows)} 天，{n_rooms} 个房间记录")
+    for day, n_snap, n_int in rows:
+        print(f"  {day}  {n_snap} 个快照，{n_int} 个区间")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+MRBS 会话保活服务。
+
+每隔 --interval 分钟用 .env 中的 Cookie 请求一次今天的日视图，让会话不因闲置而失效，
+并把结果写入 session_state.json（2-getdata.py 抓取前会读取）。
+根据以往 Cookie 的实际存活时间估算剩余寿命，接近过期时提前发出警告；
+每轮都会重新读取 .env，重新运行 1-auth.py 得到的新 Cookie 会被自动接管。
+
+  python keepalive.py                      前台常驻，默认每 20 分钟一次
+  python keepalive.py --once               只检查一次（适合放进 cron / 计划任务）
+  python keepalive.py --warn-cmd "notify-send MRBS 会话即将过期"
+
+--warn-cmd 在即将过期或已经过期时执行（每个 Cookie 每种状态只执行一次），
+环境变量 MRBS_SESSION_STATUS 为 expiring / expired，MRBS_SESSION_SUMMARY 为状态描述。
+"""
+
+from __future__ import annotations
+import argparse
+import os
+import subprocess
+import time
+from datetime import datetime
+
+from dotenv import load_dotenv
+
+import session
+from fetcher import BASE_URL
+
+DEFAULT_INTERVAL_MINUTES = 20
+
+def notify(cmd: str, status: str, summary: str) -> None:
+    if not cmd:
+        return
+    env = dict(os.environ, MRBS_SESSION_STATUS=status, MRBS_SESSION_SUMMARY=summary)
+    try:
+        subprocess.run(cmd, shell=True, env=env, timeout=60)
+    except (OSError, subprocess.SubprocessError) as e:
+        print(f"  执行 --warn-cmd 失败：{e}")
+
+def check_once(base_url: str, warn_minutes: float, warn_cmd: str, warned: set) -> session.SessionHealth:
+    load_dotenv(override=True)
+    cookie = os.getenv("MRBS_COOKIE")
+    probe = session.probe_session(cookie, base_url)
+    health = session.record_probe(cookie, probe)
+    stamp = datetime.now().strftime("%H:%M:%S")
+    print(f"[{stamp}] {probe.reason}（{probe.elapsed*1000:.0f} ms）| {health.summary()}")
+
+    if health.status == "expired":
+        status = "expired"
+        print("  !!! 会话已过期，请重新运行 1-auth.py 登录。")
+    elif health.expiring_soon(warn_minutes):
+        status = "expiring"
+        print(f"  !!! 会话预计将在 {warn_minutes:g} 分钟内过期，建议尽快重新运行 1-auth.py。")
+    else:
+        return health
+    key = (health.fingerprint, status)
+    if key not in warned:
+        warned.add(key)
+        notify(warn_cmd, status, health.summary())
+    return health
+
+def main():
+    load_dotenv()
+    ap = argparse.ArgumentParser(description="定期请求 MRBS 以保持会话，并在 Cookie 即将过期时提前警告")
+    ap.add_argument("--interval", type=float, default=DEFAULT_INTERVAL_MINUTES,
+                    help=f"两次请求之间的分钟数（默认 {DEFAULT_INTERVAL_MINUTES}）")
+    ap.add_argument("--warn-minutes", type=float, default=session.DEFAULT_WARN_MINUTES,
+                    help=f"预计剩余寿命少于多少分钟时警告（默认 {session.DEFAULT_WARN_MINUTES}）")
+    ap.add_argument("--warn-cmd", default="", help="需要警告时执行的命令")
+    ap.add_argument("--once", action="store_true", help="只检查一次后退出；会话无效时退出码为 1")
+    ap.add_argument("--base-url", default=os.getenv("MRBS_BASE_URL", BASE_URL))
+    args = ap.parse_args()
+
+    warned: set = set()
+    if args.once:
+        health = check_once(args.base_url, args.warn_minutes, args.warn_cmd, warned)
+        exit(0 if health.status == "alive" else 1)
+
+    print(f"--- MRBS 会话保活：每 {args.interval:g} 分钟一次，Ctrl+C 退出 ---")
+    try:
+        while True:
+            check_once(args.base_url, args.warn_minutes, args.warn_cmd, warned)
+            time.sleep(max(1.0, args.interval * 60))
+    except KeyboardInterrupt:
+        print("\n已停止。")
+
+if __name__ == "__main__":
+    main()
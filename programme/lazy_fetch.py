@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+按需抓取：一次查询通常只涉及 5-main.py 里一个 AREA_GROUPS 分组（十几个区域），
+不必等全校抓完。
+
+ensure_fresh 只抓取查询涉及、且 ready_data_ 中数据已超过 TTL 的区域，
+抓到后直接解析、压缩成向量（与 2-getdata.py --stream 相同），按给出的顺序优先发出；
+refresh_rest_in_background 再起一个独立的 2-getdata.py --stream --max-age 进程，
+在后台把其余区域中过期的部分补上，不阻塞当前查询。同一时间只有一个后台刷新：
+进程号记在 logs/background_fetch.pid，上一个还在运行时不再启动新的。
+
+TTL 以分钟计，area_ttls 可以为个别区域单独设置（例如变化频繁的区域设得更短）。
+
+  python lazy_fetch.py --areas 1,13,55 --ttl 15
+  python lazy_fetch.py --areas 1,13 --date 2026-10-20 --area-ttl 13=5 --no-background
+"""
+
+from __future__ import annotations
+import argparse
+import asyncio
+import contextlib
+import os
+import subprocess
+import sys
+import time
+from datetime import date
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+from dotenv import load_dotenv
+
+import area_mapping
+import dated_dirs
+import refresh
+import session
+import versions
+from fetch_run import StreamRun, age_minutes
+from fetcher import BASE_URL, DEFAULT_CONCURRENCY, DEFAULT_TIMEOUT, FetchScheduler, SessionExpired
+
+BASE_DIR = Path(__file__).resolve().parent
+DEFAULT_TTL_MINUTES = 15
+BACKGROUND_PID = BASE_DIR / "logs" / "background_fetch.pid"
+PID_MAX_AGE_SECONDS = 6 * 3600     # 更旧的 pid 文件视为残留（进程号可能已被系统复用）
+PID_STARTING_SECONDS = 60          # 刚创建、还没写入进程号的 pid 文件
+
+def stale_areas(area_ids: Iterable[str], target_date: date, ttl: float,
+                area_ttls: Optional[Dict[str, float]] = None) -> List[str]:
+    """ready_data_ 中没有数据、或上次抓取距今超过 TTL 的区域，保持给出的顺序。"""
+    area_ttls = {str(k): v for k, v in (area_ttls or {}).items()}
+    folder = versions.resolve(BASE_DIR / dated_dirs.dir_name("ready_data_", target_date))
+    state = refresh.load_state(str(folder)) if folder.is_dir() else {}
+    out = []
+    for aid in map(str, area_ids):
+        age = age_minutes(state.get(aid))
+        if age is None or age > area_ttls.get(aid, ttl) or not (folder / f"area_{aid}.json").exists():
+            out.append(aid)
+    return out
+
+def ensure_fresh(area_ids: Iterable[str], target_date: date, cookie: str, area_map: dict,
+                 ttl: float = DEFAULT_TTL_MINUTES, area_ttls: Optional[Dict[str, float]] = None,
+                 base_url: str = BASE_URL, concurrency: int = DEFAULT_CONCURRENCY,
+                 timeout: float = DEFAULT_TIMEOUT) -> StreamRun:
+    """前台抓取查询涉及的过期区域，返回 StreamRun（counts/fresh/aborted 可用于汇报）。"""
+    items = [(str(aid), area_map.get(str(aid), "")) for aid in area_ids if str(aid) in area_map]
+    run = StreamRun(cookie, concurrency, timeout, None, FetchScheduler(), base_url=base_url,
+                    max_age=ttl, area_ttls=area_ttls, area_map=area_map)
+    asyncio.run(run.fetch_days(items, [target_date]))
+    run.publish()
+    if isinstance(run.aborted, SessionExpired):
+        session.record(cookie, False, str(run.aborted))
+    elif any(r.ok for r in run.results):
+        session.record(cookie, True)
+    return run
+
+def _pid_alive(pid: int) -> bool:
+    if os.name == "nt":
+        import ctypes
+        kernel32 = ctypes.windll.kernel32
+        handle = kernel32.OpenProcess(0x00100000, False, pid)      # SYNCHRONIZE
+        if not handle:
+            return False
+        try:
+            return kernel32.WaitForSingleObject(handle, 0) == 0x102    # WAIT_TIMEOUT：仍在运行
+        finally:
+            kernel32.CloseHandle(handle)
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+def background_pid() -> Optional[int]:
+    """仍在运行的后台刷新的进程号（刚启动、尚未写入进程号时为 0）；没有时返回 None。"""
+    try:
+        age = time.time() - BACKGROUND_PID.stat().st_mtime
+        text = BACKGROUND_PID.read_text(encoding="utf-8").strip()
+    except OSError:
+        return None
+    if not text:
+        return 0 if age < PID_STARTING_SECONDS else None
+    try:
+        pid = int(text)
+    except ValueError:
+        return None
+    return pid if age < PID_MAX_AGE_SECONDS and _pid_alive(pid) else None
+
+def _claim_pidfile() -> Optional[int]:
+    """独占创建 pid 文件并返回其描述符；已有后台刷新在运行时返回 None。"""
+    BACKGROUND_PID.parent.mkdir(exist_ok=True)
+    for _ in range(2):
+        try:
+            return os.open(BACKGROUND_PID, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            if background_pid() is not None:
+                return None
+            with contextlib.suppress(OSError):
+                BACKGROUND_PID.unlink()      # 上一个后台刷新已结束或异常退出
+    return None
+
+def refresh_rest_in_background(area_ids: Iterable[str], target_date: date, ttl: float,
+                               log_path: Optional[Path] = None) -> Optional[subprocess.Popen]:
+    """
+    起一个独立的 2-getdata.py 进程刷新其余区域中已过期的部分；调用方退出后它继续运行。
+    输出写到 log_path（默认 logs/background_fetch.log）。没有需要刷新的区域、或上一个后台刷新
+    仍在运行（见 background_pid）时返回 None。
+    """
+    ids = [str(a) for a in area_ids]
+    if not ids:
+        return None
+    fd = _claim_pidfile()
+    if fd is None:
+        return None
+    log_path = log_path or BASE_DIR / "logs" / "background_fetch.log"
+    log_path.parent.mkdir(exist_ok=True)
+    cmd = [sys.executable, str(BASE_DIR / "2-getdata.py"), "--stream",
+           "--start-date", target_date.isoformat(), "--max-age", f"{ttl:g}", "--areas", ",".join(ids)]
+    detach = {"start_new_session": True} if os.name == "posix" else {
+        "creationflags": getattr(subprocess, "CREATE_NEW_PROCESS_GROUP", 0)}
+    try:
+        with log_path.open("a", encoding="utf-8") as log_f:
+            proc = subprocess.Popen(cmd, cwd=str(BASE_DIR), stdin=subprocess.DEVNULL, stdout=log_f,
+                                    stderr=subprocess.STDOUT, **detach)
+    except OSError:
+        os.close(fd)
+        BACKGROUND_PID.unlink()
+        raise
+    os.write(fd, str(proc.pid).encode())
+    os.close(fd)
+    return proc
+
+def parse_area_ttls(text: str) -> Dict[str, float]:
+    out = {}
+    for part in text.replace(",", " ").split():
+        aid, _, minutes = part.partition("=")
+        out[aid.strip()] = float(minutes)
+    return out
+
+def main():
+    load_dotenv()
+    ap = argparse.ArgumentParser(description="按需抓取查询涉及的区域，其余区域在后台刷新")
+    ap.add_argument("--areas", required=True, help="查询涉及的区域，逗号分隔，按优先级排列")
+    ap.add_argument("--date", type=date.fromisoformat, default=None, help="日期 YYYY-MM-DD（默认今天）")
+    ap.add_argument("--ttl", type=float, default=DEFAULT_TTL_MINUTES,
+                    help=f"数据有效期（分钟，默认 {DEFAULT_TTL_MINUTES}）")
+    ap.add_argument("--area-ttl", type=parse_area_ttls, default={},
+                    help="个别区域的有效期，如 13=5,24=60")
+    ap.add_argument("--no-background", action="store_true", help="不在后台刷新其余区域")
+    ap.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY)
+    ap.add_argument("--base-url", default=os.getenv("MRBS_BASE_URL", BASE_URL))
+    args = ap.parse_args()
+
+    cookie = os.getenv("MRBS_COOKIE")
+    if not cookie:
+        print("错误：未找到Cookie，请先运行 1-auth.py。")
+        exit(1)
+    proceed, message = session.fetch_gate(cookie)
+    if message:
+        print(message)
+    if not proceed:
+        exit(1)
+    area_map = area_mapping.load_mapping()
+    if not area_map:
+        print("错误：找不到 area_mapping.json，请先运行 1-auth.py 或 area_mapping.py。")
+        exit(1)
+
+    target = args.date or date.today()
+    wanted = [x for x in args.areas.replace(",", " ").split() if x]
+    run = ensure_fresh(wanted, target, cookie, area_map, args.ttl, args.area_ttl,
+                       base_url=args.base_url, concurrency=args.concurrency)
+    print(f"前台：{run.counts['changed'] + run.counts['unchanged']} 个区域已刷新，"
+          f"{run.fresh} 个仍在有效期内，{run.counts['failed']} 个失败")
+    if run.aborted:
+        print(f"抓取已中止：{run.aborted}")
+        exit(1)
+    if not args.no_background:
+        running = background_pid()
+        if running is not None:
+            print(f"上一个后台刷新仍在运行（pid {running}），不再启动新的。")
+            return
+        rest = [aid for aid in area_map if aid not in set(wanted)]
+        proc = refresh_rest_in_background(rest, target, args.ttl)
+        if proc is not None:
+            print(f"后台刷新其余 {len(rest)} 个区域（pid {proc.pid}），日志: logs/background_fetch.log")
+
+if __name__ == "__main__":
+    main()
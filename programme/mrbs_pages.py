@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+MRBS 页面解析。
+
+parse_html_to_schedule 解析日视图（view=day&view_all=1）的 table#day_main：
+房间按列排列，时段按行排列，预订用 rowspan 纵向跨越多个时段。
+
+parse_week_html_to_schedules 解析周视图（view=week&view_all=1）。
+周视图把所有房间按行排列，日期 × 时段按列排列：
+  thead 第一行：左上角单元格，之后每天一个 <th colspan=每日时段数>，
+                日期来自 data-date 属性或链接里的 page_date / year&month&day 参数；
+  thead 第二行：各天依次重复的时段表头（如 08:00）；
+  tbody 每行：  <th data-room=...> 房间表头（与日视图相同），之后是 new/booked 单元格，
+                预订可以用 colspan 横跨多个时段。
+解析结果按日期拆分，每天的结构与 parse_html_to_schedule 的输出完全一致。
+
+日视图另有不建 BeautifulSoup 树的快速实现 mrbs_scan.parse_day_main，输出相同；
+DAY_PARSERS 按名称（"fast" / "bs4"）选择，parse_html_to_schedule 保留作为参照实现。
+day_slots_parser 返回产出紧凑 slots.AreaSlots 的同名解析器（fast 直接填编码数组）。
+"""
+
+from __future__ import annotations
+import re
+from datetime import date
+from typing import Dict, List, Optional
+
+from bs4 import BeautifulSoup
+
+import mrbs_scan
+import slots
+
+WEEK_TABLE_IDS = ("week_main", "day_main")
+
+def parse_html_to_schedule(html_content: str, area_id: str, area_map: dict) -> list | None:
+    # ... (这个核心解析函数保持不变)
+    soup = BeautifulSoup(html_content, 'html.parser')
+    schedule_table = soup.find('table', id='day_main')
+    if not schedule_table: return None
+    header_row = schedule_table.find('thead').find('tr')
+    rooms_metadata = []
+    for th in header_row.find_all('th')[1:]:
+        room_data = {}
+        link = th.find('a')
+        if not link: continue
+        room_data['room_id'] = th.get('data-room')
+        room_name_full = link.get_text(strip=True)
+        capacity_span = link.find('span', class_='capacity')
+        if capacity_span:
+            capacity_text = capacity_span.text
+            room_data['room_name'] = mrbs_scan.strip_capacity(room_name_full, capacity_text)
+            room_data['capacity'] = int(capacity_text)
+        else:
+            room_data['room_name'] = room_name_full
+            room_data['capacity'] = None
+        room_data['facilities'] = link.get('title', '').replace('View Week', '').strip()
+        room_data['area_id'] = area_id
+        room_data['area_name'] = area_map.get(area_id, "未知区域")
+        room_data['schedule'] = {}
+        rooms_metadata.append(room_data)
+    body_rows = schedule_table.find('tbody').find_all('tr')
+    rowspan_counters = [0] * len(rooms_metadata)
+    rowspan_booking_names = [None] * len(rooms_metadata) 
+    for row in body_rows:
+        time_slot = row.find('th').get_text(strip=True)
+        all_cells = row.find_all('td')
+        cell_cursor = 0
+        for room_index in range(len(rooms_metadata)):
+            if rowspan_counters[room_index] > 0:
+                booking_name = rowspan_booking_names[room_index]
+                rooms_metadata[room_index]['schedule'][time_slot] = booking_name
+                rowspan_counters[room_index] -= 1
+                continue
+            if cell_cursor >= len(all_cells): break
+            cell = all_cells[cell_cursor]
+            if 'new' in cell.get('class', []):
+                rooms_metadata[room_index]['schedule'][time_slot] = "Available"
+            elif 'booked' in cell.get('class', []):
+                booking_link = cell.find('a')
+                booking_name = booking_link.get_text(strip=True) if booking_link and booking_link.get_text(strip=True) else "Booked"
+                rooms_metadata[room_index]['schedule'][time_slot] = booking_name
+                if cell.has_attr('rowspan'):
+                    rowspan_value = int(cell['rowspan'])
+                    if rowspan_value > 1:
+                        rowspan_counters[room_index] = rowspan_value - 1
+                        rowspan_booking_names[room_index] = booking_name
+            cell_cursor += 1
+    return rooms_metadata
+
+DAY_PARSERS = {
+    "fast": mrbs_scan.parse_day_main,
+    "bs4": parse_html_to_schedule,
+}
+DEFAULT_DAY_PARSER = "fast"
+# 解析结果的规则版本，写进 3 阶段的构建清单；解析输出会因此变化时加一，已有 data_ 会全部重建
+PARSER_VERSION = 3
+
+def day_parser(name: str = DEFAULT_DAY_PARSER):
+    """按名称取日视图解析函数，签名与 parse_html_to_schedule 相同。"""
+    return DAY_PARSERS[name]
+
+def _bs4_day_slots(html_content: str, area_id: str, area_map: dict) -> "slots.AreaSlots | None":
+    rooms = parse_html_to_schedule(html_content, area_id, area_map)
+    return slots.from_rooms(rooms, area_id, area_map.get(area_id, "未知区域")) if rooms else None
+
+DAY_SLOT_PARSERS = {
+    "fast": mrbs_scan.parse_day_slots,
+    "bs4": _bs4_day_slots,
+}
+
+def day_slots_parser(name: str = DEFAULT_DAY_PARSER):
+    return DAY_SLOT_PARSERS[name]
+
+def _find_week_table(soup):
+    for tid in WEEK_TABLE_IDS:
+        table = soup.find('table', id=tid)
+        if table and table.find('thead') and len(table.find('thead').find_all('tr')) >= 2:
+            return table
+    return None
+
+def _header_date(th) -> Optional[date]:
+    raw = th.get('data-date')
+    if raw:
+        try:
+            return date.fromisoformat(raw[:10])
+        except ValueError:
+            pass
+    link = th.find('a')
+    href = link.get('href', '') if link else ''
+    m = re.search(r'page_date=(\d{4}-\d{2}-\d{2})', href)
+    if m:
+        return date.fromisoformat(m.group(1))
+    y = re.search(r'year=(\d{4})', href)
+    mo = re.search(r'month=(\d{1,2})', href)
+    d = re.search(r'day=(\d{1,2})', href)
+    if y and mo and d:
+        try:
+            return date(int(y.group(1)), int(mo.group(1)), int(d.group(1)))
+        except ValueError:
+            return None
+    return None
+
+def _span(cell, attr: str) -> int:
+    try:
+        return max(1, int(cell.get(attr, 1)))
+    except (TypeError, ValueError):
+        return 1
+
+def _room_header(th, area_id: str, area_map: dict) -> Optional[dict]:
+    # 与 parse_html_to_schedule 中房间表头的处理保持一致
+    link = th.find('a')
+    if not link:
+        return None
+    room_data = {}
+    room_data['room_id'] = th.get('data-room')
+    room_name_full = link.get_text(strip=True)
+    capacity_span = link.find('span', class_='capacity')
+    if capacity_span:
+        capacity_text = capacity_span.text
+        room_data['room_name'] = mrbs_scan.strip_capacity(room_name_full, capacity_text)
+        room_data['capacity'] = int(capacity_text)
+    else:
+        room_data['room_name'] = room_name_full
+        room_data['capacity'] = None
+    room_data['facilities'] = link.get('title', '').replace('View Week', '').strip()
+    room_data['area_id'] = area_id
+    room_data['area_name'] = area_map.get(area_id, "未知区域")
+    room_data['schedule'] = {}
+    return room_data
+
+def week_columns(table) -> List[tuple]:
+    """返回每一列对应的 (date, 时段) 列表；无法识别日期时返回空列表。"""
+    day_row, slot_row = table.find('thead').find_all('tr')[:2]
+    day_cells = day_row.find_all('th')
+    days = []
+    for th in day_cells:
+        d = _header_date(th)
+        if d is not None:
+            days.append((d, _span(th, 'colspan')))
+    slots = [th.get_text(strip=True) for th in slot_row.find_all('th')]
+    # 第二行可能带有与第一行左上角重复的空表头
+    total = sum(n for _, n in days)
+    if len(slots) > total:
+        slots = slots[len(slots) - total:]
+    if not days or len(slots) != total:
+        return []
+    columns = []
+    i = 0
+    for d, n in days:
+        for _ in range(n):
+            columns.append((d, slots[i]))
+            i += 1
+    return columns
+
+def week_dates(html_content: str) -> List[date]:
+    """周视图覆盖的日期（升序）；不是可识别的周视图时返回空列表。"""
+    table = _find_week_table(BeautifulSoup(html_content, 'html.parser'))
+    if not table:
+        return []
+    return sorted({d for d, _ in week_columns(table)})
+
+def parse_week_html_to_schedules(html_content: str, area_id: str, area_map: dict) -> Dict[date, list] | None:
+    soup = BeautifulSoup(html_content, 'html.parser')
+    table = _find_week_table(soup)
+    if not table:
+        return None
+    columns = week_columns(table)
+    if not columns:
+        return None
+    dates = sorted({d for d, _ in columns})
+    per_day: Dict[date, list] = {d: [] for d in dates}
+
+    for row in table.find('tbody').find_all('tr'):
+        th = row.find('th')
+        if not th:
+            continue
+        header = _room_header(th, area_id, area_map)
+        if header is None:
+            continue
+        rooms = {}
+        for d in dates:
+            room = dict(header)
+            room['schedule'] = {}
+            rooms[d] = room
+            per_day[d].append(room)
+
+        col = 0
+        for cell in row.find_all('td'):
+            if col >= len(columns):
+                break
+            classes = cell.get('class', [])
+            span = _span(cell, 'colspan')
+            if 'new' in classes:
+                value = "Available"
+            elif 'booked' in classes:
+                booking_link = cell.find('a')
+                value = booking_link.get_text(strip=True) if booking_link and booking_link.get_text(strip=True) else "Booked"
+            else:
+                value = None
+            for d, slot in columns[col:col + span]:
+                if value is not None:
+                    rooms[d]['schedule'][slot] = value
+            col += span
+    return per_day
+
+def page_filename(area_id: str, view: str = "day") -> str:
+    return f"area_{area_id}.week.html" if view == "week" else f"area_{area_id}.html"
+
+def page_state_key(area_id: str, view: str = "day") -> str:
+    """pages_ 目录 _refresh.json 中的键：日视图用 area_id，周视图加 week: 前缀。"""
+    return f"week:{area_id}" if view == "week" else str(area_id)
@@ -0,0 +1,298 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+日视图 table#day_main 的快速解析。
+
+mrbs_pages.parse_html_to_schedule 用 html.parser 为整页建一棵 BeautifulSoup 树，
+而真正需要的只是 day_main 一张表。这里先用正则定位 <table id="day_main">，
+再在这段文本上逐个标签扫描，只记录房间表头、时段表头和单元格，不建树。
+
+输出与 parse_html_to_schedule 逐字节一致（同样的键顺序、rowspan 续接、
+new/booked 单元格判断、get_text(strip=True) 的文本拼接规则）：
+  - 标签名、属性名小写，属性值和文本做 HTML 实体反转义；
+  - 结束标签弹出到最近的同名开放标签，没有对应开放标签的结束标签忽略（与 BeautifulSoup 相同）；
+  - void 元素（br、img、input 等）不入栈；注释、<script>/<style> 内容不算文本。
+只依赖标准库。用 bench_parse.py 比较两者的速度并核对结果。
+
+parse_day_slots 在同一次扫描上直接填 slots.AreaSlots 的编码数组，不构造逐房间的字典。
+"""
+
+from __future__ import annotations
+import html as html_lib
+import re
+from typing import List, Optional
+
+from slots import AreaSlots, SlotBuilder
+
+TOKEN_RE = re.compile(
+    r'<!--.*?-->'                                                    # 注释
+    r'|<(script|style)\b(?:[^>"\']|"[^"]*"|\'[^\']*\')*>.*?</\1\s*>'  # 原样内容
+    r'|<[!?][^>]*>'                                                   # doctype / 处理指令
+    r'|<(/?)([a-zA-Z][^\s/>]*)((?:[^>"\']|"[^"]*"|\'[^\']*\')*)>'     # 标签
+    r'|([^<]+|<)',                                                    # 文本
+    re.S | re.I)
+ATTR_RE = re.compile(r'([^\s=/>]+)(?:\s*=\s*(?:"([^"]*)"|\'([^\']*)\'|([^\s>]+)))?')
+TABLE_START_RE = re.compile(r'<table\b((?:[^>"\']|"[^"]*"|\'[^\']*\')*)>', re.I)
+
+VOID_TAGS = frozenset("area base br col embed hr img input keygen link meta param source track wbr "
+                      "basefont bgsound command frame image isindex menuitem nextid spacer".split())
+
+def _attrs(raw: str) -> dict:
+    out = {}
+    for name, dq, sq, bare in ATTR_RE.findall(raw):
+        if name == "/":
+            continue
+        value = dq or sq or bare
+        out[name.lower()] = html_lib.unescape(value) if "&" in value else value
+    return out
+
+def strip_capacity(room_name_full: str, capacity_text: str) -> str:
+    """
+    从表头链接文本中去掉结尾的容量数字。只去掉结尾那一处：名称本身含有相同数字时
+    （如 A1-004、容量 4）不能整体 replace。容量不在结尾时退回旧的 replace 行为。
+    """
+    cap = capacity_text.strip()
+    if cap and room_name_full.endswith(cap):
+        return room_name_full[:-len(cap)].strip()
+    return room_name_full.replace(capacity_text, '').strip()
+
+def _classes(attrs: dict) -> List[str]:
+    return attrs.get("class", "").split()
+
+def find_day_main(html_content: str) -> Optional[int]:
+    """<table id="day_main"> 起始标签的位置；没有时返回 None。"""
+    for m in TABLE_START_RE.finditer(html_content):
+        if 'day_main' in m.group(1) and _attrs(m.group(1)).get("id") == "day_main":
+            return m.start()
+    return None
+
+class _Scan:
+    """扫描 day_main 表时收集到的原始结构，组装逻辑见 parse_day_main。"""
+
+    def __init__(self):
+        self.header_ths: List[dict] = []     # {"attrs", "link": None | {"attrs", "text", "cap"}}
+        self.rows: List[dict] = []           # {"slot": None | [文本], "cells": [{"classes", "rowspan", "link"}]}
+
+def _scan_table(html_content: str, start: int) -> _Scan:
+    scan = _Scan()
+    stack: List[list] = []                   # [标签名, 角色]
+    seen_thead = seen_tbody = seen_head_tr = False
+    in_thead = in_head_tr = in_tbody = 0
+    cur_th = cur_link = cur_cap = None
+    cur_row = cur_slot = cur_cell = cur_cell_link = None
+
+    for m in TOKEN_RE.finditer(html_content, start):
+        text = m.group(5)
+        if text is not None:
+            if "&" in text:
+                text = html_lib.unescape(text)
+            if cur_cap is not None:
+                cur_cap.append(text)
+            stripped = text.strip()
+            if stripped:
+                if cur_link is not None:
+                    cur_link["text"].append(stripped)
+                if cur_slot is not None:
+                    cur_slot.append(stripped)
+                if cur_cell_link is not None:
+                    cur_cell_link.append(stripped)
+            continue
+        name = m.group(3)
+        if name is None:
+            continue                         # 注释、script/style、doctype
+        name = name.lower()
+
+        if m.group(2):                       # 结束标签：弹出到最近的同名标签
+            for i in range(len(stack) - 1, -1, -1):
+                if stack[i][0] == name:
+                    break
+            else:
+                continue
+            while len(stack) > i:
+                _, role = stack.pop()
+                if role == "table":
+                    return scan
+                if role == "thead":
+                    in_thead -= 1
+                elif role == "head_tr":
+                    in_head_tr -= 1
+                elif role == "room_th":
+                    cur_th = None
+                elif role == "room_a":
+                    cur_link = None
+                elif role == "cap":
+                    cur_cap = None
+                elif role == "tbody":
+                    in_tbody -= 1
+                elif role == "body_tr":
+                    cur_row = None
+                elif role == "slot_th":
+                    cur_slot = None
+                elif role == "cell":
+                    cur_cell = None
+                elif role == "cell_a":
+                    cur_cell_link = None
+            continue
+
+        raw_attrs = m.group(4)
+        role = None
+        if not stack:
+            role = "table"
+        elif name == "thead" and not seen_thead:
+            seen_thead = True
+            in_thead += 1
+            role = "thead"
+        elif name == "tbody" and not seen_tbody:
+            seen_tbody = True
+            in_tbody += 1
+            role = "tbody"
+        elif name == "tr":
+            if in_thead and not seen_head_tr:
+                seen_head_tr = True
+                in_head_tr += 1
+                role = "head_tr"
+            elif in_tbody:
+                cur_row = {"slot": None, "cells": []}
+                scan.rows.append(cur_row)
+                cur_slot = cur_cell = cur_cell_link = None
+                role = "body_tr"
+        elif name == "th":
+            if in_head_tr:
+                cur_th = {"attrs": _attrs(raw_attrs), "link": None}
+                scan.header_ths.append(cur_th)
+                role = "room_th"
+            elif cur_row is not None and cur_row["slot"] is None:
+                cur_slot = cur_row["slot"] = []
+                role = "slot_th"
+        elif name == "td":
+            if cur_row is not None:
+                attrs = _attrs(raw_attrs)
+                cur_cell = {"classes": _classes(attrs), "rowspan": attrs.get("rowspan"), "link": None}
+                cur_row["cells"].append(cur_cell)
+                role = "cell"
+        elif name == "a":
+            if cur_th is not None and cur_th["link"] is None:
+                cur_link = cur_th["link"] = {"attrs": _attrs(raw_attrs), "text": [], "cap": None}
+                role = "room_a"
+            if cur_cell is not None and cur_cell["link"] is None:
+                cur_cell_link = cur_cell["link"] = []
+                role = "cell_a"
+        elif name == "span":
+            if cur_link is not None and cur_link["cap"] is None and "capacity" in _classes(_attrs(raw_attrs)):
+                cur_cap = cur_link["cap"] = []
+                role = "cap"
+
+        if name in VOID_TAGS or raw_attrs.rstrip().endswith("/"):
+            # 立即闭合的元素：角色只在开始时生效，随即撤销
+            if role == "room_th":
+                cur_th = None
+            elif role == "room_a":
+                cur_link = None
+            elif role == "cap":
+                cur_cap = None
+            elif role == "slot_th":
+                cur_slot = None
+            elif role == "cell":
+                cur_cell = None
+            elif role == "cell_a":
+                cur_cell_link = None
+            elif role == "body_tr":
+                cur_row = None
+            elif role == "thead":
+                in_thead -= 1
+            elif role == "tbody":
+                in_tbody -= 1
+            elif role == "head_tr":
+                in_head_tr -= 1
+            continue
+        stack.append([name, role])
+    return scan
+
+def _room_metas(scan: _Scan, area_id: str, area_map: dict) -> List[dict]:
+    rooms_metadata = []
+    for th in scan.header_ths[1:]:
+        link = th["link"]
+        if link is None:
+            continue
+        room_data = {}
+        room_data['room_id'] = th["attrs"].get('data-room')
+        room_name_full = "".join(link["text"])
+        if link["cap"] is not None:
+            capacity_text = "".join(link["cap"])
+            room_data['room_name'] = strip_capacity(room_name_full, capacity_text)
+            room_data['capacity'] = int(capacity_text)
+        else:
+            room_data['room_name'] = room_name_full
+            room_data['capacity'] = None
+        room_data['facilities'] = link["attrs"].get('title', '').replace('View Week', '').strip()
+        room_data['area_id'] = area_id
+        room_data['area_name'] = area_map.get(area_id, "未知区域")
+        rooms_metadata.append(room_data)
+    return rooms_metadata
+
+def _fill(scan: _Scan, n_rooms: int, put) -> None:
+    """按 parse_html_to_schedule 的规则（含 rowspan 续接）逐格调用 put(房间序号, 时刻, 值)。"""
+    rowspan_counters = [0] * n_rooms
+    rowspan_booking_names = [None] * n_rooms
+    for row in scan.rows:
+        if row["slot"] is None:
+            continue
+        time_slot = "".join(row["slot"])
+        all_cells = row["cells"]
+        cell_cursor = 0
+        for room_index in range(n_rooms):
+            if rowspan_counters[room_index] > 0:
+                put(room_index, time_slot, rowspan_booking_names[room_index])
+                rowspan_counters[room_index] -= 1
+                continue
+            if cell_cursor >= len(all_cells):
+                break
+            cell = all_cells[cell_cursor]
+            if 'new' in cell["classes"]:
+                put(room_index, time_slot, "Available")
+            elif 'booked' in cell["classes"]:
+                booking_name = "".join(cell["link"]) if cell["link"] else "Booked"
+                put(room_index, time_slot, booking_name)
+                if cell["rowspan"] is not None:
+                    rowspan_value = int(cell["rowspan"])
+                    if rowspan_value > 1:
+                        rowspan_counters[room_index] = rowspan_value - 1
+                        rowspan_booking_names[room_index] = booking_name
+            cell_cursor += 1
+
+def parse_day_main(html_content: str, area_id: str, area_map: dict) -> list | None:
+    """与 mrbs_pages.parse_html_to_schedule 输出相同，速度快得多。"""
+    start = find_day_main(html_content)
+    if start is None:
+        return None
+    scan = _scan_table(html_content, start)
+    rooms_metadata = _room_metas(scan, area_id, area_map)
+    for room in rooms_metadata:
+        room['schedule'] = {}
+
+    def put(room_index, time_slot, value):
+        rooms_metadata[room_index]['schedule'][time_slot] = value
+
+    _fill(scan, len(rooms_metadata), put)
+    return rooms_metadata
+
+def parse_day_slots(html_content: str, area_id: str, area_map: dict) -> AreaSlots | None:
+    """直接产出紧凑的 slots.AreaSlots，不经过逐房间的字典；内容与 parse_day_main 等价。"""
+    start = find_day_main(html_content)
+    if start is None:
+        return None
+    scan = _scan_table(html_content, start)
+    metas = _room_metas(scan, area_id, area_map)
+    if not metas:
+        return None
+    builder = SlotBuilder(area_id, area_map.get(area_id, "未知区域"), metas)
+    slot_of = builder.slot
+    code_of = builder.code
+    columns = builder.columns
+
+    def put(room_index, time_slot, value):
+        columns[room_index][slot_of(time_slot)] = code_of(value)
+
+    _fill(scan, len(metas), put)
+    return builder.build()
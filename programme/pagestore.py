@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+内容寻址的页面归档。
+
+  page_archive/
+    blobs/ab/abcdef....zst      按原始页面 sha256 命名的压缩内容（无 zstandard 时为 .gz）
+    snapshots/<快照id>.json     每次抓取一个清单：(日期, 区域, 视图) -> blob
+
+相同的页面在所有快照之间只存一份；过期快照按保留策略删除后，
+没有任何快照引用的 blob 会被垃圾回收。
+
+命令行：
+  python pagestore.py ls                       列出快照
+  python pagestore.py show <快照id>             列出快照中的页面
+  python pagestore.py export <快照id> <目录>    还原快照中的页面为 <目录>/pages_dd-mm-yyyy/area_{id}.html，
+                                              可直接交给 3-html2rawdata.py --input-dir
+  python pagestore.py gc --keep-days 90 --keep-last 10
+"""
+
+from __future__ import annotations
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import time
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set
+
+import dated_dirs
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+DEFAULT_ROOT = Path(__file__).resolve().parent / "page_archive"
+DEFAULT_KEEP_DAYS = 90
+DEFAULT_KEEP_LAST = 10
+GC_GRACE_SECONDS = 3600    # 刚写入、可能尚未被清单引用的 blob 不回收
+
+def _compress(data: bytes) -> tuple[bytes, str]:
+    if zstandard is not None:
+        return zstandard.ZstdCompressor(level=10).compress(data), ".zst"
+    return gzip.compress(data, compresslevel=9), ".gz"
+
+def _decompress(data: bytes, suffix: str) -> bytes:
+    if suffix == ".zst":
+        if zstandard is None:
+            raise RuntimeError("该 blob 使用 zstd 压缩，需要安装 zstandard")
+        return zstandard.ZstdDecompressor().decompress(data)
+    return gzip.decompress(data)
+
+def _atomic_write(path: Path, data: bytes) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + f".{os.getpid()}.tmp")
+    with tmp.open("wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+class PageStore:
+    def __init__(self, root: Path = DEFAULT_ROOT):
+        self.root = Path(root)
+        self.blob_dir = self.root / "blobs"
+        self.snapshot_dir = self.root / "snapshots"
+
+    # ---------- blobs ----------
+    def _blob_candidates(self, digest: str) -> List[Path]:
+        base = self.blob_dir / digest[:2] / digest
+        return [base.with_suffix(".zst"), base.with_suffix(".gz")]
+
+    def has(self, digest: str) -> bool:
+        return any(p.exists() for p in self._blob_candidates(digest))
+
+    def put(self, content: str) -> str:
+        """保存页面内容，返回其 sha256；已存在则不重写。"""
+        data = content.encode("utf-8")
+        digest = hashlib.sha256(data).hexdigest()
+        if not self.has(digest):
+            packed, suffix = _compress(data)
+            _atomic_write(self.blob_dir / digest[:2] / (digest + suffix), packed)
+        return digest
+
+    def get(self, digest: str) -> str:
+        for p in self._blob_candidates(digest):
+            if p.exists():
+                return _decompress(p.read_bytes(), p.suffix).decode("utf-8")
+        raise FileNotFoundError(f"blob 不存在: {digest}")
+
+    def iter_blobs(self) -> Iterable[Path]:
+        if self.blob_dir.is_dir():
+            yield from (p for p in self.blob_dir.glob("*/*") if p.suffix in (".zst", ".gz"))
+
+    # ---------- snapshots ----------
+    def write_snapshot(self, pages: List[dict], snapshot_id: Optional[str] = None) -> str:
+        """
+        pages: [{"date": "YYYY-MM-DD", "area_id": "24", "view": "day", "blob": sha256}, ...]
+        """
+        snapshot_id = snapshot_id or datetime.now().strftime("%Y%m%dT%H%M%S")
+        manifest = {"id": snapshot_id, "created": datetime.now().isoformat(timespec="seconds"), "pages": pages}
+        data = json.dumps(manifest, ensure_ascii=False, indent=1).encode("utf-8")
+        _atomic_write(self.snapshot_dir / f"{snapshot_id}.json", data)
+        return snapshot_id
+
+    def list_snapshots(self) -> List[str]:
+        if not self.snapshot_dir.is_dir():
+            return []
+        return sorted(p.stem for p in self.snapshot_dir.glob("*.json"))
+
+    def load_snapshot(self, snapshot_id: str) -> dict:
+        with (self.snapshot_dir / f"{snapshot_id}.json").open("r", encoding="utf-8") as f:
+            return json.load(f)
+
+    # ---------- retention / gc ----------
+    def gc(self, keep_days: int = DEFAULT_KEEP_DAYS, keep_last: int = DEFAULT_KEEP_LAST) -> Dict[str, int]:
+        """
+        删除早于 keep_days 天、且不在最近 keep_last 个之内的快照，
+        再回收不被任何剩余快照引用的 blob。
+        """
+        snapshots = self.list_snapshots()
+        protected = set(snapshots[-keep_last:]) if keep_last > 0 else set()
+        cutoff = datetime.now() - timedelta(days=keep_days)
+        removed_snapshots = 0
+        referenced: Set[str] = set()
+        for sid in snapshots:
+            try:
+                manifest = self.load_snapshot(sid)
+                created = datetime.fromisoformat(manifest.get("created", ""))
+            except (OSError, ValueError):
+                manifest, created = {"pages": []}, None
+            if sid not in protected and created is not None and created < cutoff:
+                (self.snapshot_dir / f"{sid}.json").unlink(missing_ok=True)
+                removed_snapshots += 1
+                continue
+            referenced.update(p.get("blob") for p in manifest.get("pages", []))
+
+        removed_blobs = 0
+        freed = 0
+        now = time.time()
+        for p in list(self.iter_blobs()):
+            if p.stem in referenced:
+                continue
+            st = p.stat()
+            if now - st.st_mtime < GC_GRACE_SECONDS:
+                continue
+            p.unlink(missing_ok=True)
+            removed_blobs += 1
+            freed += st.st_size
+        return {"snapshots_removed": removed_snapshots, "blobs_removed": removed_blobs, "bytes_freed": freed}
+
+    def stats(self) -> Dict[str, int]:
+        blobs = list(self.iter_blobs())
+        return {
+            "snapshots": len(self.list_snapshots()),
+            "blobs": len(blobs),
+            "bytes": sum(p.stat().st_size for p in blobs),
+        }
+
+def main():
+    ap = argparse.ArgumentParser(description="内容寻址的页面归档")
+    ap.add_argument("--root", default=str(DEFAULT_ROOT), help="归档目录")
+    sp = ap.add_subparsers(dest="cmd", required=True)
+    sp.add_parser("ls", help="列出快照")
+    p_show = sp.add_parser("show", help="列出快照中的页面")
+    p_show.add_argument("snapshot")
+    p_exp = sp.add_parser("export", help="把快照中的页面还原到目录")
+    p_exp.add_argument("snapshot")
+    p_exp.add_argument("out_dir")
+    p_gc = sp.add_parser("gc", help="按保留策略清理快照并回收无引用的 blob")
+    p_gc.add_argument("--keep-days", type=int, default=DEFAULT_KEEP_DAYS)
+    p_gc.add_argument("--keep-last", type=int, default=DEFAULT_KEEP_LAST)
+    args = ap.parse_args()
+
+    store = PageStore(Path(args.root))
+    if args.cmd == "ls":
+        for sid in store.list_snapshots():
+            m = store.load_snapshot(sid)
+            print(f"{sid}  {m.get('created', '')}  {len(m.get('pages', []))} 个页面")
+        st = store.stats()
+        print(f"共 {st['snapshots']} 个快照，{st['blobs']} 个 blob，{st['bytes'] / 1024:.1f} KiB")
+    elif args.cmd == "show":
+        for p in store.load_snapshot(args.snapshot).get("pages", []):
+            print(f"{p['date']}  area {p['area_id']:<4} {p.get('view', 'day'):<4} {p['blob']}")
+    elif args.cmd == "export":
+        out = Path(args.out_dir)
+        out.mkdir(parents=True, exist_ok=True)
+        for p in store.load_snapshot(args.snapshot).get("pages", []):
+            # 与 2-getdata.py 的布局相同：按日期分目录，3-html2rawdata.py 可以直接读取
+            folder = out / dated_dirs.dir_name("pages_", date.fromisoformat(p["date"]))
+            folder.mkdir(exist_ok=True)
+            suffix = ".week.html" if p.get("view") == "week" else ".html"
+            (folder / f"area_{p['area_id']}{suffix}").write_text(store.get(p["blob"]), encoding="utf-8")
+        print(f"已导出到 {out}")
+    elif args.cmd == "gc":
+        res = store.gc(keep_days=args.keep_days, keep_last=args.keep_last)
+        print(f"删除快照 {res['snapshots_removed']} 个，回收 blob {res['blobs_removed']} 个，"
+              f"释放 {res['bytes_freed'] / 1024:.1f} KiB")
+
+if __name__ == "__main__":
+    main()
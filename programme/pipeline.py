@@ -0,0 +1,410 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+一条命令从抓取到答案：在同一个进程里依次运行 抓取 → 解析 → 压缩 → 求解，
+阶段之间直接传内存中的数据，不再经由 pages_/data_/ready_data_ 目录和五次解释器启动。
+
+  auth       读取 .env 中的 Cookie 并检查会话记录（浏览器登录仍需先运行 1-auth.py）
+  fetch      只请求查询涉及、且 ready_data_ 中已超过 TTL 的区域的日视图，页面留在内存里
+  parse      页面 -> slots.AreaSlots（mrbs_pages.day_slots_parser）
+  vectorize  整批区域一次找出空闲区间（vectorize_np），直接生成 sub.Chunk
+  solve      对每个区域调用 sub.solve，详细输出写入 logs/pipeline_*.log
+
+缓存：TTL 内的区域、304 和抓取失败的区域从 ready_data_ 读取；新抓到的区域以 catalog 格式
+写进 ready_data_ 的新版本（连同 _refresh.json 和快照）并发布，sub.py / 5-main.py 之后可以直接使用。
+--skip-fetch 只用 ready_data_ 中已有的数据，--no-cache 不读也不写 ready_data_。
+查询参数（区域分组、时段基准、TTL）与 5-main.py 共用 planner.py。
+
+  python pipeline.py --group 1 --start 09:00 --end 13:00
+  python pipeline.py --areas 1,13 --start 14:00 --end 18:30 --date 2026-10-20 --require-facilities "86 inch MAXHUB"
+  python pipeline.py --group 2 --start 09:00 --end 11:00 --skip-fetch
+"""
+
+from __future__ import annotations
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import time
+from dataclasses import asdict, dataclass, field
+from datetime import date, datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from dotenv import load_dotenv
+
+import area_mapping
+import checkpoint
+import dated_dirs
+import planner
+import ready_snapshot
+import refresh
+import room_catalog
+import session
+import sub
+import vectorize_np
+import versions
+from fetch_run import now_stamp
+from fetcher import (BASE_URL, DEFAULT_CONCURRENCY, DEFAULT_TIMEOUT, CircuitOpen, FetchJob, FetchResult,
+                     SessionExpired, fetch_jobs)
+from lazy_fetch import parse_area_ttls, stale_areas
+from mrbs_pages import DEFAULT_DAY_PARSER, DAY_SLOT_PARSERS, PARSER_VERSION, day_slots_parser
+from vectorize import VECTOR_VERSION
+
+BASE_DIR = Path(__file__).resolve().parent
+ENGINES = ["numpy", "python"]
+DEFAULT_ENGINE = "numpy" if vectorize_np.AVAILABLE else "python"
+# 写进 ready_data_ 构建清单的工具版本；解析或压缩规则变化时随之变化
+TOOL = f"pipeline/{PARSER_VERSION}/{VECTOR_VERSION}/{room_catalog.FORMAT}"
+
+@dataclass
+class PipelineConfig:
+    area_ids: List[str]
+    target_date: date
+    start_slot: int
+    end_slot: int
+    required_facilities: List[str] = field(default_factory=list)
+    forbidden_facilities: List[str] = field(default_factory=list)
+    require_area_names: List[str] = field(default_factory=list)
+    forbid_area_names: List[str] = field(default_factory=list)
+    allow_three_changes: bool = False
+    top_k_zero_change: int = 50
+    skip_fetch: bool = False
+    cache: bool = True
+    ttl: float = planner.DEFAULT_TTL_MINUTES
+    area_ttls: Dict[str, float] = field(default_factory=dict)
+    parser: str = DEFAULT_DAY_PARSER
+    engine: str = DEFAULT_ENGINE
+    concurrency: int = DEFAULT_CONCURRENCY
+    timeout: float = DEFAULT_TIMEOUT
+    base_url: str = BASE_URL
+
+class StageReport:
+    """各阶段的耗时和说明，运行中逐阶段打印，结束时汇总成一张表。"""
+
+    def __init__(self):
+        self.rows: List[tuple] = []
+
+    @contextlib.contextmanager
+    def stage(self, name: str):
+        notes: List[str] = []
+        print(f"[{name}] 开始")
+        t0 = time.perf_counter()
+        try:
+            yield notes
+        finally:
+            elapsed = time.perf_counter() - t0
+            note = "；".join(notes)
+            self.rows.append((name, elapsed, note))
+            print(f"[{name}] 完成，{elapsed * 1000:.0f} ms{'  ' + note if note else ''}")
+
+    def skip(self, name: str, reason: str) -> None:
+        self.rows.append((name, None, reason))
+        print(f"[{name}] 跳过：{reason}")
+
+    def print(self) -> None:
+        print("\n===== 各阶段耗时 =====")
+        total = 0.0
+        for name, elapsed, note in self.rows:
+            total += elapsed or 0.0
+            cost = "跳过" if elapsed is None else f"{elapsed * 1000:.0f} ms"
+            print(f"  {name:<10} {cost:>9}  {note}")
+        print(f"  {'合计':<9} {total * 1000:>6.0f} ms")
+
+class Pipeline:
+    """一次查询的全部阶段；各阶段的结果保存在实例上，供下一阶段直接使用。"""
+
+    def __init__(self, cfg: PipelineConfig, report: Optional[StageReport] = None):
+        self.cfg = cfg
+        self.report = report or StageReport()
+        self.ready_dir = BASE_DIR / dated_dirs.dir_name("ready_data_", cfg.target_date)
+        self.state = refresh.load_state(str(versions.resolve(self.ready_dir))) if cfg.cache else {}
+        self.cookie: Optional[str] = None
+        self.area_map: Dict[str, str] = {}
+        self.pages: Dict[str, FetchResult] = {}       # fetch -> parse
+        self.areas: Dict[str, object] = {}            # parse -> vectorize（slots.AreaSlots）
+        self.chunks: Dict[str, List[sub.Chunk]] = {}  # vectorize / 缓存 -> solve；没有新数据的区域读 ready_data_
+        self.summaries: List[dict] = []
+        self.updates: Dict[str, dict] = {}            # 本次要写进 _refresh.json 的记录
+        self.staging: Optional[versions.Staging] = None
+
+    # ---------- auth ----------
+    def auth(self) -> bool:
+        """有可用的 Cookie 和区域映射时返回 True；否则本次查询只用 ready_data_ 中已有的数据。"""
+        with self.report.stage("auth") as notes:
+            load_dotenv()
+            self.cookie = os.getenv("MRBS_COOKIE")
+            self.area_map = area_mapping.load_mapping()
+            if not self.cookie or not self.area_map:
+                notes.append("没有 Cookie 或 area_mapping.json，请先运行 1-auth.py；改用已有数据")
+                return False
+            proceed, message = session.fetch_gate(self.cookie)
+            if message:
+                notes.append(message)
+            if not proceed:
+                return False
+            notes.append("会话可用")
+            return True
+
+    # ---------- fetch ----------
+    def has_cached(self, aid: str) -> bool:
+        return self.cfg.cache and (versions.resolve(self.ready_dir) / f"area_{aid}.json").exists()
+
+    def fetch(self) -> None:
+        cfg = self.cfg
+        with self.report.stage("fetch") as notes:
+            ids = [aid for aid in cfg.area_ids if aid in self.area_map]
+            unknown = [aid for aid in cfg.area_ids if aid not in self.area_map]
+            todo = stale_areas(ids, cfg.target_date, cfg.ttl, cfg.area_ttls) if cfg.cache else ids
+            jobs = [FetchJob(aid, self.area_map[aid], cfg.target_date, "day") for aid in todo]
+            validators = {job: self.state[job.area_id] for job in jobs
+                          if job.area_id in self.state and self.has_cached(job.area_id)}
+
+            results: List[FetchResult] = []
+            aborted = None
+            async def collect():
+                async for result in fetch_jobs(jobs, self.cookie, concurrency=cfg.concurrency, timeout=cfg.timeout,
+                                               base_url=cfg.base_url, validators=validators):
+                    results.append(result)
+            try:
+                if jobs:
+                    asyncio.run(collect())
+            except CircuitOpen as e:
+                aborted = e
+            if isinstance(aborted, SessionExpired):
+                session.record(self.cookie, False, str(aborted))
+            elif any(r.ok for r in results):
+                session.record(self.cookie, True)
+
+            not_modified = failed = 0
+            for r in results:
+                if r.ok and not r.not_modified:
+                    self.pages[r.area_id] = r
+                elif r.not_modified:
+                    not_modified += 1
+                    self.updates[r.area_id] = dict(self.state[r.area_id], etag=r.etag,
+                                                   last_modified=r.last_modified, fetched_at=now_stamp())
+                else:
+                    failed += 1
+                    print(f"  [失败] -> ID: {r.area_id:<4} {'Cookie已过期或无效。' if r.sso_redirect else r.error}")
+
+            notes.append(f"{len(jobs)} 个区域请求，{len(self.pages)} 个新页面，{not_modified} 个 304，"
+                         f"{len(ids) - len(todo)} 个在有效期内，{failed} 个失败")
+            if unknown:
+                notes.append(f"{len(unknown)} 个区域不在 area_mapping.json 中")
+            if aborted:
+                notes.append(f"已中止：{aborted}")
+
+    # ---------- parse ----------
+    def parse(self) -> None:
+        with self.report.stage("parse") as notes:
+            parse_day = day_slots_parser(self.cfg.parser)
+            for aid, result in self.pages.items():
+                area = parse_day(result.text, aid, self.area_map)
+                if area is None:
+                    print(f"  [失败] -> ID: {aid:<4} 解析HTML时出错。")
+                    continue
+                self.areas[aid] = area
+            notes.append(f"{len(self.areas)} 个区域，{sum(len(a.rooms) for a in self.areas.values())} 个房间")
+
+    # ---------- vectorize ----------
+    def vectorize(self) -> None:
+        cfg = self.cfg
+        with self.report.stage("vectorize") as notes:
+            ids = list(self.areas)
+            batch = [self.areas[aid] for aid in ids]
+            if cfg.engine == "numpy" and vectorize_np.AVAILABLE:
+                per_area = vectorize_np.area_intervals(batch)
+            else:
+                per_area = [[a.room_intervals(r) for r in a.rooms] for a in batch]
+
+            for aid, area, room_intervals in zip(ids, batch, per_area):
+                rooms, times, entries = room_catalog.from_area(area, room_intervals)
+                source = f"area_{aid}.json"
+                self.chunks[aid] = [sub.Chunk(*f, source=source)
+                                    for f in room_catalog.iter_entries(room_catalog.room_fields(rooms), times, entries)
+                                    if f[4] == aid and f[6] < f[7]]
+                if cfg.cache:
+                    self.write_back(aid, rooms, times, entries)
+
+            notes.append(f"{sum(len(c) for c in self.chunks.values())} 个空闲区间（{cfg.engine}）")
+
+    def out_dir(self) -> Path:
+        """写回用的暂存目录（ready_data_ 当前版本的副本），第一次写入时创建。"""
+        if self.staging is None:
+            if not self.ready_dir.is_dir():
+                dated_dirs.remove_expired(BASE_DIR, "ready_data_")
+            self.staging = versions.Staging(self.ready_dir)
+        return self.staging.path
+
+    def write_back(self, aid: str, rooms, times, entries) -> None:
+        """
+        以 catalog 格式写进暂存目录。_refresh.json 中是完整的构建清单（输入为页面的来源哈希），
+        4-raw2vector.py 据 tool 和 fetched_at 不会用更旧的 data_ 覆盖它。
+        """
+        result = self.pages[aid]
+        out = self.out_dir()
+        cid, out_hash = room_catalog.write_area(out, out / f"area_{aid}.json", aid, rooms, times, entries)
+        source = refresh.day_main_hash(result.text)
+        self.updates[aid] = refresh.build_entry(None, source, source, out_hash, TOOL, format=room_catalog.FORMAT,
+                                                catalog=cid, etag=result.etag, last_modified=result.last_modified,
+                                                changed=True, fetched_at=now_stamp())
+
+    # ---------- publish ----------
+    def publish(self) -> None:
+        """把写回的区域和更新的抓取记录作为 ready_data_ 的新版本发布。"""
+        if not self.updates:
+            return
+        with self.report.stage("publish") as notes:
+            out = self.out_dir()
+            state = refresh.load_state(str(out))
+            state.update(self.updates)
+            refresh.save_state(str(out), state)
+            if any(aid in self.chunks for aid in self.updates):
+                ready_snapshot.write_snapshot(out)
+            published = self.staging.publish(on_rebase=ready_snapshot.write_snapshot)
+            self.staging = None
+            notes.append(f"{len(self.updates)} 个区域 -> {self.ready_dir.name}/{published.name}")
+
+    # ---------- 缓存 ----------
+    def load_cached(self) -> None:
+        ids = [aid for aid in self.cfg.area_ids if aid not in self.chunks]
+        if not ids:
+            return
+        with self.report.stage("cache") as notes:
+            if not self.cfg.cache or not self.ready_dir.is_dir():
+                notes.append(f"{len(ids)} 个区域没有数据（{self.ready_dir.name} 不存在或已用 --no-cache 关闭）")
+                return
+            with versions.pin(self.ready_dir) as version_dir:
+                missing = set(checkpoint.incomplete_areas(str(version_dir)))
+                try:
+                    self.chunks.update(sub.load_chunks(version_dir, ids))
+                except FileNotFoundError:
+                    pass
+                for aid in sorted(missing.intersection(ids)):
+                    print(f"  [警告] {self.ready_dir.name} 中区域 {aid} 上次抓取失败，数据可能缺失或过时。")
+            notes.append(f"从 {self.ready_dir.name}/{version_dir.name} 读取 {len(ids)} 个区域")
+
+    # ---------- solve ----------
+    def solve(self, log_f) -> List[dict]:
+        cfg = self.cfg
+        with self.report.stage("solve") as notes:
+            for aid in cfg.area_ids:
+                sep = "=" * 60
+                log_f.write(f"\n{sep}\nAREA {aid} START\n{sep}\n")
+                with contextlib.redirect_stdout(log_f):
+                    if self.chunks.get(aid):
+                        summary = sub.solve(self.chunks[aid], aid, cfg.start_slot, cfg.end_slot,
+                                            cfg.required_facilities, cfg.forbidden_facilities,
+                                            cfg.require_area_names, cfg.forbid_area_names,
+                                            cfg.allow_three_changes, cfg.top_k_zero_change)
+                    else:
+                        msg = f"[end] No vectors found for area_id={aid}."
+                        print(msg)
+                        summary = {"area_id": aid, "ok": False, "message": msg}
+                        print("SUMMARY " + json.dumps(summary, ensure_ascii=False))
+                log_f.write(f"\n{sep}\nAREA {aid} END\n{sep}\n")
+                self.summaries.append(summary)
+            notes.append(f"{len(cfg.area_ids)} 个区域，{sum(1 for s in self.summaries if s.get('ok'))} 个有可行方案")
+        return self.summaries
+
+    def run(self, log_f) -> List[dict]:
+        if self.cfg.skip_fetch:
+            for name in ("auth", "fetch", "parse", "vectorize"):
+                self.report.skip(name, "--skip-fetch")
+        elif self.auth():
+            self.fetch()
+            if self.pages:
+                self.parse()
+                self.vectorize()
+            else:
+                for name in ("parse", "vectorize"):
+                    self.report.skip(name, "没有新页面")
+            self.publish()
+        else:
+            for name in ("fetch", "parse", "vectorize"):
+                self.report.skip(name, "没有可用的会话")
+        self.load_cached()
+        return self.solve(log_f)
+
+def split_list(text: str) -> List[str]:
+    return [x.strip() for x in (text or "").split(";") if x.strip()]
+
+def to_slot(text: str) -> int:
+    h, m = planner.floor_to_half_hour(*planner.parse_hhmm(text))
+    return planner.slot_index_from_time(h, m)
+
+def main():
+    ap = argparse.ArgumentParser(description="在一个进程里完成抓取、解析、压缩和求解")
+    where = ap.add_mutually_exclusive_group(required=True)
+    where.add_argument("--group", type=int, choices=sorted(planner.AREA_GROUPS), help="planner.AREA_GROUPS 中的分组")
+    where.add_argument("--areas", help="区域编号，逗号分隔")
+    ap.add_argument("--start", required=True, help="开始时间 HH:MM（向下取整到半点）")
+    ap.add_argument("--end", required=True, help="结束时间 HH:MM（向下取整到半点）")
+    ap.add_argument("--date", type=date.fromisoformat, default=None, help="日期 YYYY-MM-DD（默认今天）")
+    ap.add_argument("--require-facilities", default="", help="必须具备的设施，';' 分隔")
+    ap.add_argument("--forbid-facilities", default="", help="不能有的设施，';' 分隔")
+    ap.add_argument("--require-area-names", default="", help="区域名必须包含（全部），';' 分隔")
+    ap.add_argument("--forbid-area-names", default="", help="区域名不能包含（任一），';' 分隔")
+    ap.add_argument("--allow-three-changes", action="store_true", help="允许换 3 次房间")
+    ap.add_argument("--top-k-zero-change", type=int, default=50)
+    ap.add_argument("--skip-fetch", action="store_true", help="不联网，只用 ready_data_ 中已有的数据")
+    ap.add_argument("--no-cache", action="store_true", help="不读也不写 ready_data_，全部重新抓取")
+    ap.add_argument("--ttl", type=float, default=planner.DEFAULT_TTL_MINUTES,
+                    help=f"ready_data_ 中数据的有效期（分钟，默认 {planner.DEFAULT_TTL_MINUTES}；0 表示全部重新抓取）")
+    ap.add_argument("--area-ttl", type=parse_area_ttls, default=None, help="个别区域的有效期，如 13=5,24=60")
+    ap.add_argument("--parser", choices=sorted(DAY_SLOT_PARSERS), default=DEFAULT_DAY_PARSER)
+    ap.add_argument("--engine", choices=ENGINES, default=DEFAULT_ENGINE)
+    ap.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY)
+    ap.add_argument("--timeout", type=float, default=DEFAULT_TIMEOUT)
+    args = ap.parse_args()
+    load_dotenv()
+
+    try:
+        start_slot, end_slot = to_slot(args.start), to_slot(args.end)
+    except ValueError as e:
+        print(e)
+        exit(1)
+    if end_slot <= start_slot:
+        print("结束时间必须晚于开始时间（按半小时对齐后）。")
+        exit(1)
+    if args.group is not None:
+        area_ids = [str(a) for a in planner.AREA_GROUPS[args.group]]
+    else:
+        area_ids = [x for x in args.areas.replace(",", " ").split() if x]
+    if not area_ids:
+        print("该分组还没有配置区域，请先在 planner.py 中填写 AREA_GROUPS。")
+        exit(1)
+    if args.engine == "numpy" and not vectorize_np.AVAILABLE:
+        print("未安装 numpy，改用 python 引擎。")
+        args.engine = "python"
+
+    area_ttls = args.area_ttl if args.area_ttl is not None else {str(k): v for k, v in planner.AREA_TTL_MINUTES.items()}
+    cfg = PipelineConfig(
+        area_ids=area_ids, target_date=args.date or date.today(), start_slot=start_slot, end_slot=end_slot,
+        required_facilities=split_list(args.require_facilities),
+        forbidden_facilities=split_list(args.forbid_facilities),
+        require_area_names=split_list(args.require_area_names), forbid_area_names=split_list(args.forbid_area_names),
+        allow_three_changes=args.allow_three_changes, top_k_zero_change=args.top_k_zero_change,
+        skip_fetch=args.skip_fetch, cache=not args.no_cache, ttl=args.ttl, area_ttls=area_ttls,
+        parser=args.parser, engine=args.engine, concurrency=args.concurrency, timeout=args.timeout,
+        base_url=os.getenv("MRBS_BASE_URL", BASE_URL))
+    print(f"{cfg.target_date}  {planner.slot_to_hhmm(start_slot)}-{planner.slot_to_hhmm(end_slot)}"
+          f"（时段 [{start_slot}, {end_slot})），{len(area_ids)} 个区域")
+
+    logs_dir = BASE_DIR / "logs"
+    logs_dir.mkdir(exist_ok=True)
+    log_path = logs_dir / f"pipeline_{datetime.now().strftime('%Y%m%d_%H%M%S')}.log"
+    pipeline = Pipeline(cfg)
+    with log_path.open("w", encoding="utf-8") as log_f:
+        log_f.write("RUN CONFIG:\n" + json.dumps(asdict(cfg), ensure_ascii=False, indent=2, default=str) + "\n")
+        summaries = pipeline.run(log_f)
+
+    planner.print_summary(summaries)
+    pipeline.report.print()
+    print(f"\n详细输出：{log_path}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Shared query config and helpers for 5-main.py (interactive) and pipeline.py (one-shot).
+
+Edit the area groups, filter keywords, slot base and fetch TTLs here; both entry points
+read the same values.
+"""
+
+from __future__ import annotations
+from typing import Any, Dict, List, Tuple
+
+# =============== Config ===============
+AREA_GROUPS = {
+    1: [1, 13, 55, 54, 3, 9, 24, 52, 53, 50, 49, 99],    # north campus - west
+    2: [22, 27, 95, 26, 23, 36, 40, 35, 37, 34, 39, 97],  # north campus - east
+    3: []  # south campus (fill later)
+}
+
+AREA_NAME_OPTIONS = [
+    "SIP Campus-Meeting Rooms in Central Building",
+    "Foundation Building",
+    "Central Building",
+    "...(not imported yet)"
+]
+
+FACILITY_OPTIONS = [
+    "Online meeting available",
+    "86 inch MAXHUB",
+    "...(not imported yet)"
+]
+
+DAY_BASE_HOUR = 8       # slot 1 => 08:00-08:30
+DAY_BASE_MINUTE = 0
+MIN_SLOT_INDEX = 1
+
+# Ready data older than the TTL (minutes) is re-fetched before solving
+DEFAULT_TTL_MINUTES = 15
+AREA_TTL_MINUTES: Dict[int, float] = {}   # per-area overrides, e.g. {13: 5}
+
+# =============== Time slots ===============
+def parse_hhmm(s: str) -> Tuple[int, int]:
+    s = s.strip()
+    try:
+        hh, mm = s.split(":")
+        hh = int(hh); mm = int(mm)
+        if not (0 <= hh < 24 and 0 <= mm < 60):
+            raise ValueError
+        return hh, mm
+    except Exception:
+        raise ValueError(f"Invalid time: {s}. Use HH:MM (e.g., 09:13).")
+
+def floor_to_half_hour(h: int, m: int) -> Tuple[int, int]:
+    return (h, 0) if m < 30 else (h, 30)
+
+def slot_index_from_time(h: int, m: int) -> int:
+    base_minutes = DAY_BASE_HOUR * 60 + DAY_BASE_MINUTE
+    cur_minutes = h * 60 + m
+    delta = cur_minutes - base_minutes
+    half_hours = delta // 30
+    idx = half_hours + 1
+    if idx < MIN_SLOT_INDEX:
+        idx = MIN_SLOT_INDEX
+    return int(idx)
+
+def slot_to_hhmm(idx: int) -> str:
+    # Convert slot index -> wall clock time at slot boundary
+    minutes = DAY_BASE_HOUR * 60 + DAY_BASE_MINUTE + (idx - 1) * 30
+    hh = (minutes // 60) % 24
+    mm = minutes % 60
+    return f"{hh:02d}:{mm:02d}"
+
+# =============== Summary ===============
+def print_summary(summaries: List[Dict[str, Any]]) -> None:
+    """Readable and complete final summary of the per-area SUMMARY dicts."""
+    print("\n===== Summary =====")
+    ok_list = [x for x in summaries if x.get("ok")]
+    if not ok_list:
+        print("No feasible plans found.")
+        return
+    for info in ok_list:
+        aid = info.get("area_id")
+        chg = info.get("changes")
+        segs = info.get("segments") or []
+        area_name = segs[0]["area_name"] if segs else ""
+        print(f"\narea_id={aid} | area_name={area_name}")
+
+        if chg == 0:
+            print(f"- 0 changes: {len(segs)} single-room option(s)")
+            for i, s in enumerate(segs, 1):
+                st, et = slot_to_hhmm(int(s['start'])), slot_to_hhmm(int(s['end']))
+                print(f"  Option {i}: {s['room_name']} (cap {s['capacity']})  {st}-{et}  slots [{s['start']}, {s['end']})")
+        else:
+            print(f"- Plan: {chg} change(s), {len(segs)} segment(s)")
+            for j, s in enumerate(segs, 1):
+                st, et = slot_to_hhmm(int(s['start'])), slot_to_hhmm(int(s['end']))
+                print(f"  Seg{j}: {s['room_name']} (cap {s['capacity']})  {st}-{et}  slots [{s['start']}, {s['end']})")
+            switches = info.get("switches") or []
+            for j, (a, b) in enumerate(switches, 1):
+                print(f"  Switch window {j}: {slot_to_hhmm(int(a))}-{slot_to_hhmm(int(b))}  slots [{a}, {b})")
+
+            alts = info.get("alternatives") or []
+            for k, alt in enumerate(alts, 1):
+                a_chg = alt.get("changes")
+                a_segs = alt.get("segments", [])
+                note = alt.get("note", "")
+                print(f"  Alternative {k}: {a_chg} change(s) ({note})")
+                for j, s in enumerate(a_segs, 1):
+                    st, et = slot_to_hhmm(int(s['start'])), slot_to_hhmm(int(s['end']))
+                    print(f"    Seg{j}: {s['room_name']} (cap {s['capacity']})  {st}-{et}  slots [{s['start']}, {s['end']})")
+                if "switch_point" in alt:
+                    sp = alt["switch_point"]
+                    print(f"    Switch at: {slot_to_hhmm(int(sp))}  slot {sp}")
@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+ready_data_ 目录的二进制快照：_snapshot.bin。
+
+sub.py 每次查询都要 json.load 目录里的全部向量文件，再逐条做 str()/int() 转换成 Chunk。
+4-raw2vector.py 处理完一个目录后把其中全部向量另存成一个列式二进制文件，查询时用 mmap 打开，
+只读区域表和所查区域的那一段，几乎没有加载开销；多个进程同时打开时共享同一份页缓存。
+
+文件布局（小端，定宽记录）：
+
+  头部      magic "EYSSNAP1"、版本和各表的条数
+  字符串表  (n+1) 个 u32 偏移 + UTF-8 数据；房间名、设施、区域名、时刻、文件名都只存一次
+  源文件表  每个向量文件的 (文件名, 大小, mtime_ns)，用来判断快照是否仍与目录一致
+  区域表    (area_id, 首个区间, 区间数)，按 area_id 排序
+  房间表    (room_id, room_name, capacity, 设施起点, 设施数, area_id, area_name)
+  设施表    u32 字符串编号
+  区间表    (房间, start, end, start_time, end_time, 源文件)，按区域排列，区域内保持原文件中的顺序
+
+字段转换规则与 sub.chunk_from_vector 相同（见 vectorize.vector_fields），转换失败或 start >= end 的向量
+与 sub.py 读 JSON 时一样被丢弃，所以从快照得到的 Chunk 列表与读 JSON 完全相同。
+向量文件被增删或改动（例如 2-getdata.py --stream 直接写入）后快照即视为过期，sub.py 退回读 JSON。
+"""
+
+from __future__ import annotations
+import json
+import mmap
+import os
+import struct
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import room_catalog
+from vectorize import vector_fields
+
+SNAPSHOT_FILE = "_snapshot.bin"
+MAGIC = b"EYSSNAP1"
+VERSION = 1
+NONE = 0xFFFFFFFF                # 字符串编号为空（start_time/end_time 缺失）
+
+HEADER = struct.Struct("<8sIIIIIIII")    # magic, 版本, 字符串数, 字符串字节数, 文件数, 区域数, 房间数, 设施数, 区间数
+FILE_REC = struct.Struct("<IQQ")
+AREA_REC = struct.Struct("<III")
+ROOM_REC = struct.Struct("<IIiIIII")
+INTERVAL_REC = struct.Struct("<IiiIII")
+
+def vector_files(folder: Path) -> List[Path]:
+    # 以下划线开头的是元数据文件，与 sub.list_json_files 相同
+    return sorted([p for p in Path(folder).glob("*.json") if p.is_file() and not p.name.startswith("_")])
+
+def _file_sig(p: Path) -> Tuple[int, int]:
+    st = p.stat()
+    return st.st_size, st.st_mtime_ns
+
+def _area_key(area_id: str):
+    return (0, int(area_id), "") if area_id.isdigit() else (1, 0, area_id)
+
+# ---------- 写 ----------
+
+class _Strings:
+    def __init__(self):
+        self.index: Dict[str, int] = {}
+        self.items: List[bytes] = []
+
+    def add(self, s: Optional[str]) -> int:
+        if s is None:
+            return NONE
+        s = str(s)
+        i = self.index.get(s)
+        if i is None:
+            i = self.index[s] = len(self.items)
+            self.items.append(s.encode("utf-8"))
+        return i
+
+def iter_file_fields(folder: Path, data):
+    """json 或 catalog 格式的向量文件 -> 字段元组；无法读取的条目与 sub.py 一样跳过。"""
+    if room_catalog.is_catalog_data(data):
+        try:
+            yield from room_catalog.iter_fields(folder, data)
+        except Exception:
+            return
+        return
+    vectors = data.get("vectors") if isinstance(data, dict) else None
+    for v in vectors if isinstance(vectors, list) else []:
+        try:
+            yield vector_fields(v)
+        except Exception:
+            continue
+
+def write_snapshot(folder: Path) -> Tuple[Path, int]:
+    """把目录中全部向量文件写成 _snapshot.bin（先写临时文件再替换），返回 (路径, 区间数)。"""
+    folder = Path(folder)
+    strings = _Strings()
+    files, by_area = [], {}
+    for fp in vector_files(folder):
+        size, mtime_ns = _file_sig(fp)
+        try:
+            with fp.open("r", encoding="utf-8") as f:
+                data = json.load(f)
+        except Exception:
+            data = None
+        # 签名取在读之前：读的同时被改写的文件会让快照立即过期，而不是记下新签名、旧内容
+        files.append((strings.add(fp.name), size, mtime_ns))
+        for fields in iter_file_fields(folder, data):
+            if fields[6] < fields[7]:
+                by_area.setdefault(fields[4], []).append((fields, fp.name))
+
+    rooms: Dict[tuple, int] = {}
+    room_recs, facs, areas, intervals = [], [], [], []
+    for area_id in sorted(by_area, key=_area_key):
+        first = len(intervals)
+        for fields, source in by_area[area_id]:
+            room_id, room_name, capacity, facilities, aid, area_name, start, end, t0, t1 = fields
+            key = (room_id, room_name, capacity, facilities, aid, area_name)
+            r = rooms.get(key)
+            if r is None:
+                r = rooms[key] = len(room_recs)
+                room_recs.append((strings.add(room_id), strings.add(room_name), capacity, len(facs),
+                                  len(facilities), strings.add(aid), strings.add(area_name)))
+                facs.extend(strings.add(x) for x in facilities)
+            intervals.append((r, start, end, strings.add(t0), strings.add(t1), strings.add(source)))
+        areas.append((strings.add(area_id), first, len(intervals) - first))
+
+    offsets, total = [0], 0
+    for b in strings.items:
+        total += len(b)
+        offsets.append(total)
+    parts = [HEADER.pack(MAGIC, VERSION, len(strings.items), total, len(files), len(areas), len(room_recs),
+                         len(facs), len(intervals)),
+             struct.pack(f"<{len(offsets)}I", *offsets), b"".join(strings.items)]
+    parts += [FILE_REC.pack(*x) for x in files]
+    parts += [AREA_REC.pack(*x) for x in areas]
+    parts += [ROOM_REC.pack(*x) for x in room_recs]
+    parts.append(struct.pack(f"<{len(facs)}I", *facs))
+    parts += [INTERVAL_REC.pack(*x) for x in intervals]
+
+    path = folder / SNAPSHOT_FILE
+    tmp = folder / f"{SNAPSHOT_FILE}.{os.getpid()}.tmp"
+    with tmp.open("wb") as f:
+        f.write(b"".join(parts))
+    os.replace(tmp, path)
+    return path, len(intervals)
+
+# ---------- 读 ----------
+
+class Snapshot:
+    """mmap 打开的快照；只在需要时解码用到的字符串和记录。"""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        with self.path.open("rb") as f:
+            self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            (magic, version, n_str, str_bytes, self.n_files, self.n_areas, self.n_rooms,
+             self.n_facs, self.n_intervals) = HEADER.unpack_from(self.mm, 0)
+            if magic != MAGIC or version != VERSION:
+                raise ValueError(f"不是可识别的快照文件: {self.path}")
+            self.str_off = HEADER.size
+            self.str_data = self.str_off + 4 * (n_str + 1)
+            self.files_off = self.str_data + str_bytes
+            self.areas_off = self.files_off + FILE_REC.size * self.n_files
+            self.rooms_off = self.areas_off + AREA_REC.size * self.n_areas
+            self.facs_off = self.rooms_off + ROOM_REC.size * self.n_rooms
+            self.intervals_off = self.facs_off + 4 * self.n_facs
+            if self.intervals_off + INTERVAL_REC.size * self.n_intervals != len(self.mm):
+                raise ValueError(f"快照文件长度不符: {self.path}")
+        except Exception:
+            self.mm.close()
+            raise
+        self._strings: Dict[int, str] = {}
+        self._areas: Optional[Dict[str, Tuple[int, int]]] = None
+
+    def close(self) -> None:
+        self.mm.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def string(self, i: int) -> Optional[str]:
+        if i == NONE:
+            return None
+        s = self._strings.get(i)
+        if s is None:
+            a, b = struct.unpack_from("<II", self.mm, self.str_off + 4 * i)
+            s = self._strings[i] = self.mm[self.str_data + a:self.str_data + b].decode("utf-8")
+        return s
+
+    def files(self) -> List[Tuple[str, int, int]]:
+        return [(self.string(n), size, mtime_ns)
+                for n, size, mtime_ns in FILE_REC.iter_unpack(self.mm[self.files_off:self.areas_off])]
+
+    def is_current(self, folder: Path) -> bool:
+        """快照记录的向量文件与目录中现有的完全一致（文件名、大小、修改时间）。"""
+        present = vector_files(folder)
+        recorded = self.files()
+        if not present or len(present) != len(recorded):
+            return False
+        return all(p.name == name and _file_sig(p) == (size, mtime_ns)
+                   for p, (name, size, mtime_ns) in zip(present, recorded))
+
+    def areas(self) -> Dict[str, Tuple[int, int]]:
+        if self._areas is None:
+            self._areas = {self.string(aid): (first, count)
+                           for aid, first, count in AREA_REC.iter_unpack(self.mm[self.areas_off:self.rooms_off])}
+        return self._areas
+
+    def area_records(self, area_id: str) -> List[tuple]:
+        """该区域的全部区间，每条为 vector_fields 的字段加上源文件名（即 sub.Chunk 的字段顺序）。"""
+        first, count = self.areas().get(str(area_id), (0, 0))
+        start = self.intervals_off + INTERVAL_REC.size * first
+        raw = self.mm[start:start + INTERVAL_REC.size * count]
+        room_cache: Dict[int, tuple] = {}
+        out = []
+        for r, s, e, t0, t1, src in INTERVAL_REC.iter_unpack(raw):
+            room = room_cache.get(r)
+            if room is None:
+                rid, rname, cap, fac_first, fac_n, aid, aname = ROOM_REC.unpack_from(
+                    self.mm, self.rooms_off + ROOM_REC.size * r)
+                fac_idx = struct.unpack_from(f"<{fac_n}I", self.mm, self.facs_off + 4 * fac_first)
+                room = room_cache[r] = (self.string(rid), self.string(rname), cap,
+                                        tuple(self.string(i) for i in fac_idx), self.string(aid), self.string(aname))
+            out.append(room + (s, e, self.string(t0), self.string(t1), self.string(src)))
+        return out
+
+def open_current(folder: Path) -> Optional[Snapshot]:
+    """目录中有与向量文件一致的快照时返回打开的 Snapshot，否则返回 None（调用方退回读 JSON）。"""
+    path = Path(folder) / SNAPSHOT_FILE
+    if not path.is_file():
+        return None
+    try:
+        snap = Snapshot(path)
+    except (OSError, ValueError, struct.error):
+        return None
+    if not snap.is_current(folder):
+        snap.close()
+        return None
+    return snap
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+增量刷新的状态记录。
+
+每个 pages_/data_/ready_data_ 目录下都有一个 _refresh.json，按 area_id 记录该区域
+当前内容的“来源哈希”（即 day_main 表格规范化后的哈希）。抓取阶段额外记录
+ETag/Last-Modified 用于条件请求；下游阶段比较上游与自身记录的来源哈希，
+一致且输出文件仍在时即可跳过该区域。
+
+3/4 阶段在同一条记录里另存一份构建清单：input（本阶段实际读入内容的哈希）、
+output（写出文件的哈希）和 tool（产出它的解析/压缩规则版本及输出格式）。
+三者都对得上、输出文件也没被改动时才跳过；规则升级、格式切换或输出被改坏的区域会重建，
+上游重建后输出哈希变化的区域也会被下游发现。
+
+fetched_at（上次成功抓取、含 304 的时间）由抓取阶段写入 pages_，3/4 阶段每次运行都把它
+带到自己的记录里（跳过的区域也一样），按需抓取据 ready_data_ 中的值判断数据是否过期。
+"""
+
+from __future__ import annotations
+import hashlib
+import json
+import os
+import re
+from typing import Dict, Optional, Union
+
+REFRESH_FILE = "_refresh.json"
+
+_DAY_MAIN_RE = re.compile(r'<table[^>]*\bid=["\'](?:day|week)_main["\'][^>]*>.*?</table>', flags=re.I | re.S)
+
+def day_main_hash(html: str) -> str:
+    """
+    对 day_main（周视图为 week_main）表格做空白规范化后取 sha256；找不到表格时退化为整页哈希。
+    页面其余部分（导航、时间戳、token 等）的变化不影响结果。
+    """
+    m = _DAY_MAIN_RE.search(html)
+    fragment = m.group(0) if m else html
+    fragment = re.sub(r'\s+', ' ', fragment).strip()
+    return hashlib.sha256(fragment.encode('utf-8')).hexdigest()
+
+def load_state(folder: str) -> Dict[str, dict]:
+    path = os.path.join(folder, REFRESH_FILE)
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+    return data if isinstance(data, dict) else {}
+
+def save_state(folder: str, state: Dict[str, dict]) -> None:
+    path = os.path.join(folder, REFRESH_FILE)
+    tmp = path + ".tmp"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(state, f, ensure_ascii=False, indent=2, sort_keys=True)
+    os.replace(tmp, path)
+
+def source_hash(state: Dict[str, dict], area_id: str) -> Optional[str]:
+    entry = state.get(str(area_id))
+    return entry.get("source_hash") if isinstance(entry, dict) else None
+
+def is_up_to_date(upstream: Dict[str, dict], own: Dict[str, dict], area_id: str, output_path: str) -> bool:
+    """上游来源哈希与本阶段上次处理时一致，且输出文件存在。"""
+    up = source_hash(upstream, area_id)
+    return bool(up) and up == source_hash(own, area_id) and os.path.exists(output_path)
+
+def bytes_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+def file_hash(path: Union[str, os.PathLike]) -> Optional[str]:
+    """文件内容的 sha256；文件不存在时返回 None。"""
+    try:
+        with open(path, 'rb') as f:
+            return bytes_hash(f.read())
+    except FileNotFoundError:
+        return None
+
+def is_built(own: Dict[str, dict], area_id: str, input_hash: Optional[str], output_path: str, tool: str) -> bool:
+    """构建清单中该区域的输入哈希、工具版本与本次一致，且输出文件内容与记录的输出哈希相同。"""
+    entry = own.get(str(area_id))
+    if not input_hash or not isinstance(entry, dict):
+        return False
+    if entry.get("input") != input_hash or entry.get("tool") != tool or not entry.get("output"):
+        return False
+    return file_hash(output_path) == entry["output"]
+
+def build_entry(previous: Optional[dict], source: Optional[str], input_hash: str, output_hash: str,
+                tool: str, **extra) -> dict:
+    """新的清单记录；保留旧记录中其他阶段写入的字段（如 fetched_at）。"""
+    entry = dict(previous) if isinstance(previous, dict) else {}
+    entry.update(extra, input=input_hash, output=output_hash, tool=tool)
+    if source:
+        entry["source_hash"] = source
+    else:
+        entry.pop("source_hash", None)
+    return entry
+
+def carry_fetched_at(own: Dict[str, dict], area_id: str, upstream_entry: Optional[dict]) -> bool:
+    """把上游记录的 fetched_at 带到本阶段该区域的记录里（只会变新）；有改动时返回 True。"""
+    stamp = upstream_entry.get("fetched_at") if isinstance(upstream_entry, dict) else None
+    entry = own.get(str(area_id))
+    if not stamp or not isinstance(entry, dict) or stamp <= entry.get("fetched_at", ""):
+        return False
+    entry["fetched_at"] = stamp
+    return True
@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+房间目录：把房间元数据从空闲区间里拆出来。
+
+json 格式的向量为每个空闲区间都复制一遍房间名、容量、设施、区域名；一个有五段空闲的房间
+就存五份。catalog 格式（4-raw2vector.py 的默认输出）改为：
+
+  ready_data_dd-mm-yyyy/v3/area_24.json（versions.py 发布的版本目录）
+    {"format": "catalog", "version": 1, "area_id": "24", "catalog": "3f2a...",
+     "times": ["08:00", "08:30", ..., "22:00"],
+     "intervals": [[0, 1, 5], [0, 9, 12], [3, 2, 4, "08:30", "09:30"], ...]}
+
+  room_catalog/3f2a....json（与 ready_data_ 目录同级）
+    [{"room_id": "101", "room_name": "...", "capacity": 8, "facilities": [...],
+      "area_id": "24", "area_name": "..."}, ...]
+
+intervals 的每一项为 [房间序号, start_index, end_index]，时刻取 times[start-1] / times[end-1]；
+个别房间的时段与区域不同时带上自己的 start_time / end_time。目录按内容哈希命名，
+房间不变时各天、各次运行都引用同一个文件，只写一次；房间信息变化只产生一个新目录文件。
+不再被任何 ready_data_ 版本引用的目录文件由 gc 清理。
+"""
+
+from __future__ import annotations
+import hashlib
+import json
+import os
+import time
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+import refresh
+import slots
+import versions
+from vectorize import add_minutes_str, normalize_facilities_to_list, to_int_if_numeric, vector_fields
+
+FORMAT = "catalog"
+VERSION = 1
+CATALOG_DIR = "room_catalog"
+GC_GRACE_SECONDS = 3600     # 刚写入、可能尚未记进 _refresh.json 的目录文件不回收
+
+_cache: Dict[Tuple[str, str], List[Optional[tuple]]] = {}
+
+def is_catalog_data(data) -> bool:
+    return isinstance(data, dict) and data.get("format") == FORMAT
+
+def catalog_dir(ready_dir: Path) -> Path:
+    return versions.root_of(Path(ready_dir).resolve()).parent / CATALOG_DIR
+
+def room_record(room) -> dict:
+    """与 make_vector_json 相同的字段和缺省值。"""
+    return {"room_id": room.get("room_id", ""), "room_name": room.get("room_name", ""),
+            "capacity": to_int_if_numeric(room.get("capacity", "")),
+            "facilities": normalize_facilities_to_list(room.get("facilities")),
+            "area_id": room.get("area_id", ""), "area_name": room.get("area_name", "")}
+
+def labels_for(times: Sequence[str], slot_minutes: int) -> List[str]:
+    """时刻标签：各时段的起始时刻，末尾多一个“最后时段 + 时长”，供右端点越界的区间使用。"""
+    return list(times) + [add_minutes_str(times[-1], slot_minutes)] if times else []
+
+# ---------- 生成 ----------
+
+def from_area(area: slots.AreaSlots, room_intervals) -> Tuple[List[dict], List[str], list]:
+    """
+    由紧凑日程和每个房间的 (区间列表, 时刻列表, 时段分钟数)（AreaSlots.room_intervals 或
+    vectorize_np.area_intervals 的结果）生成 (房间目录, times, intervals)。
+    区域的全部房间都进目录，没有空闲时段的房间也在，这样目录不随每天的预订变化。
+    """
+    rooms = [room_record(r) for r in area.rooms]
+    times = labels_for(area.slots, area.slot_minutes)
+    entries = []
+    for idx, (intervals, room_times, slot_minutes) in enumerate(room_intervals):
+        if room_times is area.slots:
+            entries.extend([idx, s, e] for s, e in intervals)
+            continue
+        own = labels_for(room_times, slot_minutes)
+        entries.extend([idx, s, e, own[s - 1], own[e - 1]] for s, e in intervals)
+    return rooms, times, entries
+
+def from_vectors(vectors: List[dict]) -> Tuple[List[dict], List[str], list]:
+    """由 json 格式的向量生成（不能转成紧凑日程的数据用）；每个区间都带上自己的时刻。"""
+    index: Dict[str, int] = {}
+    rooms, entries = [], []
+    for v in vectors:
+        rec = room_record(v)
+        key = json.dumps(rec, ensure_ascii=False, sort_keys=True)
+        idx = index.get(key)
+        if idx is None:
+            idx = index[key] = len(rooms)
+            rooms.append(rec)
+        entries.append([idx, v["start_index"], v["end_index"], v.get("start_time"), v.get("end_time")])
+    return rooms, [], entries
+
+def _dump(obj) -> bytes:
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+def _write_atomic(path: Path, data: bytes) -> None:
+    tmp = path.with_name(path.name + f".{os.getpid()}.tmp")
+    with tmp.open("wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+def save_catalog(ready_dir: Path, rooms: List[dict]) -> str:
+    """
+    按内容哈希保存房间目录，已存在时不重写、只更新修改时间；返回目录编号。
+    新的引用要等暂存目录的 _refresh.json 保存后才被 gc 看到，更新修改时间让它在此之前
+    处于 GC_GRACE_SECONDS 保护期内，不会被同时运行的另一次 gc 当作无人引用删掉。
+    """
+    data = _dump(rooms)
+    cid = hashlib.sha256(data).hexdigest()[:24]
+    path = catalog_dir(ready_dir) / f"{cid}.json"
+    try:
+        os.utime(path)
+    except FileNotFoundError:
+        path.parent.mkdir(exist_ok=True)
+        _write_atomic(path, data)
+    return cid
+
+def write_area(ready_dir: Path, out_path: Path, area_id: str, rooms: List[dict], times: List[str],
+               entries: list) -> Tuple[str, str]:
+    """保存房间目录并写出区域文件（先写临时文件再替换）。返回 (目录编号, 区域文件内容的 sha256)。"""
+    cid = save_catalog(ready_dir, rooms)
+    doc = {"format": FORMAT, "version": VERSION, "area_id": str(area_id), "catalog": cid,
+           "times": times, "intervals": entries}
+    data = _dump(doc)
+    _write_atomic(Path(out_path), data)
+    return cid, hashlib.sha256(data).hexdigest()
+
+# ---------- 读取 ----------
+
+def room_fields(records: List[dict]) -> List[Optional[tuple]]:
+    """
+    房间目录 -> 每个房间的 (room_id, room_name, capacity, facilities, area_id, area_name)，
+    转换规则与 sub.chunk_from_vector 相同；无法转换的房间为 None。
+    """
+    rooms = []
+    for rec in records:
+        try:
+            rooms.append(vector_fields(dict(rec, start_index=0, end_index=0))[:6])
+        except Exception:
+            rooms.append(None)
+    return rooms
+
+def load_rooms(ready_dir: Path, cid: str) -> List[Optional[tuple]]:
+    """读取目录文件并转换成 room_fields 的结果。同一进程内按目录编号缓存。"""
+    key = (str(catalog_dir(ready_dir)), cid)
+    rooms = _cache.get(key)
+    if rooms is None:
+        with (catalog_dir(ready_dir) / f"{cid}.json").open("r", encoding="utf-8") as f:
+            rooms = _cache[key] = room_fields(json.load(f))
+    return rooms
+
+def iter_entries(rooms: List[Optional[tuple]], times: Sequence[str], entries: list) -> Iterator[tuple]:
+    """(room_fields 的结果, times, intervals) -> 与 vectorize.vector_fields 相同的字段元组，逐个区间。"""
+    for entry in entries:
+        room = rooms[entry[0]]
+        if room is None:
+            continue
+        s, e = int(entry[1]), int(entry[2])
+        if len(entry) >= 5:
+            t0, t1 = entry[3], entry[4]
+        else:
+            t0 = times[s - 1] if 1 <= s <= len(times) else None
+            t1 = times[e - 1] if 1 <= e <= len(times) else None
+        yield room + (s, e, t0, t1)
+
+def iter_fields(ready_dir: Path, data: dict) -> Iterator[tuple]:
+    """catalog 格式的区域文件 -> 字段元组，逐个区间。"""
+    return iter_entries(load_rooms(ready_dir, data["catalog"]), data.get("times") or [], data.get("intervals", []))
+
+# ---------- 清理 ----------
+
+def referenced(base: Path) -> set:
+    """base 下各 ready_* 目录（包括其中尚未回收的旧版本和暂存目录）的 _refresh.json 中记录的目录编号。"""
+    out = set()
+    for root in Path(base).glob("ready_*"):
+        for d in versions.all_dirs(root) if root.is_dir() else []:
+            out.update(e.get("catalog") for e in refresh.load_state(str(d)).values() if isinstance(e, dict))
+    out.discard(None)
+    return out
+
+def gc(base: Path, log=print) -> int:
+    """删除不再被任何 ready_* 目录引用的房间目录文件，返回删除的个数。"""
+    folder = Path(base) / CATALOG_DIR
+    if not folder.is_dir():
+        return 0
+    keep = referenced(base)
+    now = time.time()
+    removed = 0
+    for p in folder.glob("*.json"):
+        try:
+            if p.stem not in keep and now - p.stat().st_mtime > GC_GRACE_SECONDS:
+                p.unlink()
+                removed += 1
+        except FileNotFoundError:
+            continue
+    if removed and log:
+        log(f"[清理] 删除了 {removed} 个不再使用的房间目录文件")
+    return removed
@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+MRBS 会话检查与健康记录。
+
+probe_session 用保存的 Cookie 发一个普通 HTTP 请求（今天的日视图）：
+最终没有落到 SSO 登录页、且页面里有 day_main 表格，就说明会话仍然有效，
+1-auth.py 可以完全跳过浏览器。
+
+session_state.json 记录当前 Cookie（按指纹区分，不保存 Cookie 本身）的健康状况：
+首次确认有效的时间、最近一次成功/检查的时间、是否已过期，以及以往各个 Cookie
+实际存活了多久。keepalive.py 定期探测并写入；1-auth.py 登录后、2-getdata.py
+抓取前后也会更新，抓取前若已知 Cookie 过期则直接提示重新登录，不再白跑一轮。
+"""
+
+from __future__ import annotations
+import hashlib
+import json
+import os
+import time
+from dataclasses import asdict, dataclass, field
+from datetime import date, datetime
+from typing import List, Optional
+
+import httpx
+
+from fetcher import BASE_URL, SSO_HOST, USER_AGENT
+
+PROBE_TIMEOUT = 10
+
+@dataclass
+class ProbeResult:
+    alive: bool
+    reason: str
+    status: Optional[int] = None
+    elapsed: float = 0.0
+    html: str = ""                # 会话有效时为今天日视图的页面，可顺带解析区域列表
+    network_error: bool = False   # 网络问题，无法判断会话状态
+
+def probe_session(cookie: Optional[str], base_url: str = BASE_URL,
+                  timeout: float = PROBE_TIMEOUT) -> ProbeResult:
+    if not cookie:
+        return ProbeResult(False, "未保存 Cookie")
+    t0 = time.perf_counter()
+    params = {"view": "day", "view_all": 1, "page_date": date.today().isoformat()}
+    try:
+        with httpx.Client(headers={"User-Agent": USER_AGENT, "Cookie": cookie},
+                          timeout=timeout, follow_redirects=True) as client:
+            response = client.get(base_url, params=params)
+    except httpx.HTTPError as e:
+        return ProbeResult(False, f"网络错误: {e or type(e).__name__}",
+                           elapsed=time.perf_counter() - t0, network_error=True)
+    elapsed = time.perf_counter() - t0
+    if SSO_HOST in str(response.url):
+        return ProbeResult(False, "被重定向到 SSO 登录页", response.status_code, elapsed)
+    if response.status_code != 200:
+        return ProbeResult(False, f"HTTP {response.status_code}", response.status_code, elapsed)
+    if 'id="day_main"' not in response.text and "id='day_main'" not in response.text:
+        return ProbeResult(False, "页面中没有 day_main 表格", response.status_code, elapsed)
+    return ProbeResult(True, "会话有效", response.status_code, elapsed, html=response.text)
+
+
+SESSION_STATE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'session_state.json')
+DEFAULT_WARN_MINUTES = 60
+MAX_LIFETIMES = 10
+
+def cookie_fingerprint(cookie: Optional[str]) -> str:
+    return hashlib.sha256((cookie or "").encode("utf-8")).hexdigest()[:16] if cookie else ""
+
+def _parse_time(value: str) -> Optional[datetime]:
+    try:
+        return datetime.fromisoformat(value) if value else None
+    except ValueError:
+        return None
+
+@dataclass
+class SessionHealth:
+    fingerprint: str = ""
+    status: str = "unknown"       # "alive" | "expired" | "unknown"
+    first_seen: str = ""          # 首次确认该 Cookie 有效的时间
+    last_ok: str = ""
+    last_check: str = ""
+    expired_at: str = ""
+    reason: str = ""
+    lifetimes: List[float] = field(default_factory=list)   # 以往各个 Cookie 的观测寿命（小时）
+
+    def age_hours(self, now: Optional[datetime] = None) -> Optional[float]:
+        first = _parse_time(self.first_seen)
+        if first is None:
+            return None
+        return ((now or datetime.now()) - first).total_seconds() / 3600
+
+    def expected_lifetime_hours(self) -> Optional[float]:
+        """取以往观测寿命中最短的一个，宁可早提醒。"""
+        return min(self.lifetimes) if self.lifetimes else None
+
+    def remaining_hours(self, now: Optional[datetime] = None) -> Optional[float]:
+        age = self.age_hours(now)
+        lifetime = self.expected_lifetime_hours()
+        if age is None or lifetime is None or self.status != "alive":
+            return None
+        return lifetime - age
+
+    def expiring_soon(self, warn_minutes: float = DEFAULT_WARN_MINUTES, now: Optional[datetime] = None) -> bool:
+        remaining = self.remaining_hours(now)
+        return remaining is not None and remaining * 60 <= warn_minutes
+
+    def summary(self, now: Optional[datetime] = None) -> str:
+        parts = [{"alive": "有效", "expired": "已过期"}.get(self.status, "未知")]
+        age = self.age_hours(now)
+        if age is not None and self.status == "alive":
+            parts.append(f"已存活 {age:.1f} 小时")
+        remaining = self.remaining_hours(now)
+        if remaining is not None:
+            parts.append(f"预计剩余 {max(0.0, remaining):.1f} 小时（依据 {len(self.lifetimes)} 次观测）")
+        if self.status == "expired" and self.expired_at:
+            parts.append(f"于 {self.expired_at} 发现过期")
+        if self.reason and self.status != "alive":
+            parts.append(self.reason)
+        return "，".join(parts)
+
+def load_health(path: str = SESSION_STATE_PATH) -> SessionHealth:
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except (FileNotFoundError, ValueError):
+        return SessionHealth()
+    known = SessionHealth.__dataclass_fields__
+    return SessionHealth(**{k: v for k, v in data.items() if k in known}) if isinstance(data, dict) else SessionHealth()
+
+def save_health(health: SessionHealth, path: str = SESSION_STATE_PATH) -> None:
+    tmp = path + ".tmp"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(asdict(health), f, ensure_ascii=False, indent=2)
+    os.replace(tmp, path)
+
+def observe(health: SessionHealth, cookie: Optional[str], alive: Optional[bool], reason: str = "",
+            now: Optional[datetime] = None) -> SessionHealth:
+    """
+    记录一次观测。alive=None 表示网络问题、无法判断，只更新检查时间。
+    换了新 Cookie 时重新计时，但保留以往的寿命记录。
+    """
+    now = now or datetime.now()
+    stamp = now.isoformat(timespec="seconds")
+    fp = cookie_fingerprint(cookie)
+    if fp != health.fingerprint:
+        health = SessionHealth(fingerprint=fp, lifetimes=health.lifetimes)
+    health.last_check = stamp
+    health.reason = reason
+    if alive is None:
+        return health
+    if alive:
+        if health.status == "expired":
+            # 同一个 Cookie 又能用了：之前的判断有误，重新计时
+            health.first_seen = ""
+            health.expired_at = ""
+        health.status = "alive"
+        health.first_seen = health.first_seen or stamp
+        health.last_ok = stamp
+    elif health.status != "expired":
+        health.status = "expired"
+        health.expired_at = stamp
+        age = health.age_hours(now)
+        if age is not None and age > 0:
+            health.lifetimes = (health.lifetimes + [round(age, 3)])[-MAX_LIFETIMES:]
+    return health
+
+def record(cookie: Optional[str], alive: Optional[bool], reason: str = "",
+           path: str = SESSION_STATE_PATH) -> SessionHealth:
+    health = observe(load_health(path), cookie, alive, reason)
+    save_health(health, path)
+    return health
+
+def record_probe(cookie: Optional[str], probe: ProbeResult, path: str = SESSION_STATE_PATH) -> SessionHealth:
+    alive = None if probe.network_error else probe.alive
+    return record(cookie, alive, "" if probe.alive else probe.reason, path)
+
+def fetch_gate(cookie: Optional[str], warn_minutes: float = DEFAULT_WARN_MINUTES,
+               path: str = SESSION_STATE_PATH) -> tuple[bool, str]:
+    """
+    抓取前的会话检查：(是否继续, 提示信息)。
+    只有记录中的同一个 Cookie 已被确认过期时才阻止；没有记录时放行。
+    """
+    health = load_health(path)
+    if health.fingerprint != cookie_fingerprint(cookie) or health.status == "unknown":
+        return True, ""
+    if health.status == "expired":
+        return False, f"当前 Cookie 已过期（{health.summary()}），请先重新运行 1-auth.py。"
+    if health.expiring_soon(warn_minutes):
+        return True, f"警告：当前 Cookie 可能即将过期（{health.summary()}）。"
+    return True, ""
@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+紧凑的日程表示：一个区域共用一条时段轴，每个房间只存一串整数编码。
+
+parse_html_to_schedule 给每个房间一份 {时刻: 预订名} 字典，下游再逐个房间排序时刻、
+猜时段长度、把预订名转小写判断是否空闲。这里把这些工作在解析时做一次：
+
+  {"format": "slots", "version": 1, "area_id": "24", "area_name": "...",
+   "slots": ["08:00", "08:30", ...], "slot_minutes": 30,
+   "bookings": ["Booked", "Weekly meeting", ...],
+   "rooms": [{"room_id": "101", "room_name": "...", "capacity": 8, "facilities": "...",
+              "codes": [0, 0, 2, 2, -1, ...]}, ...]}
+
+codes 与 slots 一一对应：0 为空闲，k > 0 为 bookings[k-1]，-1 表示该房间没有这个时段
+（表格行提前结束时会出现）。与 compress_available 一致，名称去空白、转小写后为
+"available" 的预订也算空闲。内存中每个房间另有一个空闲位图 avail（第 i 位对应 slots[i]），
+区间压缩直接在位图上找连续的 1，结果与对字典调用 compress_available 完全相同。
+"""
+
+from __future__ import annotations
+import re
+from array import array
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Tuple
+
+FORMAT = "slots"
+VERSION = 1
+AVAILABLE = 0
+ABSENT = -1
+AVAILABLE_NAME = "Available"
+ROOM_KEYS = ("room_id", "room_name", "capacity", "facilities", "area_id", "area_name")
+
+_TIME_RE = re.compile(r"(\d{2}):(\d{2})")
+
+def to_minutes(hhmm: str) -> int:
+    m = _TIME_RE.fullmatch(hhmm)
+    if not m:
+        raise ValueError(f"非法时间格式: {hhmm}")
+    return int(m.group(1)) * 60 + int(m.group(2))
+
+def guess_slot_minutes(times_sorted: List[str]) -> int:
+    if len(times_sorted) < 2:
+        return 30
+    mins = [to_minutes(t) for t in times_sorted]
+    diffs = [b - a for a, b in zip(mins, mins[1:]) if b > a]
+    return min(diffs) if diffs else 30
+
+def is_available_name(name) -> bool:
+    return str(name).strip().lower() == "available"
+
+def avail_runs(mask: int) -> List[Tuple[int, int]]:
+    """位图中连续的 1，返回 [(起, 止)) 列表（0 起）。"""
+    out = []
+    while mask:
+        start = (mask & -mask).bit_length() - 1
+        filled = mask | ((1 << start) - 1)
+        end = ((filled + 1) & ~filled).bit_length() - 1
+        out.append((start, end))
+        mask &= ~((1 << end) - 1)
+    return out
+
+@dataclass
+class RoomSlots:
+    meta: dict                      # ROOM_KEYS 中的字段，顺序与 parse_html_to_schedule 相同
+    codes: array                    # array('h')，与区域的 slots 对齐
+
+    @property
+    def avail(self) -> int:
+        mask = 0
+        for i, c in enumerate(self.codes):
+            if c == AVAILABLE:
+                mask |= 1 << i
+        return mask
+
+    def get(self, key, default=None):
+        return self.meta.get(key, default)
+
+@dataclass
+class AreaSlots:
+    area_id: str
+    area_name: str
+    slots: List[str] = field(default_factory=list)
+    slot_minutes: int = 30
+    bookings: List[str] = field(default_factory=list)
+    rooms: List[RoomSlots] = field(default_factory=list)
+
+    # ---------- 压缩 ----------
+    def room_intervals(self, room: RoomSlots) -> Tuple[List[Tuple[int, int]], List[str], int]:
+        """
+        与 vectorize.compress_available(该房间的 schedule) 返回值相同：
+        (1 起的半开区间列表, 该房间的时刻列表, 时段分钟数)。房间没有任何时段时区间为空。
+        """
+        codes = room.codes
+        if ABSENT not in codes:
+            return [(s + 1, e + 1) for s, e in avail_runs(room.avail)], self.slots, self.slot_minutes
+        # 缺时段的房间按自己实际有的时段编号，与字典形式逐房间排序的结果一致
+        times = [t for t, c in zip(self.slots, codes) if c != ABSENT]
+        mask = 0
+        for i, c in enumerate(c for c in codes if c != ABSENT):
+            if c == AVAILABLE:
+                mask |= 1 << i
+        return [(s + 1, e + 1) for s, e in avail_runs(mask)], times, guess_slot_minutes(times)
+
+    # ---------- 与字典形式互转 ----------
+    def schedule(self, room: RoomSlots) -> Dict[str, str]:
+        names = [AVAILABLE_NAME] + self.bookings
+        return {t: names[c] for t, c in zip(self.slots, room.codes) if c != ABSENT}
+
+    def to_rooms(self) -> List[dict]:
+        out = []
+        for room in self.rooms:
+            r = dict(room.meta)
+            r["schedule"] = self.schedule(room)
+            out.append(r)
+        return out
+
+    def to_json(self) -> dict:
+        return {"format": FORMAT, "version": VERSION, "area_id": self.area_id, "area_name": self.area_name,
+                "slots": self.slots, "slot_minutes": self.slot_minutes, "bookings": self.bookings,
+                "rooms": [dict(room.meta, codes=list(room.codes)) for room in self.rooms]}
+
+    @classmethod
+    def from_json(cls, data: dict) -> "AreaSlots":
+        rooms = [RoomSlots({k: r.get(k) for k in ROOM_KEYS}, array("h", r.get("codes", [])))
+                 for r in data.get("rooms", [])]
+        return cls(str(data.get("area_id", "")), data.get("area_name", ""), list(data.get("slots", [])),
+                   int(data.get("slot_minutes", 30)), list(data.get("bookings", [])), rooms)
+
+def is_slots_data(data) -> bool:
+    return isinstance(data, dict) and data.get("format") == FORMAT
+
+class SlotBuilder:
+    """
+    解析器边读表格边填编码：set(房间序号, 时刻, 预订名)。时刻按首次出现的顺序登记，
+    build() 时按时间排序；同一房间同一时刻重复出现时以最后一次为准（与字典相同）。
+    """
+
+    def __init__(self, area_id: str, area_name: str, room_metas: List[dict]):
+        self.area_id = area_id
+        self.area_name = area_name
+        self.metas = room_metas
+        self.slot_index: Dict[str, int] = {}
+        self.booking_index: Dict[str, int] = {}
+        self.bookings: List[str] = []
+        self.columns: List[array] = [array("h") for _ in room_metas]
+
+    def slot(self, time_slot: str) -> int:
+        idx = self.slot_index.get(time_slot)
+        if idx is None:
+            idx = self.slot_index[time_slot] = len(self.slot_index)
+            for col in self.columns:
+                col.append(ABSENT)
+        return idx
+
+    def code(self, name: str) -> int:
+        c = self.booking_index.get(name)
+        if c is None:
+            if is_available_name(name):
+                c = AVAILABLE
+            else:
+                self.bookings.append(name)
+                c = len(self.bookings)
+            self.booking_index[name] = c
+        return c
+
+    def set(self, room_index: int, slot_idx: int, name: str) -> None:
+        self.columns[room_index][slot_idx] = self.code(name)
+
+    def build(self) -> AreaSlots:
+        times = list(self.slot_index)
+        order = sorted(range(len(times)), key=lambda i: to_minutes(times[i]))
+        if order != list(range(len(times))):
+            times = [times[i] for i in order]
+            self.columns = [array("h", (col[i] for i in order)) for col in self.columns]
+        rooms = [RoomSlots(meta, col) for meta, col in zip(self.metas, self.columns)]
+        return AreaSlots(self.area_id, self.area_name, times, guess_slot_minutes(times), self.bookings, rooms)
+
+def from_rooms(rooms: Iterable[dict], area_id: Optional[str] = None, area_name: Optional[str] = None) -> AreaSlots:
+    """把 parse_html_to_schedule / 周视图解析的房间列表转成紧凑形式。"""
+    rooms = list(rooms)
+    if area_id is None:
+        area_id = str(rooms[0].get("area_id", "")) if rooms else ""
+    if area_name is None:
+        area_name = rooms[0].get("area_name", "") if rooms else ""
+    builder = SlotBuilder(area_id, area_name, [{k: r.get(k) for k in ROOM_KEYS} for r in rooms])
+    for i, r in enumerate(rooms):
+        for t, name in (r.get("schedule") or {}).items():
+            builder.set(i, builder.slot(t), name)
+    return builder.build()
@@ -8,9 +8,18 @@ from pathlib import Path
 from datetime import date
 import json
 import re
-import sys
 import argparse
 
+import dated_dirs
+import checkpoint
+import history_store
+import ready_snapshot
+import refresh
+import room_catalog
+import slots
+import versions
+from vectorize import slots_to_vectors, vector_fields
+
 # =========================
 # Data model and IO
 # =========================
@@ -32,34 +41,56 @@ class Chunk:
         fac = "{" + ", ".join(self.facilities) + "}" if self.facilities else "{}"
         return f"{{{self.room_id}, {self.room_name}, {self.capacity}, {fac}, {self.area_id}, {self.area_name}, {self.start}, {self.end}}}"
 
-def find_latest_ready_folder(base: Path) -> Path:
-    rx = re.compile(r"^ready_data_(\d{2})-(\d{2})-(\d{4})$")
-    candidates = []
-    for p in base.iterdir():
-        if p.is_dir():
-            m = rx.match(p.name)
-            if m:
-                dd, mm, yyyy = map(int, m.groups())
-                try:
-                    d = date(yyyy, mm, dd)
-                except ValueError:
-                    continue
-                candidates.append((d, p))
-    if not candidates:
+def find_latest_ready_folder(base: Path, target: Optional[date] = None) -> Path:
+    """Today's ready_data_ folder (or the newest past one); with target, exactly that date."""
+    folder = dated_dirs.pick_dir(base, "ready_data_", target)
+    if folder is None:
+        if target is not None:
+            raise FileNotFoundError(f"No {dated_dirs.dir_name('ready_data_', target)} directory found.")
         raise FileNotFoundError("No ready_data_dd-mm-yyyy directory found.")
-    candidates.sort(key=lambda x: x[0], reverse=True)
-    return candidates[0][1]
+    return folder
 
-def list_json_files(folder: Path) -> List[Path]:
-    return sorted([p for p in folder.glob("*.json") if p.is_file()])
+AREA_FILE_RE = re.compile(r"area_(\d+)\.json")
 
-def load_chunks_for_area(ready_dir: Path, area_id: str) -> List[Chunk]:
-    chunks: List[Chunk] = []
-    files = list_json_files(ready_dir)
+def list_json_files(folder: Path) -> List[Path]:
+    # Files starting with "_" are metadata (e.g. _refresh.json), not vectors
+    return sorted([p for p in folder.glob("*.json") if p.is_file() and not p.name.startswith("_")])
+
+def area_files(folder: Path, area_ids: List[str]) -> List[Path]:
+    """
+    The files that can hold these areas. Stages 3 and 4 write one area_{id}.json per area next to the
+    _refresh.json build manifest, so such a folder is not even listed: only the requested areas' files
+    are opened. Other folders are listed, and scanned whole unless every file follows that naming.
+    """
+    if (folder / refresh.REFRESH_FILE).is_file():
+        return [p for p in (folder / f"area_{aid}.json" for aid in area_ids) if p.is_file()]
+    files = list_json_files(folder)
     if not files:
-        raise FileNotFoundError(f"No .json files in folder: {ready_dir}")
-
-    for fp in files:
+        raise FileNotFoundError(f"No .json files in folder: {folder}")
+    if not all(AREA_FILE_RE.fullmatch(fp.name) for fp in files):
+        return files
+    wanted = {f"area_{aid}.json" for aid in area_ids}
+    return [fp for fp in files if fp.name in wanted]
+
+def chunk_from_vector(v: Dict[str, Any], source: str) -> Chunk:
+    # Same coercion rules as the binary snapshot, so both paths yield identical chunks
+    return Chunk(*vector_fields(v), source=source)
+
+def load_chunks(ready_dir: Path, area_ids: List[str]) -> Dict[str, List[Chunk]]:
+    """Chunks of several areas in one pass over the folder: every file is parsed at most once."""
+    # A versioned ready_data_ folder is read through its current version (callers that pin pass the version dir)
+    ready_dir = versions.resolve(ready_dir)
+    out: Dict[str, List[Chunk]] = {str(a): [] for a in area_ids}
+    # A current _snapshot.bin (written by 4-raw2vector.py) is mmapped; only the wanted areas' slices are decoded
+    snap = ready_snapshot.open_current(ready_dir)
+    if snap is not None:
+        with snap:
+            for aid in out:
+                out[aid] = [Chunk(*rec) for rec in snap.area_records(aid)]
+        return out
+
+    # Load cost follows the requested areas' size, not the number of areas in the folder
+    for fp in area_files(ready_dir, list(out)):
         try:
             with fp.open("r", encoding="utf-8") as f:
                 data = json.load(f)
@@ -67,37 +98,83 @@ def load_chunks_for_area(ready_dir: Path, area_id: str) -> List[Chunk]:
             print(f"[skip] Failed to parse: {fp.name} -> {e}")
             continue
 
-        vectors = data.get("vectors") if isinstance(data, dict) else None
+        if room_catalog.is_catalog_data(data):
+            # Intervals reference rooms in the shared room catalog by index; room fields are built once per room
+            aid = str(data.get("area_id"))
+            if aid not in out:
+                continue
+            try:
+                out[aid].extend(Chunk(*f, source=fp.name) for f in room_catalog.iter_fields(ready_dir, data)
+                                if f[4] == aid and f[6] < f[7])
+            except Exception as e:
+                print(f"[skip] Invalid catalog file: {fp.name} -> {e}")
+            continue
+        if slots.is_slots_data(data):
+            # Compact stage-3 output (a data_ folder): compress its availability bitmaps here
+            if str(data.get("area_id")) not in out:
+                continue
+            vectors = slots_to_vectors(slots.AreaSlots.from_json(data))
+        else:
+            vectors = data.get("vectors") if isinstance(data, dict) else None
         if not isinstance(vectors, list):
             print(f"[skip] Non-standard JSON (missing 'vectors' array): {fp.name}")
             continue
 
         for v in vectors:
             try:
-                if str(v.get("area_id")) != str(area_id):
+                bucket = out.get(str(v.get("area_id")))
+                if bucket is None:
                     continue
-                facilities = v.get("facilities") or []
-                if isinstance(facilities, str):
-                    facilities = [x.strip() for x in re.split(r"[;,/|]", facilities) if x.strip()]
-                chunk = Chunk(
-                    room_id=str(v.get("room_id", "")),
-                    room_name=str(v.get("room_name", "")),
-                    capacity=int(v.get("capacity", 0)) if v.get("capacity") not in (None, "") else 0,
-                    facilities=tuple(map(str, facilities)),
-                    area_id=str(v.get("area_id", "")),
-                    area_name=str(v.get("area_name", "")),
-                    start=int(v.get("start_index")),
-                    end=int(v.get("end_index")),
-                    start_time=v.get("start_time"),
-                    end_time=v.get("end_time"),
-                    source=fp.name
-                )
+                chunk = chunk_from_vector(v, fp.name)
                 if chunk.start < chunk.end:
-                    chunks.append(chunk)
+                    bucket.append(chunk)
             except Exception as e:
                 print(f"[skip] Invalid or missing vector fields: {fp.name} -> {e}")
                 continue
-    return chunks
+    return out
+
+def load_chunks_for_area(ready_dir: Path, area_id: str) -> List[Chunk]:
+    return load_chunks(ready_dir, [area_id])[str(area_id)]
+
+@dataclass
+class Snapshot:
+    """Chunks of the queried areas, loaded once (load_snapshot) and shared by any number of run() calls."""
+    label: str                                  # where the data came from, e.g. ready_data_17-10-2026/v3
+    chunks: Dict[str, List[Chunk]]
+    incomplete: Tuple[str, ...] = ()            # areas whose last fetch failed
+
+def load_snapshot(area_ids: List[str],
+                  ready_folder: Optional[str] = None,
+                  target_date: Optional[date] = None,
+                  store: Optional[str] = None) -> Snapshot:
+    """
+    Load the given areas from one pinned ready_data version (ready_folder, or the folder for target_date /
+    the latest one), or from the latest snapshot of target_date in the SQLite history store.
+    Raises FileNotFoundError when there is nothing to read.
+    """
+    ids = [str(a) for a in area_ids]
+    if store:
+        day = target_date or date.today()
+        path = Path(store)
+        if not path.exists():
+            raise FileNotFoundError(f"History store not found: {path} (run 4-raw2vector.py --store first)")
+        conn = history_store.connect(path)
+        try:
+            print(f"Reading history store: {path} ({day.isoformat()})")
+            chunks = {aid: [Chunk(*f) for f in history_store.area_fields(conn, day, aid)] for aid in ids}
+        finally:
+            conn.close()
+        return Snapshot(f"{path.name} ({day.isoformat()})", chunks)
+
+    base = Path(__file__).resolve().parent
+    ready_dir = Path(ready_folder).resolve() if ready_folder else find_latest_ready_folder(base, target_date)
+    # Pin the current version: a refresh publishing meanwhile cannot change or delete what we read
+    with versions.pin(ready_dir) as version_dir:
+        print(f"Reading ready dir: {version_dir}")
+        incomplete = tuple(checkpoint.incomplete_areas(str(version_dir)))
+        chunks = load_chunks(version_dir, ids)
+    label = ready_dir.name if version_dir == ready_dir else f"{ready_dir.name}/{version_dir.name}"
+    return Snapshot(label, chunks, incomplete)
 
 # =========================
 # Interval utils and filters
@@ -283,27 +360,63 @@ def run(area_id: str,
         forbid_area_name_contains: List[str],
         ready_folder: Optional[str],
         allow_three_changes: bool,
-        top_k_zero_change: int) -> Dict[str, Any]:
-
-    base = Path(__file__).resolve().parent
-    try:
-        ready_dir = Path(ready_folder).resolve() if ready_folder else find_latest_ready_folder(base)
-    except Exception as e:
-        print(f"[error] Locate ready_ dir failed: {e}")
-        summary = {"area_id": area_id, "ok": False, "err": str(e)}
-        print("SUMMARY " + json.dumps(summary, ensure_ascii=False))
-        return summary
-
-    print(f"Reading ready dir: {ready_dir}")
-
-    chunks_all = load_chunks_for_area(ready_dir, area_id)
+        top_k_zero_change: int,
+        target_date: Optional[date] = None,
+        store: Optional[str] = None,
+        snapshot: Optional[Snapshot] = None) -> Dict[str, Any]:
+    """
+    Plan one area and return its summary dict (the same one printed on the SUMMARY line).
+    Pass a preloaded snapshot to solve many areas from one load; otherwise this area is loaded here.
+    """
+    area_id = str(area_id)
+    if snapshot is None:
+        try:
+            snapshot = load_snapshot([area_id], ready_folder, target_date, store)
+        except Exception as e:
+            print(f"[error] Locate ready data failed: {e}")
+            summary = {"area_id": area_id, "ok": False, "err": str(e)}
+            print("SUMMARY " + json.dumps(summary, ensure_ascii=False))
+            return summary
+
+    if area_id in snapshot.incomplete:
+        print(f"[warn] {snapshot.label} is incomplete: the last fetch of area {area_id} failed, "
+              f"results may be missing or stale. Re-run 2-getdata.py --resume.")
+    chunks_all = snapshot.chunks.get(area_id)
     if not chunks_all:
-        msg = f"[end] No vectors found for area_id={area_id} in {ready_dir.name}."
+        msg = f"[end] No vectors found for area_id={area_id} in {snapshot.label}."
         print(msg)
         summary = {"area_id": area_id, "ok": False, "message": msg}
         print("SUMMARY " + json.dumps(summary, ensure_ascii=False))
         return summary
 
+    return solve(chunks_all, area_id, time_start, time_end, required_facilities, forbidden_facilities,
+                 require_area_name_contains, forbid_area_name_contains, allow_three_changes, top_k_zero_change)
+
+def chunk_to_seg(c: Chunk) -> Dict[str, Any]:
+    return {
+        "room_id": c.room_id,
+        "room_name": c.room_name,
+        "capacity": c.capacity,
+        "area_id": c.area_id,
+        "area_name": c.area_name,
+        "start": c.start,
+        "end": c.end,
+        "start_time": c.start_time,
+        "end_time": c.end_time,
+        "source": c.source,
+    }
+
+def solve(chunks_all: List[Chunk],
+          area_id: str,
+          time_start: int,
+          time_end: int,
+          required_facilities: List[str],
+          forbidden_facilities: List[str],
+          require_area_name_contains: List[str],
+          forbid_area_name_contains: List[str],
+          allow_three_changes: bool,
+          top_k_zero_change: int) -> Dict[str, Any]:
+    """Filter and solve one area's chunks already in memory (run() after loading; pipeline.py directly)."""
     # Filters
     chunks = filter_by_facilities(chunks_all, required_facilities, forbidden_facilities)
     if require_area_name_contains or forbid_area_name_contains:
@@ -321,20 +434,6 @@ def run(area_id: str,
     pruned = prune_dominated(chunks)
     print(f"After removing dominated intervals: {len(pruned)} (from {len(chunks)})")
 
-    def chunk_to_seg(c: Chunk) -> Dict[str, Any]:
-        return {
-            "room_id": c.room_id,
-            "room_name": c.room_name,
-            "capacity": c.capacity,
-            "area_id": c.area_id,
-            "area_name": c.area_name,
-            "start": c.start,
-            "end": c.end,
-            "start_time": c.start_time,
-            "end_time": c.end_time,
-            "source": c.source,
-        }
-
     # 0-change
     zc = zero_change(pruned, time_start, time_end)
     if zc:
@@ -425,7 +524,12 @@ def parse_args() -> argparse.Namespace:
     ap.add_argument("--forbidden-facilities", default="", help="Forbidden facilities, separated by ';'")
     ap.add_argument("--require-area-names", default="", help="Area name must contain (ALL), separated by ';'")
     ap.add_argument("--forbid-area-names", default="", help="Area name must NOT contain (ANY), separated by ';'")
-    ap.add_argument("--ready-folder", default="", help="ready_data folder path (leave empty to auto-find latest)")
+    ap.add_argument("--ready-folder", default="", help="ready_data folder path, or a data_ folder in the compact slots format (leave empty to auto-find latest)")
+    ap.add_argument("--date", type=date.fromisoformat, default=None,
+                    help="Plan for this date (YYYY-MM-DD) using its prefetched ready_data folder")
+    ap.add_argument("--store", default="",
+                    help="Answer from this SQLite history store (see history_store.py) instead of ready_data folders; "
+                         "uses the latest snapshot of --date (default today)")
     ap.add_argument("--allow-three-changes", action="store_true", help="Allow 3 changes (4 segments)")
     ap.add_argument("--top-k-zero-change", type=int, default=50, help="How many 0-change rows to show at most")
     return ap.parse_args()
@@ -448,7 +552,9 @@ def main():
         forbid_area_name_contains=forb_area,
         ready_folder=ready,
         allow_three_changes=bool(args.allow_three_changes),
-        top_k_zero_change=int(args.top_k_zero_change)
+        top_k_zero_change=int(args.top_k_zero_change),
+        target_date=args.date,
+        store=args.store.strip() or None
     )
 
 if __name__ == "__main__":
@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+合成的 MRBS 日视图/周视图页面，结构与真实页面一致（table#day_main / table#week_main、
+data-room 表头、capacity、title 中的设施、new/booked 单元格及 rowspan/colspan），
+用于离线测试和基准测试，不含任何真实数据。
+
+build_day_page 同时返回标准答案（每个房间的日程和空闲区间），bench_pipeline.py 用它
+核对 3/4 阶段的结果；房间数、时段长度、一天的起止、预订密度、rowspan 长度和设施列表都可调，
+odd_layout 会混入不常见的写法（无容量、实体字符、空白、无链接的预订等）。
+"""
+
+from __future__ import annotations
+import html as html_lib
+import random
+from datetime import date, timedelta
+from typing import Dict, List, Tuple
+
+FACILITY_POOL = [
+    "Online meeting available",
+    "86 inch MAXHUB",
+    "Projector",
+    "Whiteboard",
+    "Video conference",
+    "Wheelchair accessible",
+]
+
+def slot_labels(day_start: int = 8 * 60, day_end: int = 22 * 60, slot_minutes: int = 30) -> List[str]:
+    return [f"{m // 60:02d}:{m % 60:02d}" for m in range(day_start, day_end, slot_minutes)]
+
+def area_select_html(area_names: Dict[str, str], selected: str) -> str:
+    opts = []
+    for aid, name in area_names.items():
+        sel = ' selected="selected"' if aid == selected else ''
+        opts.append(f'<option value="{aid}"{sel}>{html_lib.escape(name)}</option>')
+    return '<form id="areaChangeForm"><select name="area">' + "".join(opts) + '</select></form>'
+
+def make_rooms(area_id: str, n_rooms: int, rnd: random.Random, facility_pool: List[str] = FACILITY_POOL,
+               max_facilities: int = 3, odd_layout: bool = False) -> List[dict]:
+    """
+    odd_layout 时另用独立的随机数生成不常见的写法（不影响默认页面的内容）：
+    没有 capacity 的房间、名称里带 &、< 和多余空白、容量数字也出现在名称里。
+    """
+    rooms = []
+    odd = random.Random(f"odd:{area_id}") if odd_layout else None
+    for r in range(n_rooms):
+        facilities = rnd.sample(facility_pool, rnd.randint(0, min(max_facilities, len(facility_pool))))
+        room = {
+            "room_id": str(int(area_id) * 1000 + r),
+            "room_name": f"A{area_id}-{r + 1:03d}",
+            "capacity": rnd.choice([4, 6, 8, 12, 20, 40, 60]),
+            "facilities": ", ".join(facilities),
+            "name_html": None,
+        }
+        if odd is not None:
+            kind = odd.randrange(5)
+            if kind == 0:
+                room["capacity"] = None
+            elif kind == 1:
+                room["room_name"] = f"R&D <Lab> {r + 1}"
+            elif kind == 2:
+                room["name_html"] = f"\n  A{area_id}-{r + 1:03d}\n  "
+            elif kind == 3:
+                room["room_name"] = f"Room {room['capacity']}{r}"
+        rooms.append(room)
+    return rooms
+
+def _room_th(room: dict) -> str:
+    title = html_lib.escape("View Week\n" + room["facilities"], quote=True)
+    name = room.get("name_html") or html_lib.escape(room["room_name"])
+    cap = f'<span class="capacity">{room["capacity"]}</span>' if room["capacity"] is not None else ''
+    return (f'<th data-room="{room["room_id"]}"><a href="week.php?room={room["room_id"]}" title="{title}">'
+            f'{name}{cap}</a></th>')
+
+def random_bookings(n_slots: int, rnd: random.Random, density: float = 0.35, max_span: int = 4) -> List[tuple]:
+    """返回 [(起始格, 长度, 名称), ...]，互不重叠，按起始格排序。"""
+    out = []
+    i = 0
+    while i < n_slots:
+        if rnd.random() < density:
+            span = min(n_slots - i, rnd.randint(1, max_span))
+            out.append((i, span, f"Booking {rnd.randint(1000, 9999)}"))
+            i += span
+        else:
+            i += 1
+    return out
+
+def room_bookings(seed: int, area_id: str, room: dict, d: date, version: int,
+                  n_slots: int, density: float, max_span: int) -> List[tuple]:
+    """同一 (房间, 日期, 版本) 在日视图和周视图中得到相同的预订。"""
+    brnd = random.Random(f"{seed}:{area_id}:{d.isoformat()}:{version}:{room['room_id']}")
+    return random_bookings(n_slots, brnd, density, max_span)
+
+def _odd_booking_cell(name: str, span: int, rnd: random.Random) -> tuple:
+    """odd_layout 下的预订单元格：返回 (HTML, 解析后应得到的名称)。"""
+    rs = f' rowspan="{span}"' if span > 1 else ''
+    kind = rnd.randrange(5)
+    if kind == 0:
+        return f'<td class="booked"{rs}><div class="booking"><a href="view_entry.php"></a></div></td>', "Booked"
+    if kind == 1:
+        return f'<td class="booked"{rs}><div class="booking">{name}</div></td>', "Booked"
+    if kind == 2:
+        return (f'<td class="private booked"{rs}><!-- entry --><a href="view_entry.php">'
+                f'{html_lib.escape(name + " & Co <x>")}</a></td>'), name + " & Co <x>"
+    if kind == 3:
+        return f'<td class="booked"{rs}><a href="view_entry.php">\n  {name}\n</a></td>', name
+    return f'<td class="booked"{rs}><div class="booking"><a href="view_entry.php">{name}</a></div></td>', name
+
+def build_day_page(area_id: str, area_names: Dict[str, str], page_date: date, n_rooms: int = 12,
+                   seed: int = 0, version: int = 0, slot_minutes: int = 30,
+                   density: float = 0.35, max_span: int = 4, day_start: int = 8 * 60, day_end: int = 22 * 60,
+                   facility_pool: List[str] = FACILITY_POOL, max_facilities: int = 3,
+                   odd_layout: bool = False) -> Tuple[str, List[dict]]:
+    """
+    返回 (页面 HTML, 标准答案)。标准答案与 parse_html_to_schedule 的输出同构：
+    每个房间的 room_id/room_name/capacity/facilities/area_id/area_name/schedule，
+    另加 free：空闲区间列表 [(start_index, end_index)]，1 起、半开，与 4-raw2vector 的向量对应。
+    day_start/day_end 为从 0 点起的分钟数。
+    """
+    rnd = random.Random(f"{seed}:{area_id}")
+    rooms = make_rooms(area_id, n_rooms, rnd, facility_pool, max_facilities, odd_layout)
+    times = slot_labels(day_start, day_end, slot_minutes)
+    odd = random.Random(f"odd:{seed}:{area_id}:{page_date}:{version}") if odd_layout else None
+    area_name = area_names.get(area_id, "未知区域")
+    starts = []
+    truth = []
+    for room in rooms:
+        bookings = room_bookings(seed, area_id, room, page_date, version, len(times), density, max_span)
+        starts.append({s: (span, name) for s, span, name in bookings})
+        truth.append({"room_id": room["room_id"], "room_name": room["room_name"], "capacity": room["capacity"],
+                      "facilities": room["facilities"], "area_id": area_id, "area_name": area_name,
+                      "schedule": {t: "Available" for t in times}, "free": []})
+
+    h = ['<!DOCTYPE html><html><head><title>MRBS</title></head><body>',
+         area_select_html(area_names, area_id),
+         '<table class="dwm_main" id="day_main"><thead><tr><th class="first_last">Time</th>']
+    h.extend(_room_th(room) for room in rooms)
+    h.append('</tr></thead><tbody>')
+    covered = [0] * len(rooms)
+    for i, t in enumerate(times):
+        label = f'\n  {t} ' if odd is not None and odd.random() < 0.2 else t
+        h.append(f'<tr><th data-seconds="{i}"><a href="#">{label}</a></th>')
+        for r in range(len(rooms)):
+            if covered[r] > 0:
+                covered[r] -= 1
+                continue
+            booking = starts[r].get(i)
+            if booking:
+                span, name = booking
+                if odd is not None:
+                    cell, name = _odd_booking_cell(name, span, odd)
+                    h.append(cell)
+                else:
+                    rs = f' rowspan="{span}"' if span > 1 else ''
+                    h.append(f'<td class="booked"{rs}><div class="booking"><a href="view_entry.php">{name}</a></div></td>')
+                for j in range(i, i + span):
+                    truth[r]["schedule"][times[j]] = name
+                covered[r] = span - 1
+            else:
+                h.append('<td class="new"><a href="edit_entry.php"></a></td>')
+        h.append('</tr>')
+    h.append('</tbody></table></body></html>')
+
+    for room in truth:
+        free, run = [], None
+        for i, t in enumerate(times):
+            if room["schedule"][t] == "Available":
+                run = i if run is None else run
+            elif run is not None:
+                free.append((run + 1, i + 1))
+                run = None
+        if run is not None:
+            free.append((run + 1, len(times) + 1))
+        room["free"] = free
+    return "\n".join(h), truth
+
+def make_day_page(area_id: str, area_names: Dict[str, str], page_date: date, n_rooms: int = 12,
+                  seed: int = 0, version: int = 0, slot_minutes: int = 30,
+                  density: float = 0.35, max_span: int = 4, **options) -> str:
+    return build_day_page(area_id, area_names, page_date, n_rooms, seed, version, slot_minutes,
+                          density, max_span, **options)[0]
+
+def make_week_page(area_id: str, area_names: Dict[str, str], page_date: date, n_rooms: int = 12,
+                   seed: int = 0, version: int = 0, slot_minutes: int = 30,
+                   density: float = 0.35, max_span: int = 4) -> str:
+    """以周一为一周开始，覆盖 page_date 所在的 7 天。"""
+    rnd = random.Random(f"{seed}:{area_id}")
+    rooms = make_rooms(area_id, n_rooms, rnd)
+    times = slot_labels(slot_minutes=slot_minutes)
+    monday = page_date - timedelta(days=page_date.weekday())
+    days = [monday + timedelta(days=i) for i in range(7)]
+
+    h = ['<!DOCTYPE html><html><head><title>MRBS</title></head><body>',
+         area_select_html(area_names, area_id),
+         '<table class="dwm_main" id="week_main"><thead><tr><th class="first_last" rowspan="2">Room</th>']
+    for d in days:
+        h.append(f'<th colspan="{len(times)}" data-date="{d.isoformat()}">'
+                 f'<a href="index.php?view=day&amp;page_date={d.isoformat()}">{d.strftime("%a %d %b")}</a></th>')
+    h.append('</tr><tr>')
+    h.extend(f'<th>{t}</th>' for _ in days for t in times)
+    h.append('</tr></thead><tbody>')
+    for room in rooms:
+        h.append('<tr>' + _room_th(room))
+        for d in days:
+            cur = 0
+            for s, span, name in room_bookings(seed, area_id, room, d, version, len(times), density, max_span):
+                h.extend('<td class="new"></td>' for _ in range(s - cur))
+                h.append(f'<td class="booked" colspan="{span}"><a href="view_entry.php">{name}</a></td>')
+                cur = s + span
+            h.extend('<td class="new"></td>' for _ in range(len(times) - cur))
+        h.append('</tr>')
+    h.append('</tbody></table></body></html>')
+    return "\n".join(h)
@@ -0,0 +1,33 @@
+# -*- coding: utf-8 -*-
+
+"""
+测试共用的合成日视图页面。programme/ 下的模块按脚本方式互相导入，这里把它加进 sys.path。
+"""
+
+import sys
+from datetime import date, timedelta
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import synth_pages  # noqa: E402
+
+N_AREAS = 4
+N_ROOMS = 15
+N_DAYS = 3
+
+@pytest.fixture(params=[(False, 30), (True, 30), (True, 15)], ids=["plain", "odd", "odd-15min"])
+def day_pages(request):
+    """[(area_id, html, 标准答案)] 和 area_map；odd 混入 --odd-layout 的各种写法（含缺时段的房间）。"""
+    odd_layout, slot_minutes = request.param
+    area_map = {str(i): f"Area {i}" for i in range(1, N_AREAS + 1)}
+    pages = []
+    for k in range(N_DAYS):
+        d = date(2024, 3, 4) + timedelta(days=k)
+        for aid in area_map:
+            html, truth = synth_pages.build_day_page(aid, area_map, d, n_rooms=N_ROOMS, seed=k,
+                                                     slot_minutes=slot_minutes, odd_layout=odd_layout)
+            pages.append((aid, html, truth))
+    return pages, area_map
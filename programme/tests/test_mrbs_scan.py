@@ -0,0 +1,36 @@
+# -*- coding: utf-8 -*-
+
+"""快速扫描器 mrbs_scan 与参照实现 mrbs_pages.parse_html_to_schedule 的一致性。"""
+
+import pytest
+
+pytest.importorskip("bs4")
+
+import mrbs_scan  # noqa: E402
+from mrbs_pages import parse_html_to_schedule  # noqa: E402
+
+def test_parse_day_main_matches_reference(day_pages):
+    pages, area_map = day_pages
+    for aid, html, _ in pages:
+        assert mrbs_scan.parse_day_main(html, aid, area_map) == parse_html_to_schedule(html, aid, area_map)
+
+def test_parse_day_main_matches_ground_truth(day_pages):
+    pages, area_map = day_pages
+    for aid, html, truth in pages:
+        expected = [{k: v for k, v in room.items() if k != "free"} for room in truth]
+        assert mrbs_scan.parse_day_main(html, aid, area_map) == expected
+
+def test_parse_day_slots_matches_parse_day_main(day_pages):
+    pages, area_map = day_pages
+    for aid, html, _ in pages:
+        area = mrbs_scan.parse_day_slots(html, aid, area_map)
+        assert area.to_rooms() == mrbs_scan.parse_day_main(html, aid, area_map)
+
+@pytest.mark.parametrize("html", [
+    "",
+    "<html><body><p>SSO login</p></body></html>",
+    '<table id="week_main"><thead><tr><th>Time</th></tr></thead></table>',
+])
+def test_no_day_main(html):
+    assert mrbs_scan.parse_day_main(html, "1", {}) is None
+    assert parse_html_to_schedule(html, "1", {}) is None
@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+
+"""vectorize_np 与参照实现 vectorize.compress_available / rooms_to_vectors 的一致性。"""
+
+import json
+
+import pytest
+
+pytest.importorskip("numpy")
+
+import slots  # noqa: E402
+import vectorize  # noqa: E402
+import vectorize_np  # noqa: E402
+from mrbs_pages import day_slots_parser, parse_html_to_schedule  # noqa: E402
+
+@pytest.fixture
+def areas(day_pages):
+    pages, area_map = day_pages
+    parse = day_slots_parser("fast")
+    return [parse(html, aid, area_map) for aid, html, _ in pages]
+
+def test_area_intervals_match_compress_available(areas):
+    for area, rooms in zip(areas, vectorize_np.area_intervals(areas)):
+        for room, (intervals, times, slot_minutes) in zip(area.to_rooms(), rooms):
+            ref_intervals, ref_times, ref_minutes = vectorize.compress_available(room["schedule"])
+            assert [tuple(x) for x in intervals] == [tuple(x) for x in ref_intervals]
+            assert list(times) == list(ref_times)
+            assert slot_minutes == ref_minutes
+
+def test_area_intervals_match_ground_truth(areas, day_pages):
+    pages, _ = day_pages
+    for (_, _, truth), rooms in zip(pages, vectorize_np.area_intervals(areas)):
+        assert [[tuple(x) for x in intervals] for intervals, _, _ in rooms] == [room["free"] for room in truth]
+
+@pytest.mark.parametrize("out_format", ["json", "text"])
+def test_areas_to_vectors_match_reference(areas, out_format):
+    expected = [vectorize.rooms_to_vectors(area.to_rooms(), out_format) for area in areas]
+    assert vectorize_np.areas_to_vectors(areas, out_format) == expected
+
+def test_rooms_with_missing_slots(areas):
+    # 合成页面里每个房间时段齐全；去掉部分房间的几个时刻，走 ABSENT 的退回路径
+    rooms = areas[0].to_rooms()
+    for room in rooms[::3]:
+        times = sorted(room["schedule"])
+        for t in times[:2] + times[len(times) // 2:len(times) // 2 + 1]:
+            del room["schedule"][t]
+    area = slots.from_rooms(rooms)
+    assert any(slots.ABSENT in r.codes for r in area.rooms)
+    for room, (intervals, times, slot_minutes) in zip(rooms, vectorize_np.area_intervals([area])[0]):
+        assert ([tuple(x) for x in intervals], list(times), slot_minutes) == vectorize.compress_available(room["schedule"])
+    assert vectorize_np.areas_to_vectors([area]) == [vectorize.rooms_to_vectors(rooms)]
+
+def test_batch_to_vectors_match_data_to_vectors(areas, day_pages):
+    # 一批 data_ 文件：紧凑形式与房间列表形式混在一起，经过一次 JSON 往返
+    pages, area_map = day_pages
+    datas = [a.to_json() for a in areas]
+    datas += [parse_html_to_schedule(html, aid, area_map) for aid, html, _ in pages[:3]]
+    datas = json.loads(json.dumps(datas))
+    assert vectorize_np.batch_to_vectors(datas) == [vectorize.data_to_vectors(d) for d in datas]
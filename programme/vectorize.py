@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+空闲区间压缩：把每个房间的 {时刻: 预订名} 日程压缩成半开区间 [start_index, end_index)
+的可用向量。4-raw2vector.py 和 2-getdata.py 的流式模式共用这里的实现。
+
+输入可以是房间字典列表（rooms_to_vectors，经 compress_available），也可以是紧凑的
+slots.AreaSlots（slots_to_vectors，直接在空闲位图上取区间），两者产出的向量完全相同。
+"""
+
+import hashlib
+import json
+import os
+import re
+from typing import Any, Dict
+
+import slots
+from pathlib import Path
+from datetime import datetime, timedelta
+
+# 压缩规则版本，写进 4 阶段的构建清单；向量内容会因此变化时加一
+VECTOR_VERSION = 1
+
+def normalize_facilities_to_list(fac):
+    if fac is None:
+        return []
+    if isinstance(fac, list):
+        return [str(x).strip() for x in fac if str(x).strip()]
+    if isinstance(fac, str):
+        parts = re.split(r"[;,/|]", fac)
+        return [p.strip() for p in parts if p.strip()]
+    return [str(fac).strip()]
+
+def times_to_sorted_list(schedule: dict):
+    def to_minutes(hhmm: str) -> int:
+        m = re.fullmatch(r"(\d{2}):(\d{2})", hhmm)
+        if not m:
+            raise ValueError(f"非法时间格式: {hhmm}")
+        h, mnt = int(m.group(1)), int(m.group(2))
+        return h * 60 + mnt
+
+    times = list(schedule.keys())
+    times.sort(key=to_minutes)
+    return times
+
+def guess_slot_minutes(times_sorted):
+    def to_minutes(hhmm: str) -> int:
+        h, m = map(int, hhmm.split(":"))
+        return h*60 + m
+    if len(times_sorted) < 2:
+        return 30
+    mins = [to_minutes(t) for t in times_sorted]
+    diffs = [b - a for a, b in zip(mins, mins[1:]) if b > a]
+    return min(diffs) if diffs else 30
+
+def add_minutes_str(hhmm: str, minutes: int) -> str:
+    h, m = map(int, hhmm.split(":"))
+    dt = datetime(2000, 1, 1, h, m) + timedelta(minutes=minutes)
+    return dt.strftime("%H:%M")
+
+def compress_available(schedule: dict, available_tokens=("available",)):
+    times_sorted = times_to_sorted_list(schedule)
+    slot_minutes = guess_slot_minutes(times_sorted)
+    lower = {t: str(schedule[t]).strip().lower() for t in times_sorted}
+    avail_set = set(s.lower() for s in available_tokens)
+
+    intervals = []
+    start = None
+    for idx, t in enumerate(times_sorted, start=1):
+        is_avail = lower[t] in avail_set
+        if is_avail and start is None:
+            start = idx
+        elif (not is_avail) and (start is not None):
+            intervals.append((start, idx))
+            start = None
+    if start is not None:
+        intervals.append((start, len(times_sorted) + 1))
+    return intervals, times_sorted, slot_minutes
+
+def iter_room_records(data):
+    if isinstance(data, dict):
+        if "room_id" in data and "schedule" in data:
+            yield data
+        elif "rooms" in data and isinstance(data["rooms"], list):
+            for r in data["rooms"]:
+                if isinstance(r, dict) and "room_id" in r and "schedule" in r:
+                    yield r
+    elif isinstance(data, list):
+        for r in data:
+            if isinstance(r, dict) and "room_id" in r and "schedule" in r:
+                yield r
+
+def to_int_if_numeric(x):
+    try:
+        if isinstance(x, (int, float)):
+            return int(x)
+        s = str(x)
+        if s.isdigit():
+            return int(s)
+    except Exception:
+        pass
+    return x
+
+def make_vector_json(room, facilities_list, start, end, times_sorted, slot_minutes):
+    rid = room.get("room_id", "")
+    rname = room.get("room_name", "")
+    cap = to_int_if_numeric(room.get("capacity", ""))
+    aid = room.get("area_id", "")
+    aname = room.get("area_name", "")
+
+    start_time = times_sorted[start - 1] if 1 <= start <= len(times_sorted) else None
+    if end <= len(times_sorted):
+        end_time = times_sorted[end - 1]  # 半开区间右端点的起始时刻
+    else:
+        end_time = add_minutes_str(times_sorted[-1], slot_minutes)
+
+    return {
+        "room_id": rid,
+        "room_name": rname,
+        "capacity": cap,
+        "facilities": facilities_list,
+        "area_id": aid,
+        "area_name": aname,
+        "start_index": start,
+        "end_index": end,         # 半开区间 [start, end)
+        "start_time": start_time, # 便于人读；下游可忽略
+        "end_time": end_time
+    }
+
+def make_facilities_braced_str(items):
+    items = [str(x).strip() for x in items if str(x).strip()]
+    return "{" + ", ".join(items) + "}"
+
+def make_vector_text(room, facilities_list, start, end):
+    rid = room.get("room_id", "")
+    rname = room.get("room_name", "")
+    cap = room.get("capacity", "")
+    aid = room.get("area_id", "")
+    aname = room.get("area_name", "")
+    fac_str = make_facilities_braced_str(facilities_list)
+    return f"{{{rid}, {rname}, {cap}, {fac_str}, {aid}, {aname}, {start}, {end}}}"
+
+def rooms_to_vectors(rooms, out_format: str = "json"):
+    """把 parse_html_to_schedule 产出的房间列表压缩成输出向量。"""
+    outputs = []
+    for room in rooms:
+        schedule = room.get("schedule")
+        if not isinstance(schedule, dict) or not schedule:
+            continue
+        facilities_list = normalize_facilities_to_list(room.get("facilities"))
+        intervals, times_sorted, slot_minutes = compress_available(schedule)
+        for s, e in intervals:
+            if out_format == "json":
+                outputs.append(
+                    make_vector_json(room, facilities_list, s, e, times_sorted, slot_minutes)
+                )
+            else:
+                outputs.append(
+                    make_vector_text(room, facilities_list, s, e)
+                )
+    return outputs
+
+def slots_to_vectors(area: "slots.AreaSlots", out_format: str = "json"):
+    """紧凑形式的区域日程 -> 输出向量，与对 area.to_rooms() 调用 rooms_to_vectors 的结果相同。"""
+    outputs = []
+    for room in area.rooms:
+        intervals, times_sorted, slot_minutes = area.room_intervals(room)
+        if not intervals:
+            continue
+        facilities_list = normalize_facilities_to_list(room.get("facilities"))
+        for s, e in intervals:
+            if out_format == "json":
+                outputs.append(make_vector_json(room, facilities_list, s, e, times_sorted, slot_minutes))
+            else:
+                outputs.append(make_vector_text(room, facilities_list, s, e))
+    return outputs
+
+def vector_fields(v: Dict[str, Any]) -> tuple:
+    """
+    一条向量 -> (room_id, room_name, capacity, facilities, area_id, area_name, start, end,
+    start_time, end_time)，即 sub.Chunk 除 source 外的字段（sub.py、快照和房间目录共用同一套转换规则）。
+    """
+    facilities = v.get("facilities") or []
+    if isinstance(facilities, str):
+        facilities = [x.strip() for x in re.split(r"[;,/|]", facilities) if x.strip()]
+    return (str(v.get("room_id", "")),
+            str(v.get("room_name", "")),
+            int(v.get("capacity", 0)) if v.get("capacity") not in (None, "") else 0,
+            tuple(map(str, facilities)),
+            str(v.get("area_id", "")),
+            str(v.get("area_name", "")),
+            int(v.get("start_index")),
+            int(v.get("end_index")),
+            v.get("start_time"),
+            v.get("end_time"))
+
+def data_to_vectors(data, out_format: str = "json"):
+    """data_ 目录中的一个文件（紧凑形式或房间列表）-> 输出向量。"""
+    if slots.is_slots_data(data):
+        return slots_to_vectors(slots.AreaSlots.from_json(data), out_format)
+    return rooms_to_vectors(iter_room_records(data), out_format)
+
+def write_vectors(out_path: Path, outputs, out_format: str = "json") -> str:
+    """
+    先写临时文件再替换，后台刷新时正在读取的 sub.py 不会读到写了一半的文件。
+    返回写出内容的 sha256（构建清单用）。
+    """
+    out_path = Path(out_path)
+    tmp = out_path.with_name(out_path.name + f".{os.getpid()}.tmp")
+    if out_format == "json":
+        text = json.dumps({"vectors": outputs}, ensure_ascii=False, indent=2)
+    else:
+        # vector 文本行（注意：文件扩展名仍为 .json，但内容不是 JSON）
+        text = "".join(line + "\n" for line in outputs)
+    data = text.encode("utf-8")
+    with tmp.open("wb") as f:
+        f.write(data)
+    os.replace(tmp, out_path)
+    return hashlib.sha256(data).hexdigest()
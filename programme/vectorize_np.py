@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+用 NumPy 一次压缩多个区域的空闲区间。
+
+vectorize.slots_to_vectors 逐个房间在空闲位图上找连续段；这里把一批区域（一个 data_ 目录里
+的全部区域，或多天合在一起）的编码数组拼成 房间 × 时段 的矩阵，用一次 diff / nonzero
+找出所有房间的空闲段，再按房间顺序生成向量。结果与 slots_to_vectors 以及对房间字典调用
+compress_available 完全相同，后两者保留作为参照实现（核对见 bench_compress.py）。
+
+  - 各区域的时段轴长度不同，矩阵按最长的补齐，补齐部分不算空闲；
+  - 缺时段（编码 -1）的房间按自己的时刻编号，这类房间很少，退回 AreaSlots.room_intervals。
+
+NumPy 是可选依赖：未安装时 AVAILABLE 为 False，areas_to_vectors 退回逐房间的实现。
+"""
+
+from __future__ import annotations
+from typing import List, Optional, Sequence, Tuple
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+import slots
+from vectorize import (add_minutes_str, data_to_vectors, iter_room_records, make_vector_text,
+                       normalize_facilities_to_list, slots_to_vectors, to_int_if_numeric)
+
+AVAILABLE = np is not None
+PAD = -2                     # 补齐用的编码，既不是空闲也不是缺时段
+
+def code_matrix(areas: Sequence[slots.AreaSlots]):
+    """返回 (编码矩阵 int16 [房间总数, 最长时段数], 每个区域在矩阵中的起始行)。"""
+    width = max((len(a.slots) for a in areas), default=0)
+    offsets, total = [], 0
+    for a in areas:
+        offsets.append(total)
+        total += len(a.rooms)
+    mat = np.full((total, width), PAD, dtype=np.int16)
+    for a, row in zip(areas, offsets):
+        n, w = len(a.rooms), len(a.slots)
+        if n and w:
+            block = b"".join(r.codes.tobytes() for r in a.rooms)
+            mat[row:row + n, :w] = np.frombuffer(block, dtype=np.int16).reshape(n, w)
+    return mat, offsets
+
+def free_runs(avail) -> Tuple["np.ndarray", "np.ndarray", "np.ndarray"]:
+    """
+    布尔矩阵每一行中连续为 True 的段。返回 (行号, 起, 止)，起止为 1 起的半开区间，
+    按行、再按起点排序。
+    """
+    rows, width = avail.shape
+    padded = np.zeros((rows, width + 2), dtype=np.int8)
+    padded[:, 1:-1] = avail
+    step = np.diff(padded, axis=1)
+    run_rows, starts = np.nonzero(step == 1)
+    _, ends = np.nonzero(step == -1)
+    return run_rows, starts + 1, ends + 1
+
+def area_intervals(areas: Sequence[slots.AreaSlots]) -> List[List[Tuple[list, list, int]]]:
+    """
+    每个区域、每个房间的 (区间列表, 时刻列表, 时段分钟数)，与 AreaSlots.room_intervals 相同。
+    """
+    mat, offsets = code_matrix(areas)
+    run_rows, starts, ends = free_runs(mat == slots.AVAILABLE)
+    has_absent = (mat == slots.ABSENT).any(axis=1).tolist()
+    bounds = np.searchsorted(run_rows, np.arange(mat.shape[0] + 1)).tolist()
+    starts, ends = starts.tolist(), ends.tolist()
+    out = []
+    for a, row0 in zip(areas, offsets):
+        rooms = []
+        for i, room in enumerate(a.rooms):
+            row = row0 + i
+            if has_absent[row]:
+                rooms.append(a.room_intervals(room))
+                continue
+            lo, hi = bounds[row], bounds[row + 1]
+            rooms.append((list(zip(starts[lo:hi], ends[lo:hi])), a.slots, a.slot_minutes))
+        out.append(rooms)
+    return out
+
+def _vector_json(base: dict, start: int, end: int, labels: List[str]) -> dict:
+    vec = dict(base)
+    vec["start_index"] = start
+    vec["end_index"] = end         # 半开区间 [start, end)
+    vec["start_time"] = labels[start - 1]
+    vec["end_time"] = labels[end - 1]
+    return vec
+
+def areas_to_vectors(areas: Sequence[slots.AreaSlots], out_format: str = "json") -> List[list]:
+    """每个区域的输出向量，与对各区域调用 vectorize.slots_to_vectors 的结果相同。"""
+    if not AVAILABLE:
+        return [slots_to_vectors(a, out_format) for a in areas]
+    out = []
+    for area, rooms in zip(areas, area_intervals(areas)):
+        outputs = []
+        for room, (intervals, times, slot_minutes) in zip(area.rooms, rooms):
+            if not intervals:
+                continue
+            facilities_list = normalize_facilities_to_list(room.get("facilities"))
+            if out_format != "json":
+                outputs.extend(make_vector_text(room, facilities_list, s, e) for s, e in intervals)
+                continue
+            # 与 make_vector_json 相同的键顺序；时刻标签预先算好，末尾多一个“最后时段 + 时长”
+            base = {"room_id": room.get("room_id", ""), "room_name": room.get("room_name", ""),
+                    "capacity": to_int_if_numeric(room.get("capacity", "")), "facilities": facilities_list,
+                    "area_id": room.get("area_id", ""), "area_name": room.get("area_name", "")}
+            labels = list(times) + [add_minutes_str(times[-1], slot_minutes)]
+            outputs.extend(_vector_json(base, s, e, labels) for s, e in intervals)
+        out.append(outputs)
+    return out
+
+def to_area_slots(data) -> Optional[slots.AreaSlots]:
+    """
+    data_ 文件内容 -> AreaSlots。房间列表只有在每个房间都带齐字段、schedule 为字典时才转换
+    （否则缺省值与 make_vector_json 不同），不能无损转换时返回 None。
+    """
+    if slots.is_slots_data(data):
+        return slots.AreaSlots.from_json(data)
+    rooms = list(iter_room_records(data))
+    if not all(isinstance(r.get("schedule"), dict) and all(k in r for k in slots.ROOM_KEYS) for r in rooms):
+        return None
+    return slots.from_rooms(rooms)
+
+def batch_to_vectors(datas: Sequence, out_format: str = "json") -> List[list]:
+    """一批 data_ 文件内容 -> 各自的输出向量；能转成 AreaSlots 的合在一起压缩，其余逐个处理。"""
+    converted = [to_area_slots(d) for d in datas]
+    batch = [a for a in converted if a is not None]
+    done = iter(areas_to_vectors(batch, out_format))
+    return [next(done) if a is not None else data_to_vectors(d, out_format) for d, a in zip(datas, converted)]
@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+ready_data_ 目录的版本化发布：写入方在暂存目录里生成完整的新版本，再用一次原子替换切换指针，
+读取方固定（pin）一个版本读到底，旧版本只在没有读取方持有时才删除。
+
+  ready_data_17-10-2026/
+    _current.json        指针：{"version": "v4", "published_at": ..., "retired": {"v3": 退役时间}}
+    v3/ v4/              已发布的版本，发布后不再改动
+    _staging-<pid>-xxxx/ 正在生成的版本（先复制当前版本，增量更新后整体发布）
+    _readers/            读取方的租约文件 <版本>.<pid>.<随机串>
+
+发布（Staging.publish）在 _publish.lock 下进行：若暂存期间别的写入方已发布了新版本，先把对方
+更新、而本次没有改动的区域合并进来（按 _refresh.json 的记录判断），避免互相覆盖；内容与当前版本
+完全相同时不产生新版本。指针文件用临时文件 + os.replace 写入，读取方要么看到旧版本、要么看到新版本。
+
+退役超过 GRACE_SECONDS 且没有有效租约的版本由 gc 删除；租约超过 LEASE_SECONDS 未更新视为
+读取方已异常退出。没有 _current.json 的目录（旧版本生成的、或 data_ 目录）按原样直接读取，
+第一次发布时把其中的文件作为起点复制进新版本。
+"""
+
+from __future__ import annotations
+import contextlib
+import filecmp
+import json
+import os
+import re
+import shutil
+import time
+import uuid
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional
+
+import refresh
+
+POINTER = "_current.json"
+LOCK = "_publish.lock"
+READERS = "_readers"
+STAGING_PREFIX = "_staging-"
+GRACE_SECONDS = 60               # 退役后至少保留这么久，覆盖读指针与建租约之间的间隙
+LEASE_SECONDS = 600
+STALE_STAGING_SECONDS = 3600
+LOCK_TIMEOUT = 30.0
+_VERSION_RE = re.compile(r"v(\d+)")
+_RESERVED = {POINTER, LOCK}
+
+def is_version_name(name: str) -> bool:
+    return _VERSION_RE.fullmatch(name) is not None
+
+def root_of(path: Path) -> Path:
+    """版本目录或暂存目录 -> 所属的日期目录；其他目录原样返回。"""
+    path = Path(path)
+    return path.parent if is_version_name(path.name) or path.name.startswith(STAGING_PREFIX) else path
+
+def read_pointer(root: Path) -> dict:
+    try:
+        with (Path(root) / POINTER).open("r", encoding="utf-8") as f:
+            data = json.load(f)
+        return data if isinstance(data, dict) else {}
+    except (OSError, ValueError):
+        return {}
+
+def _write_pointer(root: Path, data: dict) -> None:
+    path = Path(root) / POINTER
+    tmp = path.with_name(f"{POINTER}.{os.getpid()}.tmp")
+    with tmp.open("w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    os.replace(tmp, path)
+
+def current(root: Path) -> Optional[Path]:
+    """指针指向的版本目录；没有指针（未版本化的目录）时返回 None。"""
+    name = read_pointer(root).get("version")
+    if not name:
+        return None
+    path = Path(root) / name
+    return path if path.is_dir() else None
+
+def resolve(root: Path) -> Path:
+    """读取用的目录：当前版本，未版本化时就是 root 本身。不建租约，只适合一次性的小读取。"""
+    return current(root) or Path(root)
+
+def all_dirs(root: Path) -> List[Path]:
+    """root 本身加上其中全部版本目录和暂存目录（房间目录的引用计数用）。"""
+    root = Path(root)
+    out = [root]
+    if root.is_dir():
+        out += [p for p in root.iterdir() if p.is_dir() and (is_version_name(p.name)
+                                                              or p.name.startswith(STAGING_PREFIX))]
+    return out
+
+# ---------- 读取方 ----------
+
+def _live_leases(root: Path, now: Optional[float] = None) -> Dict[str, int]:
+    """各版本的有效租约数；顺带删除过期的租约。"""
+    folder = Path(root) / READERS
+    now = now or time.time()
+    counts: Dict[str, int] = {}
+    if not folder.is_dir():
+        return counts
+    for p in folder.iterdir():
+        try:
+            if now - p.stat().st_mtime > LEASE_SECONDS:
+                p.unlink()
+                continue
+        except OSError:
+            continue
+        version = p.name.split(".", 1)[0]
+        counts[version] = counts.get(version, 0) + 1
+    return counts
+
+def is_pinned(root: Path) -> bool:
+    return bool(_live_leases(root))
+
+@contextlib.contextmanager
+def pin(root: Path) -> Iterator[Path]:
+    """
+    固定当前版本并给出其目录，退出前该版本不会被删除，期间发布的新版本也不影响本次读取。
+    未版本化的目录原样给出，不建租约。
+    """
+    root = Path(root)
+    version = current(root)
+    if version is None:
+        yield root
+        return
+    readers = root / READERS
+    readers.mkdir(exist_ok=True)
+    lease = readers / f"{version.name}.{os.getpid()}.{uuid.uuid4().hex[:8]}"
+    lease.touch()
+    try:
+        # 读指针与建租约之间版本可能刚好被回收（只会发生在退役超过 GRACE_SECONDS 之后），此时改用新的当前版本
+        if not version.is_dir():
+            lease.unlink()
+            version = current(root) or root
+            lease = readers / f"{version.name}.{os.getpid()}.{uuid.uuid4().hex[:8]}"
+            lease.touch()
+        yield version
+    finally:
+        with contextlib.suppress(OSError):
+            lease.unlink()
+
+# ---------- 写入方 ----------
+
+@contextlib.contextmanager
+def _locked(root: Path, timeout: float = LOCK_TIMEOUT):
+    path = Path(root) / LOCK
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            break
+        except FileExistsError:
+            with contextlib.suppress(OSError):
+                if time.time() - path.stat().st_mtime > 2 * timeout:
+                    path.unlink()       # 持有者异常退出留下的锁
+                    continue
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"等待发布锁超时: {path}")
+            time.sleep(0.05)
+    try:
+        os.write(fd, str(os.getpid()).encode())
+        os.close(fd)
+        yield
+    finally:
+        with contextlib.suppress(OSError):
+            path.unlink()
+
+def _data_files(folder: Path) -> List[Path]:
+    """目录中的数据文件；未版本化的日期目录里跳过指针、锁和各子目录。"""
+    if not folder.is_dir():
+        return []
+    return sorted(p for p in folder.iterdir() if p.is_file() and p.name not in _RESERVED)
+
+def _same_tree(a: Path, b: Path) -> bool:
+    fa, fb = _data_files(a), _data_files(b)
+    if [p.name for p in fa] != [p.name for p in fb]:
+        return False
+    return all(filecmp.cmp(x, y, shallow=False) for x, y in zip(fa, fb))
+
+class Staging:
+    """
+    一个待发布的新版本：创建时复制当前版本的全部文件（保留修改时间，快照仍然有效），
+    写入方在 path 中增量更新，最后 publish 整体发布；出错时 discard 丢弃。
+    """
+
+    def __init__(self, root: Path):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.base = current(self.root)
+        self.path = self.root / f"{STAGING_PREFIX}{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self.path.mkdir()
+        for p in _data_files(self.base or self.root):
+            shutil.copy2(p, self.path / p.name)
+        self.base_state = refresh.load_state(str(self.base or self.root))
+
+    def discard(self) -> None:
+        shutil.rmtree(self.path, ignore_errors=True)
+
+    def _rebase(self, newer: Path) -> bool:
+        """合并暂存期间别的写入方发布的更新：本次没有改动的区域取 newer 中的记录和文件。"""
+        mine, theirs = refresh.load_state(str(self.path)), refresh.load_state(str(newer))
+        merged = False
+        for key, entry in theirs.items():
+            if mine.get(key) != self.base_state.get(key) or entry == mine.get(key):
+                continue
+            mine[key] = entry
+            merged = True
+            src = newer / f"area_{key}.json"
+            if src.is_file():
+                shutil.copy2(src, self.path / src.name)
+        if merged:
+            refresh.save_state(str(self.path), mine)
+        return merged
+
+    def publish(self, on_rebase: Optional[Callable[[Path], None]] = None) -> Path:
+        """
+        发布为新版本并切换指针，返回当前版本目录。合并了别的写入方的更新时先调用 on_rebase(path)
+        （例如重写快照）；与当前版本内容完全相同时丢弃暂存目录，沿用当前版本。
+        """
+        with _locked(self.root):
+            cur = current(self.root)
+            if cur is not None and cur != self.base and self._rebase(cur) and on_rebase:
+                on_rebase(self.path)
+            if cur is not None and _same_tree(self.path, cur):
+                self.discard()
+                return cur
+            numbers = [int(m.group(1)) for p in self.root.iterdir() if (m := _VERSION_RE.fullmatch(p.name))]
+            target = self.root / f"v{max(numbers, default=0) + 1}"
+            os.rename(self.path, target)
+            pointer = read_pointer(self.root)
+            retired = dict(pointer.get("retired") or {})
+            if cur is not None:
+                retired[cur.name] = time.time()
+            _write_pointer(self.root, {"version": target.name,
+                                       "published_at": datetime.now().isoformat(timespec="seconds"),
+                                       "retired": retired})
+            gc(self.root, locked=True)
+        return target
+
+def gc(root: Path, log=print, locked: bool = False) -> int:
+    """
+    删除退役超过 GRACE_SECONDS 且没有读取方持有的版本、异常退出留下的暂存目录，
+    以及版本化之前留在日期目录里的旧文件。返回删除的版本数。
+    """
+    root = Path(root)
+    if not locked:
+        with _locked(root):
+            return gc(root, log, locked=True)
+    pointer = read_pointer(root)
+    cur = pointer.get("version")
+    if not cur:
+        return 0
+    now = time.time()
+    leases = _live_leases(root, now)
+    retired = {k: v for k, v in (pointer.get("retired") or {}).items() if (root / k).is_dir()}
+    removed = 0
+    for p in list(root.iterdir()):
+        if p.is_file() and p.name not in _RESERVED:
+            with contextlib.suppress(OSError):
+                p.unlink()
+        elif p.is_dir() and p.name.startswith(STAGING_PREFIX):
+            if now - p.stat().st_mtime > STALE_STAGING_SECONDS:
+                shutil.rmtree(p, ignore_errors=True)
+        elif p.is_dir() and is_version_name(p.name) and p.name != cur:
+            since = retired.get(p.name, p.stat().st_mtime)
+            if leases.get(p.name) or now - since <= GRACE_SECONDS:
+                continue
+            try:
+                shutil.rmtree(p)
+            except OSError as e:
+                log(f"删除旧版本失败 {root.name}/{p.name}：{e}")
+                continue
+            retired.pop(p.name, None)
+            removed += 1
+    if retired != (pointer.get("retired") or {}):
+        _write_pointer(root, dict(pointer, retired=retired))
+    return removed